@@ -3,7 +3,9 @@ import streamlit as st
 from pathlib import Path
 from analyzer import mapear_modulos, extrair_duracao
 from logger import gerar_relatorios, segundos_para_hms
-from transcriber import transcrever_videos, extrair_todos_audios
+from transcriber import extrair_todos_audios
+from transcription_daemon import submeter_transcricao
+from segment_store import abrir_store
 from llm_processor import generate_summary, generate_quiz_questions, extract_keywords_and_insights, detect_course_type
 from config import OPENAI_API_KEY
 from datetime import datetime
@@ -427,6 +429,30 @@ def _load_content_from_file(file_path: Path) -> str:
     return ""
 
 
+def render_segment_lookup(txt_path: Path, aula_stem: str):
+    """Consulta a transcrição por tempo e por texto no .segments.bin (sem ler o arquivo todo)."""
+    store = abrir_store(txt_path)
+    if store is None:
+        st.info("Linha do tempo indisponível: transcreva novamente com o formato 'bin' em TRANSCRIPT_FORMATS.")
+        return
+
+    with store:
+        col_tempo, col_busca = st.columns(2)
+        with col_tempo:
+            minuto = st.number_input("Ir para o minuto", min_value=0.0, step=1.0,
+                                     key=f"store_min_{aula_stem}")
+            for seg in store.trecho(minuto * 60, minuto * 60 + 60):
+                st.markdown(f"`{segundos_para_hms(seg['start'])}` {seg['text']}")
+        with col_busca:
+            consulta = st.text_input("Buscar no texto", key=f"store_busca_{aula_stem}")
+            if consulta:
+                resultados = store.buscar(consulta, limite=50)
+                if not resultados:
+                    st.caption("Nenhum trecho encontrado.")
+                for seg in resultados:
+                    st.markdown(f"`{segundos_para_hms(seg['start'])}` {seg['text']}")
+
+
 @st.cache_data(ttl=3600)
 def cached_mapear_modulos(caminho: str, use_multiformat: bool = True):
     """Cache do mapeamento de módulos com suporte multi-formato."""
@@ -1422,8 +1448,8 @@ def processar_curso_completo(modulos_mapeados, base_path, curso_nome, gpt_model)
             if items_to_transcribe:
                 whisper_model = st.session_state.get('whisper_model', 'small')
                 with st.spinner(f"Transcrevendo {sum(len(items) for items in items_to_transcribe.values())} arquivos de mídia..."):
-                    transcrever_videos(items_to_transcribe, modelo=whisper_model,
-                                       tipo_audio="wav", deletar_audio=True)
+                    submeter_transcricao(items_to_transcribe, modelo=whisper_model,
+                                         tipo_audio="wav", deletar_audio=True)
                 st.success(
                     f"✅ {sum(len(items) for items in items_to_transcribe.values())} mídias transcritas!")
 
@@ -1595,8 +1621,8 @@ def render_action_cards(modulos_mapeados, base_path, curso_nome, gpt_model):
 
                 if any(items_to_transcribe.values()):
                     with st.spinner("Transcrevendo mídia..."):
-                        transcrever_videos(items_to_transcribe, modelo=whisper_model,
-                                           tipo_audio=audio_format, deletar_audio=delete_audio)
+                        submeter_transcricao(items_to_transcribe, modelo=whisper_model,
+                                             tipo_audio=audio_format, deletar_audio=delete_audio)
                         st.success("✅ Transcrição de mídia concluída!")
                         cached_mapear_modulos.clear()
                         st.rerun()
@@ -1774,8 +1800,11 @@ def render_action_cards(modulos_mapeados, base_path, curso_nome, gpt_model):
                             "Transcrição vazia para esta aula. Não foi possível gerar insights/questionário.")
                     else:
                         # --- Abas para organizar Resumo, Insights, Questionário ---
-                        tab_summary, tab_insights, tab_quiz = st.tabs(
-                            ["📝 Resumo", "💡 Insights", "❓ Questionário"])
+                        tab_summary, tab_insights, tab_quiz, tab_timeline = st.tabs(
+                            ["📝 Resumo", "💡 Insights", "❓ Questionário", "⏱️ Linha do tempo"])
+
+                        with tab_timeline:
+                            render_segment_lookup(txt_path, aula_stem)
 
                         with tab_summary:
                             # Lógica para exibir
@@ -0,0 +1,124 @@
+# video_analyzer/v4/audio_cache.py
+"""
+Cache de áudio 16kHz mono comprimido, fora da pasta do curso.
+Na primeira decodificação de uma aula o FFmpeg grava, na mesma passada, um
+extrato FLAC (ou Opus) do áudio; ao transcrever de novo (outro modelo, outros
+parâmetros) o áudio sai desse extrato, sem abrir o vídeo. A chave é o hash do
+arquivo (content_hash: tamanho + primeiros e últimos 8 MB) e o tamanho total é
+limitado por AUDIO_CACHE_MAX_MB (descarte LRU).
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import AUDIO_CACHE_FORMAT, AUDIO_CACHE_MAX_MB, CACHE_DIR, ENABLE_AUDIO_CACHE
+from content_hash import hash_audio
+
+AUDIO_CACHE_DIR = Path(CACHE_DIR) / "audio"
+# FLAC é sem perdas (~60MB/h): retranscrever do extrato dá o mesmo texto que do vídeo.
+# Opus a 24kbps ocupa ~11MB/h, mas é com perdas e pode mudar palavras raras ou baixas
+CODECS = {
+    'opus': {'ext': '.opus', 'opcoes': {'acodec': 'libopus', 'audio_bitrate': '24k', 'application': 'voip'}},
+    'flac': {'ext': '.flac', 'opcoes': {'acodec': 'flac', 'compression_level': 5}},
+}
+
+
+class AudioCache:
+    """Extratos de áudio por impressão da fonte, com descarte LRU por tamanho."""
+
+    def __init__(self, root: Optional[Path] = None, formato: str = AUDIO_CACHE_FORMAT,
+                 max_size_mb: float = AUDIO_CACHE_MAX_MB, enabled: bool = ENABLE_AUDIO_CACHE):
+        self.root = Path(root or AUDIO_CACHE_DIR)
+        self.formato = formato if formato in CODECS else 'flac'
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def opcoes_codec(self) -> Dict:
+        """Argumentos de saída do ffmpeg-python para gravar um extrato."""
+        return dict(CODECS[self.formato]['opcoes'])
+
+    def _caminho(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}{CODECS[self.formato]['ext']}"
+
+    def key(self, media_path) -> Optional[str]:
+        if not self.enabled:
+            return None
+        try:
+            return hash_audio(media_path)
+        except Exception as e:
+            print(f"⚠️ Cache de áudio indisponível para {Path(media_path).name}: {e}")
+            return None
+
+    def lookup(self, key: Optional[str]) -> Optional[Path]:
+        """Extrato em cache para a chave (marca o acesso para o LRU) ou None."""
+        if key is None:
+            return None
+        caminho = self._caminho(key)
+        if not caminho.exists():
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(caminho)
+        with self._lock:
+            self.hits += 1
+        return caminho
+
+    def reservar(self, key: str) -> Path:
+        """Caminho temporário onde o FFmpeg grava o extrato (publicado com commit)."""
+        final = self._caminho(key)
+        final.parent.mkdir(parents=True, exist_ok=True)
+        return final.with_name(f"{final.stem}.tmp{os.getpid()}_{threading.get_ident()}{final.suffix}")
+
+    def commit(self, key: str, tmp: Path):
+        """Publica o extrato gravado em tmp e aplica o limite de tamanho."""
+        if not tmp.exists() or tmp.stat().st_size == 0:
+            tmp.unlink(missing_ok=True)
+            return
+        os.replace(tmp, self._caminho(key))
+        self.evict()
+
+    def _entries(self) -> List[Dict]:
+        if not self.root.exists():
+            return []
+        entradas = []
+        for arquivo in self.root.glob("*/*"):
+            if not arquivo.is_file() or ".tmp" in arquivo.name:
+                continue
+            stat = arquivo.stat()
+            entradas.append({'path': arquivo, 'size': stat.st_size, 'last_access': stat.st_mtime})
+        return entradas
+
+    def evict(self) -> int:
+        """Remove os extratos menos usados até caber em max_size. Retorna quantos saíram."""
+        with self._lock:
+            entradas = sorted(self._entries(), key=lambda e: e['last_access'])
+            total = sum(e['size'] for e in entradas)
+            removidas = 0
+            for entrada in entradas:
+                if total <= self.max_size_bytes:
+                    break
+                entrada['path'].unlink(missing_ok=True)
+                total -= entrada['size']
+                removidas += 1
+            return removidas
+
+    def stats(self) -> Dict:
+        entradas = self._entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(entradas),
+            'formato': self.formato,
+            'size_mb': round(sum(e['size'] for e in entradas) / (1024 * 1024), 2),
+            'max_size_mb': round(self.max_size_bytes / (1024 * 1024), 2),
+        }
+
+
+# Instância compartilhada pelo processo
+audio_cache = AudioCache()
@@ -0,0 +1,353 @@
+# video_analyzer/v4/audio_fingerprint.py
+"""
+Impressão espectral para achar aulas quase idênticas.
+O hash exato (content_hash) não reconhece uma aula reexportada com outro
+bitrate ou container. Aqui cada quadro de ~64ms vira um código de 32 bits
+(sinal das diferenças de energia entre bandas vizinhas ao longo do tempo,
+no estilo Philips/Chromaprint), que sobrevive à recompressão. Um índice com
+as impressões das aulas já transcritas encontra a aula de origem e o
+deslocamento entre as duas; a transcrição dela é reaproveitada com os
+tempos ajustados.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from config import CACHE_DIR, FINGERPRINT_SETTINGS
+from memory_governor import governor
+
+SAMPLE_RATE = 16000
+FRAME = 4096
+HOP = 1024
+# 33 bandas logarítmicas entre 300Hz e 2kHz → 32 bits por quadro
+N_BANDS = 33
+MIN_HZ, MAX_HZ = 300, 2000
+# Quadros por bloco do STFT (limita a memória em aulas longas)
+BLOCK_FRAMES = 2048
+# A cada N quadros da consulta, um vai para a busca no índice
+QUERY_STRIDE = 4
+# Votos mínimos no mesmo deslocamento para verificar um candidato
+MIN_VOTES = 20
+# Códigos que aparecem mais que isso no índice (silêncio, ruído) não votam
+MAX_OCCURRENCES = 32
+FINGERPRINT_DIR = Path(CACHE_DIR) / "fingerprints"
+# Uma linha JSON por aula indexada (index.json é o formato antigo, ainda lido)
+INDEX_FILE = FINGERPRINT_DIR / "index.jsonl"
+LEGACY_INDEX_FILE = FINGERPRINT_DIR / "index.json"
+
+_BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+def quadros_por_segundo() -> float:
+    return SAMPLE_RATE / HOP
+
+
+def _bandas() -> np.ndarray:
+    """Bins do rfft que limitam cada banda."""
+    bordas_hz = np.geomspace(MIN_HZ, MAX_HZ, N_BANDS + 1)
+    return np.round(bordas_hz * FRAME / SAMPLE_RATE).astype(int)
+
+
+def _energias(audio: np.ndarray) -> Iterator[np.ndarray]:
+    """Energia por banda de cada quadro, em blocos de BLOCK_FRAMES quadros."""
+    janela = np.hanning(FRAME).astype(np.float32)
+    bordas = _bandas()
+    n_quadros = 1 + (len(audio) - FRAME) // HOP if len(audio) >= FRAME else 0
+    for inicio in range(0, n_quadros, BLOCK_FRAMES):
+        fim = min(n_quadros, inicio + BLOCK_FRAMES)
+        trecho = audio[inicio * HOP:(fim - 1) * HOP + FRAME]
+        quadros = np.lib.stride_tricks.sliding_window_view(trecho, FRAME)[::HOP]
+        espectro = np.abs(np.fft.rfft(quadros * janela, axis=1)) ** 2
+        acumulado = np.cumsum(espectro, axis=1)
+        yield acumulado[:, bordas[1:] - 1] - acumulado[:, bordas[:-1] - 1]
+
+
+def impressao(audio: np.ndarray) -> np.ndarray:
+    """Códigos de 32 bits por quadro (uint32) do áudio float32 16kHz mono."""
+    blocos = list(_energias(np.asarray(audio, dtype=np.float32)))
+    if not blocos:
+        return np.zeros(0, dtype=np.uint32)
+    energia = np.log1p(np.concatenate(blocos))
+    # Bit = a diferença entre bandas vizinhas cresceu em relação ao quadro anterior
+    dif_bandas = energia[:, :-1] - energia[:, 1:]
+    bits = (dif_bandas[1:] - dif_bandas[:-1]) > 0
+    pesos = (1 << np.arange(N_BANDS - 1, dtype=np.uint64)).astype(np.uint64)
+    return (bits.astype(np.uint64) @ pesos).astype(np.uint32)
+
+
+def taxa_erro_bits(a: np.ndarray, b: np.ndarray) -> float:
+    """Fração de bits diferentes entre duas sequências alinhadas de mesmo tamanho."""
+    if len(a) == 0:
+        return 1.0
+    xor = np.bitwise_xor(a, b).view(np.uint8)
+    return float(_BYTE_BITS[xor].sum()) / (len(a) * 32)
+
+
+def _id_midia(media_path) -> str:
+    return hashlib.sha1(str(Path(media_path).resolve()).encode()).hexdigest()[:16]
+
+
+def _fundir(a: Dict[str, np.ndarray], b: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Une dois fragmentos ordenados por código (o sort estável aproveita as duas sequências)."""
+    codigos = np.concatenate([a['codigos'], b['codigos']])
+    ordem = np.argsort(codigos, kind='stable')
+    return {'codigos': codigos[ordem],
+            'aulas': np.concatenate([a['aulas'], b['aulas']])[ordem],
+            'quadros': np.concatenate([a['quadros'], b['quadros']])[ordem]}
+
+
+class FingerprintIndex:
+    """
+    Impressões das aulas já transcritas, com busca por códigos e deslocamento.
+    A tabela de busca fica em fragmentos ordenados: cada aula nova vira um
+    fragmento, e fragmentos de tamanho parecido são fundidos (sem reler os
+    .npy do disco). O index.jsonl só recebe uma linha por aula.
+    """
+
+    def __init__(self, root: Optional[Path] = None,
+                 max_ber: float = FINGERPRINT_SETTINGS['max_ber'],
+                 min_coverage: float = FINGERPRINT_SETTINGS['min_coverage'],
+                 enabled: bool = FINGERPRINT_SETTINGS['enabled']):
+        self.root = Path(root or FINGERPRINT_DIR)
+        self.index_file = self.root / INDEX_FILE.name
+        self.max_ber = max_ber
+        self.min_coverage = min_coverage
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entradas: Optional[Dict] = None
+        self._lido_ate = 0
+        # Códigos por aula (em memória) e fragmentos ordenados (código, aula, quadro)
+        self._por_aula: Dict[str, np.ndarray] = {}
+        self._versao: Dict[str, float] = {}
+        self._ids: List[str] = []
+        self._fragmentos: List[Dict[str, np.ndarray]] = []
+        self.reaproveitadas = 0
+
+    def _atualizar(self) -> Dict:
+        """Lê só as linhas novas do índice (outros processos também gravam nele)."""
+        if self._entradas is None:
+            self._entradas = {}
+            try:
+                # Índice antigo (um JSON só), de antes do index.jsonl
+                with open(self.root / LEGACY_INDEX_FILE.name, 'r', encoding='utf-8') as f:
+                    self._entradas.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+        try:
+            with open(self.index_file, 'rb') as f:
+                f.seek(self._lido_ate)
+                for linha in f:
+                    if not linha.endswith(b"\n"):
+                        break  # linha ainda sendo gravada
+                    self._lido_ate += len(linha)
+                    try:
+                        entrada = json.loads(linha)
+                        self._entradas[entrada.pop('id')] = entrada
+                    except (ValueError, KeyError):
+                        continue
+        except OSError:
+            pass
+        return self._entradas
+
+    def add(self, media_path, codigos: np.ndarray, meta: Optional[Dict] = None):
+        """Guarda a impressão de uma aula transcrita."""
+        if not self.enabled or len(codigos) == 0:
+            return
+        ident = _id_midia(media_path)
+        codigos = codigos.astype(np.uint32)
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f"{ident}.tmp.npy"
+        np.save(tmp, codigos)
+        os.replace(tmp, self.root / f"{ident}.npy")
+        entrada = {'media': str(media_path), 'quadros': int(len(codigos)),
+                   'criado_em': time.time(), **(meta or {})}
+        with self._lock:
+            with open(self.index_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'id': ident, **entrada}, ensure_ascii=False) + "\n")
+            if self._entradas is not None:
+                self._atualizar()
+                self._incluir(ident, codigos, entrada['criado_em'])
+
+    def _incluir(self, ident: str, codigos: np.ndarray, versao: float):
+        """Acrescenta a aula à tabela de busca como um fragmento novo."""
+        if ident in self._por_aula:
+            # Aula retranscrita: remonta a partir da memória, sem a versão antiga
+            self._por_aula[ident] = codigos
+            self._versao[ident] = versao
+            self._remontar()
+            return
+        self._por_aula[ident] = codigos
+        self._versao[ident] = versao
+        self._ids.append(ident)
+        ordem = np.argsort(codigos, kind='stable')
+        self._fragmentos.append({
+            'codigos': codigos[ordem],
+            'aulas': np.full(len(codigos), len(self._ids) - 1, dtype=np.int32),
+            'quadros': ordem.astype(np.int32),
+        })
+        # Funde enquanto o último fragmento for ao menos metade do anterior (custo amortizado n·log n)
+        while (len(self._fragmentos) > 1 and
+               2 * len(self._fragmentos[-1]['codigos']) >= len(self._fragmentos[-2]['codigos'])):
+            b, a = self._fragmentos.pop(), self._fragmentos.pop()
+            self._fragmentos.append(_fundir(a, b))
+        self._contabilizar()
+
+    def _remontar(self):
+        ids, fragmento = [], None
+        for ident, codigos in self._por_aula.items():
+            ids.append(ident)
+            ordem = np.argsort(codigos, kind='stable')
+            novo = {'codigos': codigos[ordem],
+                    'aulas': np.full(len(codigos), len(ids) - 1, dtype=np.int32),
+                    'quadros': ordem.astype(np.int32)}
+            fragmento = novo if fragmento is None else _fundir(fragmento, novo)
+        self._ids = ids
+        self._fragmentos = [fragmento] if fragmento is not None else []
+        self._contabilizar()
+
+    def _sincronizar(self):
+        """Traz para a tabela as aulas do índice que ainda não estão nela."""
+        for ident, entrada in self._atualizar().items():
+            if self._versao.get(ident) == entrada.get('criado_em'):
+                continue
+            try:
+                codigos = np.load(self.root / f"{ident}.npy")
+            except (OSError, ValueError):
+                continue
+            self._incluir(ident, codigos, entrada.get('criado_em'))
+
+    def memoria_mb(self) -> float:
+        """Memória da tabela de busca (códigos por aula + fragmentos ordenados)."""
+        total = sum(c.nbytes for c in self._por_aula.values())
+        total += sum(a.nbytes for f in self._fragmentos for a in f.values())
+        return total / (1024 * 1024)
+
+    def _contabilizar(self):
+        governor.contabilizar("índice de impressões", self.memoria_mb())
+
+    def impressao_de(self, media_path) -> Optional[np.ndarray]:
+        """Impressão guardada de uma aula já transcrita, ou None (sem decodificar nada)."""
+        if not self.enabled:
+            return None
+        codigos = self._por_aula.get(_id_midia(media_path))
+        if codigos is not None:
+            return codigos
+        try:
+            return np.load(self.root / f"{_id_midia(media_path)}.npy")
+        except (OSError, ValueError):
+            return None
+
+    def buscar(self, media_path, codigos: np.ndarray, assinatura: Optional[str] = None) -> Optional[Dict]:
+        """
+        Aula do índice com a mesma fala (outra mídia) transcrita com a mesma
+        assinatura (modelo + parâmetros). Retorna a entrada com 'offset_s'
+        (tempo na consulta = tempo na origem - offset_s) e 'ber', ou None.
+        """
+        if not self.enabled or len(codigos) < MIN_VOTES * QUERY_STRIDE:
+            return None
+        with self._lock:
+            self._sincronizar()
+            entradas = dict(self._entradas)
+            fragmentos, ids, por_aula = list(self._fragmentos), list(self._ids), dict(self._por_aula)
+        if not fragmentos:
+            return None
+
+        # Votação: quadros da consulta com código idêntico no índice votam em (aula, deslocamento)
+        amostra = np.arange(0, len(codigos), QUERY_STRIDE)
+        faixas = [(f, np.searchsorted(f['codigos'], codigos[amostra], side='left'),
+                   np.searchsorted(f['codigos'], codigos[amostra], side='right')) for f in fragmentos]
+        # Códigos comuns demais (silêncio, ruído) não votam: conta em todos os fragmentos
+        comuns = sum(direita - esquerda for _, esquerda, direita in faixas) > MAX_OCCURRENCES
+        pares = []
+        for fragmento, esquerda, direita in faixas:
+            esquerda, direita, quadros_consulta = esquerda[~comuns], direita[~comuns], amostra[~comuns]
+            repeticoes = direita - esquerda
+            if not repeticoes.sum():
+                continue
+            posicoes = np.concatenate([np.arange(a, b) for a, b in zip(esquerda, direita) if b > a])
+            quadro_consulta = np.repeat(quadros_consulta, repeticoes)
+            pares.append(np.stack([fragmento['aulas'][posicoes],
+                                   fragmento['quadros'][posicoes] - quadro_consulta], axis=1))
+        if not pares:
+            return None
+        candidatos, votos = np.unique(np.concatenate(pares), axis=0, return_counts=True)
+
+        proprio = _id_midia(media_path)
+        for k in np.argsort(votos)[::-1][:5]:
+            if votos[k] < MIN_VOTES:
+                break
+            aula, deslocamento = int(candidatos[k][0]), int(candidatos[k][1])
+            ident = ids[aula]
+            if ident == proprio or ident not in entradas:
+                continue
+            if entradas[ident].get('assinatura') != assinatura:
+                continue  # outro modelo/idioma/VAD: a transcrição de origem não vale aqui
+            resultado = self._verificar(codigos, por_aula[ident], deslocamento)
+            if resultado is not None:
+                return {**entradas[ident], **resultado,
+                        'offset_s': round(deslocamento / quadros_por_segundo(), 3)}
+        return None
+
+    def _verificar(self, consulta: np.ndarray, origem: np.ndarray, deslocamento: int) -> Optional[Dict]:
+        """Compara as sequências alinhadas: sobreposição e taxa de erro de bits."""
+        inicio_consulta = max(0, -deslocamento)
+        inicio_origem = max(0, deslocamento)
+        n = min(len(consulta) - inicio_consulta, len(origem) - inicio_origem)
+        if n <= 0 or n < self.min_coverage * max(len(consulta), len(origem)):
+            return None  # trecho em comum, não a mesma aula inteira
+        ber = taxa_erro_bits(consulta[inicio_consulta:inicio_consulta + n],
+                             origem[inicio_origem:inicio_origem + n])
+        if ber > self.max_ber:
+            return None
+        return {'ber': round(ber, 4), 'cobertura': round(n / len(consulta), 4)}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entradas = self._atualizar()
+        return {'aulas': len(entradas), 'reaproveitadas': self.reaproveitadas}
+
+
+def segmentos_alinhados(origem_media, offset_s: float, duracao: Optional[float]) -> Optional[List[Dict]]:
+    """
+    Segmentos da transcrição da aula de origem (.segments.bin ou .segments.json)
+    nos tempos da consulta; None se a origem não tiver transcrição com tempos.
+    """
+    from segment_store import abrir_store
+    from transcript_writer import JSON_SUFFIX
+
+    origem_media = Path(origem_media)
+    txt = origem_media.with_suffix('.txt')
+    if not txt.exists():
+        return None
+    store = abrir_store(txt)
+    if store is not None:
+        with store:
+            segmentos = [store.segmento(i) for i in range(len(store))]
+    else:
+        try:
+            with open(origem_media.with_name(origem_media.stem + JSON_SUFFIX), 'r', encoding='utf-8') as f:
+                segmentos = json.load(f).get('segments', [])
+        except (OSError, ValueError):
+            return None
+
+    alinhados = []
+    for seg in segmentos:
+        inicio = seg['start'] - offset_s
+        fim = seg['end'] - offset_s
+        if fim <= 0 or (duracao and inicio >= duracao):
+            continue
+        alinhados.append({**seg, 'start': round(max(0.0, inicio), 3),
+                          'end': round(min(fim, duracao) if duracao else fim, 3),
+                          'text': ' ' + seg['text'].strip()})
+    return alinhados
+
+
+# Instância única do processo
+fingerprint_index = FingerprintIndex()
@@ -0,0 +1,205 @@
+# video_analyzer/v4/autotune.py
+"""
+Auto-ajuste do Whisper para o hardware atual.
+Calibra compute_type × cpu_threads × num_workers em um clipe curto, mede o
+fator de tempo real (RTF) de cada combinação e grava a mais rápida em um
+perfil por (host, modelo), que o transcriber carrega automaticamente.
+"""
+
+import json
+import os
+import socket
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import CACHE_DIR, DEFAULT_WHISPER_LANGUAGE, PERFORMANCE_SETTINGS
+
+SAMPLE_RATE = 16000
+PROFILE_FILE = Path(CACHE_DIR) / "whisper_profiles.json"
+COMPUTE_TYPES = ('int8', 'int8_float32', 'float32')
+THREAD_OPTIONS = (1, 2, 4, 8)
+CLIP_SECONDS = 30
+# Fração da RAM disponível que os workers podem ocupar durante a calibração
+MEMORY_HEADROOM = 0.8
+
+
+def chave_perfil(modelo: str) -> str:
+    return f"{socket.gethostname()}|{modelo}"
+
+
+def _carregar_perfis() -> Dict:
+    try:
+        with open(PROFILE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def carregar_perfil(modelo: str) -> Optional[Dict]:
+    """Perfil calibrado deste host para o modelo, se houver."""
+    return _carregar_perfis().get(chave_perfil(modelo))
+
+
+def salvar_perfil(modelo: str, perfil: Dict):
+    perfis = _carregar_perfis()
+    perfis[chave_perfil(modelo)] = perfil
+    PROFILE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = PROFILE_FILE.with_suffix('.json.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(perfis, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, PROFILE_FILE)
+
+
+def plano_do_perfil(modelo: str):
+    """
+    (compute_type, CpuPlan) para transcrever com o modelo: vem do perfil
+    calibrado, exceto o que estiver fixado explicitamente na configuração.
+    """
+    from cpu_scheduler import planejar_orcamento_cpu
+
+    perfil = carregar_perfil(modelo)
+    if not perfil:
+        return "auto", planejar_orcamento_cpu()
+    plan = planejar_orcamento_cpu(
+        cpu_threads=PERFORMANCE_SETTINGS.get('whisper_cpu_threads') or perfil['cpu_threads'],
+        num_workers=PERFORMANCE_SETTINGS.get('whisper_workers') or perfil['num_workers'])
+    return perfil['compute_type'], plan
+
+
+def clip_sintetico(segundos: float = CLIP_SECONDS) -> np.ndarray:
+    """
+    Sinal parecido com fala (harmônicos com entonação e sílabas de ~4Hz).
+    Serve para comparar configurações; um trecho de aula real é preferível.
+    """
+    t = np.arange(int(segundos * SAMPLE_RATE)) / SAMPLE_RATE
+    f0 = 140 + 30 * np.sin(2 * np.pi * 0.3 * t)
+    fase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voz = sum(np.sin(k * fase) / k for k in range(1, 8))
+    silabas = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 2
+    frases = (np.sin(2 * np.pi * 0.2 * t) > -0.6).astype(np.float32)
+    ruido = np.random.default_rng(0).normal(0, 0.01, t.size)
+    return (0.3 * voz * silabas * frases + ruido).astype(np.float32)
+
+
+def clip_calibracao(caminho: Optional[str] = None, segundos: float = CLIP_SECONDS) -> Tuple[np.ndarray, str]:
+    """Trecho de uma aula real (a partir de 1min) ou o clipe sintético."""
+    if caminho:
+        from language_profiler import carregar_amostra
+        return carregar_amostra(caminho, duracao_s=segundos), Path(caminho).name
+    return clip_sintetico(segundos), "sintético"
+
+
+def compute_types_suportados() -> List[str]:
+    try:
+        import ctranslate2
+        suportados = ctranslate2.get_supported_compute_types("cpu")
+        return [c for c in COMPUTE_TYPES if c in suportados]
+    except Exception:
+        return list(COMPUTE_TYPES)
+
+
+def _ram_disponivel_mb() -> Optional[float]:
+    try:
+        import psutil
+        return psutil.virtual_memory().available / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def configuracoes_candidatas(modelo: str, compute_type: str, budget: int) -> List[Tuple[int, int]]:
+    """(cpu_threads, num_workers) que cabem no orçamento de núcleos e na RAM."""
+    from cpu_scheduler import nucleos_de_inferencia
+    from model_registry import estimar_memoria_modelo
+
+    nucleos = nucleos_de_inferencia(budget)
+    ram = _ram_disponivel_mb()
+    memoria = estimar_memoria_modelo(modelo, compute_type)
+    candidatas = set()
+    for threads in THREAD_OPTIONS:
+        if threads > nucleos:
+            continue
+        for workers in {1, nucleos // threads}:
+            if ram is not None and workers * memoria > ram * MEMORY_HEADROOM:
+                continue
+            candidatas.add((threads, max(1, workers)))
+    return sorted(candidatas)
+
+
+def medir_configuracao(modelo: str, compute_type: str, cpu_threads: int, num_workers: int,
+                       clip: np.ndarray, params: Dict) -> Dict:
+    """
+    Mede uma combinação: cada worker transcreve o clipe ao mesmo tempo.
+    rtf = tempo de parede / segundos de áudio processados (vazão; menor é melhor);
+    rtf_arquivo = tempo de parede / duração de um clipe (latência por aula).
+    """
+    from cpu_scheduler import TranscriptionWorkerPool, planejar_orcamento_cpu
+
+    plan = planejar_orcamento_cpu(cpu_threads=cpu_threads, num_workers=num_workers)
+    duracao = len(clip) / SAMPLE_RATE
+    with TranscriptionWorkerPool(modelo, compute_type, plan) as pool:
+        # Aquecimento: carrega o modelo em todos os workers antes de medir
+        aquecimento = clip[:5 * SAMPLE_RATE]
+        for futuro in [pool.submit_inference(aquecimento, None, **params)
+                       for _ in range(plan.num_workers)]:
+            futuro.result()
+
+        inicio = time.perf_counter()
+        futuros = [pool.submit_inference(clip, None, **params)
+                   for _ in range(plan.num_workers)]
+        for futuro in futuros:
+            futuro.result()
+        parede = time.perf_counter() - inicio
+
+    return {
+        'compute_type': compute_type,
+        'cpu_threads': plan.cpu_threads,
+        'num_workers': plan.num_workers,
+        'parede_s': round(parede, 2),
+        'rtf': round(parede / (duracao * plan.num_workers), 4),
+        'rtf_arquivo': round(parede / duracao, 4),
+    }
+
+
+def autoajustar(modelo: str, clip_path: Optional[str] = None,
+                compute_types: Optional[List[str]] = None, budget: Optional[int] = None,
+                language: Optional[str] = None) -> Tuple[Optional[Dict], List[Dict]]:
+    """
+    Calibra todas as combinações, grava a de menor RTF no perfil do host e
+    retorna (perfil, tabela de medições).
+    """
+    from cpu_scheduler import planejar_orcamento_cpu
+
+    budget = planejar_orcamento_cpu(budget=budget).budget
+    clip, origem = clip_calibracao(clip_path)
+    params = {'language': language or (DEFAULT_WHISPER_LANGUAGE if DEFAULT_WHISPER_LANGUAGE != 'auto' else 'pt'),
+              'beam_size': 5}
+
+    tabela = []
+    for compute_type in compute_types or compute_types_suportados():
+        for cpu_threads, num_workers in configuracoes_candidatas(modelo, compute_type, budget):
+            print(f"⏱️ {compute_type}: {num_workers} worker(s) × {cpu_threads} thread(s)...")
+            try:
+                tabela.append(medir_configuracao(
+                    modelo, compute_type, cpu_threads, num_workers, clip, params))
+            except Exception as e:
+                print(f"⚠️ {compute_type} {num_workers}×{cpu_threads} falhou: {e}")
+
+    if not tabela:
+        return None, tabela
+    tabela.sort(key=lambda linha: linha['rtf'])
+    melhor = tabela[0]
+    perfil = {
+        'compute_type': melhor['compute_type'],
+        'cpu_threads': melhor['cpu_threads'],
+        'num_workers': melhor['num_workers'],
+        'rtf': melhor['rtf'],
+        'budget': budget,
+        'clip': origem,
+        'medido_em': time.time(),
+        'tabela': tabela,
+    }
+    salvar_perfil(modelo, perfil)
+    return perfil, tabela
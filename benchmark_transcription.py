@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de transcrição - NASCO Analyzer v4.0
+Compara caminhos de inferência nos mesmos arquivos e imprime o fator de
+tempo real (RTF = tempo de processamento / duração do áudio; menor é melhor).
+
+Uso:
+    python benchmark_transcription.py rtf aula1.mp4 aula2.mp4 --model small --batch-size 16
+    python benchmark_transcription.py rtf clipes/*.mp4 --model small --micro-batch
+    python benchmark_transcription.py autotune --model small --clip aula1.mp4
+    python benchmark_transcription.py lotes clipes/*.mp4 --model small --target-seconds 600
+    python benchmark_transcription.py memoria --model small --workers 4
+    python benchmark_transcription.py remoto --files 8 --minutes 30 --concurrency 1,2,4,8
+"""
+
+import argparse
+import difflib
+import json
+import sys
+import time
+from pathlib import Path
+
+
+def _medir(model, audio, **parametros):
+    """Executa uma transcrição completa e retorna (segundos, texto, segmentos)."""
+    from model_registry import transcrever
+    inicio = time.perf_counter()
+    segments, info = transcrever(model, audio, **parametros)
+    segmentos = list(segments)  # consome o gerador: a inferência acontece aqui
+    return time.perf_counter() - inicio, "".join(s.text for s in segmentos), segmentos
+
+
+def benchmark_rtf(arquivos, modelo: str, batch_size: int, cpu_threads: int = 0) -> list:
+    """Compara o caminho sequencial (beam_size=5) com o modo em lotes por arquivo."""
+    from model_registry import registry, BATCHED_AVAILABLE
+    from transcriber import SAMPLE_RATE, carregar_audio_pcm
+
+    if not BATCHED_AVAILABLE:
+        print("⚠️ faster-whisper sem BatchedInferencePipeline: só o caminho sequencial será medido")
+
+    model = registry.get(modelo, "auto", cpu_threads)
+    resultados = []
+
+    for arquivo in arquivos:
+        audio = carregar_audio_pcm(arquivo)
+        duracao = len(audio) / SAMPLE_RATE
+        if duracao == 0:
+            print(f"⚠️ Sem áudio: {arquivo}")
+            continue
+
+        linha = {'arquivo': Path(arquivo).name, 'duracao_s': round(duracao, 1)}
+
+        seq_s, seq_texto, seq_segs = _medir(
+            model, audio, language="pt", beam_size=5)
+        linha.update(sequencial_s=round(seq_s, 2), sequencial_rtf=round(
+            seq_s / duracao, 4), sequencial_segmentos=len(seq_segs))
+
+        if BATCHED_AVAILABLE and batch_size > 0:
+            lot_s, lot_texto, lot_segs = _medir(
+                model, audio, language="pt", beam_size=5, batch_size=batch_size)
+            linha.update(
+                lotes_s=round(lot_s, 2),
+                lotes_rtf=round(lot_s / duracao, 4),
+                lotes_segmentos=len(lot_segs),
+                speedup=round(seq_s / lot_s, 2) if lot_s else None,
+                # Similaridade do texto, para verificar que a qualidade não caiu
+                similaridade=round(difflib.SequenceMatcher(
+                    None, seq_texto, lot_texto).ratio(), 3),
+                ultimo_timestamp=round(lot_segs[-1].end, 1) if lot_segs else 0.0,
+            )
+
+        resultados.append(linha)
+    return resultados
+
+
+def benchmark_lotes(arquivos, modelo: str, alvo_s: float, cpu_threads: int = 0,
+                    language: str = None) -> list:
+    """
+    Vazão de clipes curtos (arquivos/min): um transcribe por arquivo vs.
+    micro-lotes de até alvo_s segundos. Os dois caminhos decodificam com o
+    FFmpeg e gravam os formatos configurados (em uma pasta temporária).
+    """
+    import tempfile
+    from micro_batch import GAP_S, concatenar, dividir_segmentos
+    from model_registry import registry
+    from transcriber import SAMPLE_RATE, _parametros_transcricao, carregar_audio_pcm
+    from transcript_writer import emitir_transcricao, formatos_configurados
+
+    model = registry.get(modelo, "auto", cpu_threads)
+    parametros = _parametros_transcricao(language=language)
+    formatos = formatos_configurados()
+    resultados = []
+
+    with tempfile.TemporaryDirectory() as destino:
+        inicio = time.perf_counter()
+        textos_individuais, duracao_total = [], 0.0
+        for arquivo in arquivos:
+            audio = carregar_audio_pcm(arquivo)
+            duracao_total += len(audio) / SAMPLE_RATE
+            _, texto, segmentos = _medir(model, audio, **parametros)
+            emitir_transcricao(segmentos, Path(destino), f"{Path(arquivo).stem}.individual", formatos)
+            textos_individuais.append(texto)
+        individual_s = time.perf_counter() - inicio
+        resultados.append({'modo': 'individual', 'arquivos': len(arquivos), 'passadas': len(arquivos),
+                           'segundos': round(individual_s, 2),
+                           'arquivos_min': round(len(arquivos) / individual_s * 60, 1),
+                           'audio_min': round(duracao_total / 60, 1)})
+
+        inicio = time.perf_counter()
+        parametros_lote = dict(parametros)
+        if 'batch_size' not in parametros_lote:
+            parametros_lote['condition_on_previous_text'] = False
+        textos_lote, passadas, grupo, grupo_s = [], 0, [], 0.0
+        for i, arquivo in enumerate(arquivos):
+            audio = carregar_audio_pcm(arquivo)
+            grupo.append((arquivo, audio))
+            grupo_s += len(audio) / SAMPLE_RATE + GAP_S
+            if grupo_s < alvo_s and i < len(arquivos) - 1:
+                continue
+            buffer, limites = concatenar([a for _, a in grupo])
+            _, _, segmentos = _medir(model, buffer, **parametros_lote)
+            for (arq, _), segs in zip(grupo, dividir_segmentos(segmentos, limites)):
+                emitir_transcricao(segs, Path(destino), f"{Path(arq).stem}.lote", formatos)
+                textos_lote.append("".join(s['text'] for s in segs))
+            passadas += 1
+            grupo, grupo_s = [], 0.0
+        lote_s = time.perf_counter() - inicio
+
+    similaridade = difflib.SequenceMatcher(
+        None, " ".join(textos_individuais), " ".join(textos_lote)).ratio()
+    resultados.append({'modo': 'micro-lote', 'arquivos': len(arquivos), 'passadas': passadas,
+                       'segundos': round(lote_s, 2),
+                       'arquivos_min': round(len(arquivos) / lote_s * 60, 1),
+                       'audio_min': round(duracao_total / 60, 1),
+                       'speedup': round(individual_s / lote_s, 2) if lote_s else None,
+                       'similaridade': round(similaridade, 3)})
+    return resultados
+
+
+def _rss_arvore_mb() -> dict:
+    """RSS (e PSS, quando o sistema informa) deste processo e dos filhos, em MB."""
+    import psutil
+    processos = [psutil.Process()]
+    processos += processos[0].children(recursive=True)
+    rss = pss = 0.0
+    for processo in processos:
+        try:
+            rss += processo.memory_info().rss
+            pss += getattr(processo.memory_full_info(), 'pss', 0)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return {'rss': rss / (1024 * 1024), 'pss': pss / (1024 * 1024) or None}
+
+
+def benchmark_memoria(modelo: str, num_workers: int, cpu_threads: int = 0,
+                      clip_path: str = None) -> list:
+    """
+    Memória residente do pool com WORKER_MODE=process (uma cópia do modelo por
+    worker) vs. shared (pesos carregados uma vez no host): RSS ocioso após o
+    aquecimento, pico com todos os workers transcrevendo e custo por worker.
+    """
+    import threading
+    from autotune import clip_calibracao
+    from cpu_scheduler import SharedWeightsPool, TranscriptionWorkerPool, planejar_orcamento_cpu
+    from transcriber import _parametros_transcricao
+
+    audio, _ = clip_calibracao(clip_path)
+    parametros = _parametros_transcricao()
+    parametros.pop('batch_size', None)
+    base = _rss_arvore_mb()['rss']
+    resultados = []
+
+    for modo, classe in (('process', TranscriptionWorkerPool), ('shared', SharedWeightsPool)):
+        plan = planejar_orcamento_cpu(cpu_threads=cpu_threads or None, num_workers=num_workers)
+        inicio = time.perf_counter()
+        pool = classe(modelo, "auto", plan)
+        try:
+            pool.warm_up()
+            carga_s = time.perf_counter() - inicio
+            ocioso = _rss_arvore_mb()
+
+            pico, parar = [ocioso['rss']], threading.Event()
+
+            def amostrar():
+                while not parar.wait(0.2):
+                    pico.append(_rss_arvore_mb()['rss'])
+
+            amostrador = threading.Thread(target=amostrar, daemon=True)
+            amostrador.start()
+            inicio = time.perf_counter()
+            futuros = [pool.submit_inference(audio, None, **parametros)
+                       for _ in range(plan.num_workers)]
+            for futuro in futuros:
+                futuro.result()
+            parede_s = time.perf_counter() - inicio
+            parar.set()
+            amostrador.join()
+        finally:
+            pool.shutdown()
+
+        ocioso_mb = ocioso['rss'] - base
+        resultados.append({
+            'modo': modo,
+            'workers': plan.num_workers,
+            'threads': plan.cpu_threads,
+            'carga_s': round(carga_s, 1),
+            'ocioso_mb': round(ocioso_mb),
+            'pss_mb': round(ocioso['pss'] - base) if ocioso['pss'] else None,
+            'pico_mb': round(max(pico) - base),
+            'por_worker_mb': round(ocioso_mb / plan.num_workers),
+            'parede_s': round(parede_s, 2),
+        })
+    return resultados
+
+
+def benchmark_remoto(n_arquivos: int, minutos: float, concorrencias: list, url: str = None,
+                     trecho_s: float = 600, requisicoes_por_janela: int = None, janela_s: float = 3600.0,
+                     latencia_s: float = 0.3, rtf: float = 0.02, max_simultaneas: int = 0) -> list:
+    """
+    Vazão do backend remoto por nível de concorrência: n_arquivos aulas
+    sintéticas de `minutos` transcritas ao mesmo tempo (como no pipeline).
+    Sem url, usa o servidor simulado (mock_asr_server.py) com a latência, o
+    limite e o máximo de envios simultâneos informados; janela_s menor que
+    3600 comprime a hora do limite para testar o controle de taxa.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from autotune import clip_sintetico
+    from config import RATE_LIMITS
+    from remote_asr import RemoteASRBackend
+
+    if requisicoes_por_janela is None:
+        requisicoes_por_janela = RATE_LIMITS['whisper_requests_per_hour']
+    servidor = None
+    if url is None:
+        from mock_asr_server import iniciar_mock
+        servidor = iniciar_mock(latencia_s=latencia_s, rtf=rtf, max_simultaneas=max_simultaneas)
+        url = servidor.url
+    audio = clip_sintetico(minutos * 60)
+    resultados = []
+    try:
+        for concorrencia in concorrencias:
+            backend = RemoteASRBackend(url=url, trecho_s=trecho_s, concorrencia=concorrencia,
+                                       requisicoes_por_hora=requisicoes_por_janela, janela_s=janela_s)
+
+            def transcrever(_):
+                segmentos, _ = backend.transcribe(audio, language='pt')
+                return len(list(segmentos))
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=n_arquivos) as arquivos:
+                n_segmentos = sum(arquivos.map(transcrever, range(n_arquivos)))
+            parede_s = time.perf_counter() - inicio
+            backend.shutdown()
+            stats = backend.stats()
+            resultados.append({
+                'concorrencia': concorrencia,
+                'requisicoes': stats['requisicoes'],
+                'max_simultaneas': stats['max_simultaneas'],
+                'recusas_429': stats['recusas_429'],
+                'espera_limite_s': stats['espera_limite_s'],
+                'segmentos': n_segmentos,
+                'parede_s': round(parede_s, 2),
+                'audio_min_por_min': round(n_arquivos * minutos / parede_s * 60, 1),
+            })
+    finally:
+        if servidor is not None:
+            servidor.shutdown()
+            servidor.server_close()
+    return resultados
+
+
+def imprimir_tabela(linhas: list, colunas: list):
+    """Imprime uma tabela simples alinhada por coluna."""
+    if not linhas:
+        print("Nenhum resultado.")
+        return
+    larguras = {c: max(len(c), *(len(str(l.get(c, "-"))) for l in linhas))
+                for c in colunas}
+    print("  ".join(c.ljust(larguras[c]) for c in colunas))
+    print("  ".join("-" * larguras[c] for c in colunas))
+    for linha in linhas:
+        print("  ".join(str(linha.get(c, "-")).ljust(larguras[c])
+              for c in colunas))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmarks de transcrição (RTF, throughput)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_rtf = sub.add_parser(
+        "rtf", help="RTF sequencial vs. em lotes (VAD) nos mesmos arquivos")
+    p_rtf.add_argument("arquivos", nargs="+")
+    p_rtf.add_argument("--model", default="small")
+    p_rtf.add_argument("--batch-size", type=int, default=16)
+    p_rtf.add_argument("--cpu-threads", type=int, default=0)
+    p_rtf.add_argument("--micro-batch", action="store_true",
+                       help="Mede também arquivos/min um por vez vs. micro-lotes (clipes curtos)")
+    p_rtf.add_argument("--target-seconds", type=float, default=600,
+                       help="Áudio por micro-lote com --micro-batch (padrão: 600)")
+    p_rtf.add_argument("--json", help="Salva os resultados neste arquivo")
+
+    p_tune = sub.add_parser(
+        "autotune", help="Calibra compute_type × threads × workers e grava o perfil do host")
+    p_tune.add_argument("--model", default="small")
+    p_tune.add_argument("--clip", help="Aula usada na calibração (padrão: clipe sintético)")
+    p_tune.add_argument("--compute-types", help="Lista separada por vírgula (padrão: int8,int8_float32,float32)")
+    p_tune.add_argument("--cpu-budget", type=int, help="Núcleos disponíveis (padrão: CPU_BUDGET)")
+    p_tune.add_argument("--language", help="Idioma do clipe (padrão: DEFAULT_WHISPER_LANGUAGE)")
+    p_tune.add_argument("--json", help="Salva os resultados neste arquivo")
+
+    p_lotes = sub.add_parser(
+        "lotes", help="Arquivos/min de clipes curtos: um por vez vs. micro-lotes")
+    p_lotes.add_argument("arquivos", nargs="+")
+    p_lotes.add_argument("--model", default="small")
+    p_lotes.add_argument("--target-seconds", type=float, default=600,
+                         help="Áudio por micro-lote (padrão: 600)")
+    p_lotes.add_argument("--cpu-threads", type=int, default=0)
+    p_lotes.add_argument("--language", help="Idioma dos clipes (padrão: DEFAULT_WHISPER_LANGUAGE)")
+    p_lotes.add_argument("--json", help="Salva os resultados neste arquivo")
+
+    p_mem = sub.add_parser(
+        "memoria", help="RSS do pool: uma cópia do modelo por worker vs. pesos compartilhados")
+    p_mem.add_argument("--model", default="small")
+    p_mem.add_argument("--workers", type=int, default=4)
+    p_mem.add_argument("--cpu-threads", type=int, default=0)
+    p_mem.add_argument("--clip", help="Aula usada na medição (padrão: clipe sintético)")
+    p_mem.add_argument("--json", help="Salva os resultados neste arquivo")
+
+    p_remoto = sub.add_parser(
+        "remoto", help="Vazão do ASR remoto por concorrência (servidor simulado por padrão)")
+    p_remoto.add_argument("--files", type=int, default=8, help="Aulas transcritas ao mesmo tempo")
+    p_remoto.add_argument("--minutes", type=float, default=30, help="Duração de cada aula sintética")
+    p_remoto.add_argument("--concurrency", default="1,2,4,8", help="Níveis separados por vírgula")
+    p_remoto.add_argument("--url", help="Endpoint real (padrão: mock_asr_server local)")
+    p_remoto.add_argument("--chunk-seconds", type=float, default=600)
+    p_remoto.add_argument("--requests-per-window", type=int,
+                          help="Limite de envios (padrão: whisper_requests_per_hour)")
+    p_remoto.add_argument("--window-seconds", type=float, default=3600.0,
+                          help="Janela do limite (menor que 3600 para simular a hora)")
+    p_remoto.add_argument("--latency", type=float, default=0.3, help="Latência do servidor simulado")
+    p_remoto.add_argument("--rtf", type=float, default=0.02, help="Tempo do servidor simulado por s de áudio")
+    p_remoto.add_argument("--server-max-concurrent", type=int, default=0,
+                          help="Envios simultâneos aceitos pelo servidor simulado (0 = sem limite)")
+    p_remoto.add_argument("--json", help="Salva os resultados neste arquivo")
+
+    args = parser.parse_args(argv)
+
+    if args.comando == "rtf":
+        print(f"🏁 Benchmark RTF - modelo {args.model}, lote {args.batch_size}")
+        resultados = benchmark_rtf(
+            args.arquivos, args.model, args.batch_size, args.cpu_threads)
+        imprimir_tabela(resultados, ['arquivo', 'duracao_s', 'sequencial_rtf', 'lotes_rtf',
+                                     'speedup', 'similaridade', 'ultimo_timestamp'])
+        if args.micro_batch:
+            print(f"\n📦 Micro-lotes de {args.target_seconds:.0f}s nos mesmos arquivos")
+            micro = benchmark_lotes(args.arquivos, args.model, args.target_seconds, args.cpu_threads)
+            imprimir_tabela(micro, ['modo', 'arquivos', 'passadas', 'segundos',
+                                    'arquivos_min', 'speedup', 'similaridade'])
+            resultados = {'rtf': resultados, 'micro_lotes': micro}
+
+    elif args.comando == "autotune":
+        from autotune import PROFILE_FILE, autoajustar
+        print(f"🔧 Auto-ajuste - modelo {args.model}")
+        compute_types = args.compute_types.split(",") if args.compute_types else None
+        perfil, resultados = autoajustar(
+            args.model, args.clip, compute_types, args.cpu_budget, args.language)
+        imprimir_tabela(resultados, ['compute_type', 'cpu_threads', 'num_workers',
+                                     'parede_s', 'rtf', 'rtf_arquivo'])
+        if perfil is None:
+            print("❌ Nenhuma configuração pôde ser medida")
+            return 1
+        print(f"✅ Mais rápida: {perfil['compute_type']}, {perfil['num_workers']} worker(s) × "
+              f"{perfil['cpu_threads']} thread(s), RTF {perfil['rtf']} → {PROFILE_FILE}")
+
+    elif args.comando == "lotes":
+        print(f"📦 Micro-lotes - modelo {args.model}, {len(args.arquivos)} clipes, "
+              f"lotes de {args.target_seconds:.0f}s")
+        resultados = benchmark_lotes(
+            args.arquivos, args.model, args.target_seconds, args.cpu_threads, args.language)
+        imprimir_tabela(resultados, ['modo', 'arquivos', 'passadas', 'segundos',
+                                     'arquivos_min', 'speedup', 'similaridade'])
+
+    elif args.comando == "memoria":
+        try:
+            import psutil  # noqa: F401
+        except ImportError:
+            print("❌ psutil é necessário para medir a memória (pip install psutil)")
+            return 1
+        print(f"🧠 Memória do pool - modelo {args.model}, {args.workers} worker(s)")
+        resultados = benchmark_memoria(args.model, args.workers, args.cpu_threads, args.clip)
+        imprimir_tabela(resultados, ['modo', 'workers', 'threads', 'carga_s', 'ocioso_mb',
+                                     'pss_mb', 'pico_mb', 'por_worker_mb', 'parede_s'])
+
+    elif args.comando == "remoto":
+        concorrencias = [int(c) for c in args.concurrency.split(",")]
+        print(f"🌐 ASR remoto - {args.files} aula(s) de {args.minutes:.0f}min, "
+              f"trechos de {args.chunk_seconds:.0f}s, {args.url or 'servidor simulado'}")
+        resultados = benchmark_remoto(
+            args.files, args.minutes, concorrencias, args.url, args.chunk_seconds,
+            args.requests_per_window, args.window_seconds, args.latency, args.rtf,
+            args.server_max_concurrent)
+        imprimir_tabela(resultados, ['concorrencia', 'requisicoes', 'max_simultaneas', 'recusas_429',
+                                     'espera_limite_s', 'parede_s', 'audio_min_por_min'])
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(
+            resultados, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"✅ Resultados salvos em: {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
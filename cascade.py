@@ -0,0 +1,169 @@
+# video_analyzer/v4/cascade.py
+"""
+Transcrição em cascata.
+A aula inteira é transcrita com o modelo rápido; os segmentos com confiança
+baixa (avg_logprob), taxa de compressão alta (repetição/alucinação) ou
+provável silêncio (no_speech_prob) são agrupados em trechos, redecodificados
+com o modelo maior e recolocados no checkpoint antes da emissão.
+"""
+
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from checkpoint import SAMPLE_RATE, TranscriptionCheckpoint, segmento_para_dict
+from config import CASCADE_SETTINGS
+from remote_asr import backend_configurado
+
+Trecho = Tuple[float, float]
+
+
+def cascata_ativa(settings: Dict = CASCADE_SETTINGS) -> bool:
+    # Com ASR remoto a cascata carregaria um WhisperModel local, justamente o que se quer evitar
+    return bool(settings.get('model')) and backend_configurado() != 'remote'
+
+
+def descricao_modelo(modelo: str, settings: Dict = CASCADE_SETTINGS) -> str:
+    """Identificação do modelo efetivo (ex.: "small>medium"), usada no cache."""
+    if not cascata_ativa(settings):
+        return modelo
+    limites = (settings['max_avg_logprob'], settings['max_compression_ratio'],
+               settings['max_no_speech_prob'])
+    return f"{modelo}>{settings['model']}@{limites}"
+
+
+def segmento_fraco(seg: Dict, settings: Dict = CASCADE_SETTINGS) -> bool:
+    """O segmento cruza algum dos limites de qualidade?"""
+    logprob = seg.get('avg_logprob')
+    compressao = seg.get('compression_ratio')
+    silencio = seg.get('no_speech_prob')
+    return ((logprob is not None and logprob < settings['max_avg_logprob'])
+            or (compressao is not None and compressao > settings['max_compression_ratio'])
+            or (silencio is not None and silencio > settings['max_no_speech_prob']))
+
+
+def trechos_fracos(segmentos: Iterator[Dict], settings: Dict = CASCADE_SETTINGS) -> List[Trecho]:
+    """Agrupa segmentos fracos vizinhos (distância < merge_gap_s) em trechos."""
+    trechos: List[List[float]] = []
+    for seg in segmentos:
+        if not segmento_fraco(seg, settings):
+            continue
+        if trechos and seg['start'] - trechos[-1][1] < settings['merge_gap_s']:
+            trechos[-1][1] = max(trechos[-1][1], seg['end'])
+        else:
+            trechos.append([seg['start'], seg['end']])
+    return [tuple(t) for t in trechos]
+
+
+def _no_trecho(seg: Dict, trechos: List[Trecho]) -> Optional[int]:
+    meio = (seg['start'] + seg['end']) / 2
+    for i, (inicio, fim) in enumerate(trechos):
+        if inicio <= meio <= fim:
+            return i
+    return None
+
+
+def _carregar_array(audio):
+    if isinstance(audio, str):
+        from faster_whisper.audio import decode_audio
+        return decode_audio(audio, sampling_rate=SAMPLE_RATE)
+    return audio
+
+
+def _redecodificar(transcribe_fn, audio, trecho: Trecho, params: Dict,
+                   contexto: str, pad_s: float) -> List[Dict]:
+    """Transcreve só a janela do trecho; tempos voltam absolutos e limitados à janela."""
+    inicio = max(0.0, trecho[0] - pad_s)
+    fim = trecho[1] + pad_s
+    janela = audio[int(inicio * SAMPLE_RATE):int(fim * SAMPLE_RATE)]
+    if len(janela) == 0:
+        return []
+    kwargs = {k: v for k, v in params.items()
+              if k not in ('batch_size', 'vad_filter', 'vad_parameters')}
+    if contexto:
+        kwargs['initial_prompt'] = contexto
+    segments, _ = transcribe_fn(janela, **kwargs)
+    novos = []
+    for seg in segments:
+        dados = segmento_para_dict(seg, offset=inicio)
+        dados['start'] = max(dados['start'], trecho[0])
+        dados['end'] = min(max(dados['end'], dados['start']), fim)
+        if dados['text'] and dados['text'].strip():
+            novos.append(dados)
+    return novos
+
+
+def cascatear_aula(transcribe_fn, audio, media_path: str, params: Dict,
+                   fala_s: float, tempo_rapido_s: float,
+                   settings: Dict = CASCADE_SETTINGS) -> Dict:
+    """
+    Redecodifica os trechos fracos do checkpoint da aula com transcribe_fn (o
+    modelo maior) e reescreve o checkpoint com os novos segmentos no lugar.
+    Retorna o relatório: proporção escalada e tempo economizado estimado.
+    """
+    checkpoint = TranscriptionCheckpoint(media_path, params)
+    trechos = trechos_fracos(checkpoint.iter_segments(), settings)
+    segundos_escalados = sum(fim - inicio for inicio, fim in trechos)
+    relatorio = {
+        'modelo': settings['model'],
+        'trechos': len(trechos),
+        'segundos_escalados': round(segundos_escalados, 2),
+        'fala_s': round(fala_s, 2),
+        'proporcao_escalada': round(segundos_escalados / fala_s, 4) if fala_s else 0.0,
+        'tempo_rapido_s': round(tempo_rapido_s, 2),
+        'tempo_escalada_s': 0.0,
+        'economia_s': 0.0,
+    }
+    if not trechos:
+        return relatorio
+
+    inicio_escalada = time.time()
+    audio = _carregar_array(audio)
+    substitutos: Dict[int, List[Dict]] = {}
+    contexto = ""
+    proximo = 0
+    for seg in checkpoint.iter_segments():
+        # Texto confiável anterior ao trecho vira o prompt do modelo maior
+        if proximo < len(trechos) and seg['end'] <= trechos[proximo][0]:
+            contexto = seg['text'] or contexto
+            continue
+        while proximo < len(trechos) and seg['start'] >= trechos[proximo][0]:
+            substitutos[proximo] = _redecodificar(
+                transcribe_fn, audio, trechos[proximo], params, contexto.strip(),
+                settings['pad_s'])
+            proximo += 1
+        if proximo >= len(trechos):
+            break
+
+    def _reescritos():
+        emitidos = set()
+        for seg in checkpoint.iter_segments():
+            i = _no_trecho(seg, trechos)
+            # Modelo maior sem texto no trecho: mantém o que o rápido produziu
+            if i is None or not substitutos.get(i):
+                yield seg
+            elif i not in emitidos:
+                emitidos.add(i)
+                yield from substitutos[i]
+
+    checkpoint.rewrite(_reescritos())
+
+    tempo_escalada = time.time() - inicio_escalada
+    relatorio['tempo_escalada_s'] = round(tempo_escalada, 2)
+    # Custo estimado do modelo maior na aula inteira, pelo RTF medido nos trechos
+    tempo_modelo_maior = tempo_escalada / segundos_escalados * fala_s if segundos_escalados else 0.0
+    relatorio['economia_s'] = round(
+        max(0.0, tempo_modelo_maior - tempo_rapido_s - tempo_escalada), 2)
+    return relatorio
+
+
+def resumo_cascata(relatorios: List[Dict]) -> Dict:
+    """Totais de um lote de aulas: proporção do áudio escalada e tempo economizado."""
+    fala = sum(r['fala_s'] for r in relatorios)
+    escalados = sum(r['segundos_escalados'] for r in relatorios)
+    return {
+        'aulas': len(relatorios),
+        'segundos_escalados': round(escalados, 2),
+        'proporcao_escalada': round(escalados / fala, 4) if fala else 0.0,
+        'tempo_escalada_s': round(sum(r['tempo_escalada_s'] for r in relatorios), 2),
+        'economia_s': round(sum(r['economia_s'] for r in relatorios), 2),
+    }
@@ -0,0 +1,233 @@
+# video_analyzer/v4/checkpoint.py
+"""
+Checkpoint incremental de transcrições longas.
+Cada segmento decodificado é anexado a um arquivo lateral `<aula>.partial.jsonl`;
+se o processo morrer, a próxima execução retoma a partir do último timestamp
+gravado. Os arquivos finais (.txt/.srt) só aparecem via rename atômico.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+SAMPLE_RATE = 16000
+PARTIAL_SUFFIX = ".partial.jsonl"
+# fsync a cada N segmentos ou S segundos (o flush acontece sempre)
+FSYNC_EVERY_SEGMENTS = 20
+FSYNC_EVERY_SECONDS = 5.0
+
+SEGMENT_FIELDS = ('start', 'end', 'text', 'avg_logprob',
+                  'no_speech_prob', 'compression_ratio')
+
+
+def caminho_parcial(media_path) -> Path:
+    media_path = Path(media_path)
+    return media_path.with_name(media_path.stem + PARTIAL_SUFFIX)
+
+
+def segmento_para_dict(seg, offset: float = 0.0) -> Dict:
+    """Normaliza um segmento do faster-whisper (ou dict) deslocando os tempos."""
+    get = seg.get if isinstance(seg, dict) else lambda k, d=None: getattr(seg, k, d)
+    dados = {campo: get(campo) for campo in SEGMENT_FIELDS}
+    dados['start'] = round(float(dados['start']) + offset, 3)
+    dados['end'] = round(float(dados['end']) + offset, 3)
+    return dados
+
+
+def escrever_atomico(destino: Path, conteudo: str):
+    """Escreve em um arquivo temporário e renomeia (nunca deixa arquivo pela metade)."""
+    tmp = destino.with_name(destino.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(conteudo)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, destino)
+
+
+class TranscriptionCheckpoint:
+    """Arquivo lateral .partial.jsonl: uma linha de cabeçalho + uma por segmento."""
+
+    def __init__(self, media_path, params: Optional[Dict] = None):
+        self.media_path = Path(media_path)
+        self.path = caminho_parcial(self.media_path)
+        self.header = self._montar_cabecalho(params or {})
+        self._file = None
+        # Segundos de fala já gravados (soma dos segmentos), medidos em load()
+        self.fala_gravada_s = 0.0
+        self._pendentes_fsync = 0
+        self._ultimo_fsync = time.time()
+
+    def _montar_cabecalho(self, params: Dict) -> Dict:
+        stat = self.media_path.stat() if self.media_path.exists() else None
+        return {
+            'media': self.media_path.name,
+            'size': stat.st_size if stat else None,
+            'mtime': stat.st_mtime if stat else None,
+            'params': params,
+        }
+
+    def load(self) -> Tuple[int, float]:
+        """
+        Valida o checkpoint e retorna (nº de segmentos gravados, timestamp para
+        retomar). Uma última linha truncada por queda é cortada do arquivo.
+        """
+        if not self.path.exists():
+            return 0, 0.0
+        count, retomar_em, valido_ate, fala = 0, 0.0, 0, 0.0
+        try:
+            with open(self.path, "rb") as f:
+                primeira = f.readline()
+                try:
+                    cabecalho = json.loads(primeira).get('header')
+                except ValueError:
+                    cabecalho = None
+                if cabecalho != self.header:
+                    # Mídia ou parâmetros mudaram: o checkpoint não vale mais
+                    cabecalho = None
+                else:
+                    valido_ate = f.tell()
+                    for linha in f:
+                        try:
+                            segmento = json.loads(linha)
+                            retomar_em = segmento['end']
+                        except (ValueError, KeyError):
+                            break  # última linha truncada por uma queda: ignora o resto
+                        fala += max(0.0, retomar_em - segmento.get('start', retomar_em))
+                        count += 1
+                        valido_ate += len(linha)
+        except OSError:
+            return 0, 0.0
+
+        if cabecalho is None:
+            self.discard()
+            return 0, 0.0
+        os.truncate(self.path, valido_ate)
+        # Fala do trecho já transcrito: os segmentos cobrem a fala, não o silêncio
+        self.fala_gravada_s = min(fala, retomar_em)
+        return count, retomar_em
+
+    def open(self):
+        """Abre para anexar (criando o arquivo com o cabeçalho se necessário)."""
+        if not self.path.exists():
+            escrever_atomico(self.path, json.dumps(
+                {'header': self.header}, ensure_ascii=False) + "\n")
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def iter_segments(self) -> Iterator[Dict]:
+        """Lê os segmentos gravados um a um, sem carregar o arquivo inteiro."""
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.readline()  # cabeçalho
+            for linha in f:
+                try:
+                    yield json.loads(linha)
+                except ValueError:
+                    return
+
+    def rewrite(self, segments: Iterable[Dict]) -> int:
+        """
+        Substitui os segmentos gravados, mantendo o cabeçalho (rename atômico).
+        Os segmentos podem vir de iter_segments(): o arquivo original só é
+        trocado no fim.
+        """
+        with open(self.path, "r", encoding="utf-8") as f:
+            cabecalho = f.readline()
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        count = 0
+        with open(tmp, "w", encoding="utf-8") as out:
+            out.write(cabecalho)
+            for segmento in segments:
+                out.write(json.dumps(segmento, ensure_ascii=False) + "\n")
+                count += 1
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, self.path)
+        return count
+
+    def append(self, segmento: Dict):
+        self._file.write(json.dumps(segmento, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._pendentes_fsync += 1
+        if (self._pendentes_fsync >= FSYNC_EVERY_SEGMENTS
+                or time.time() - self._ultimo_fsync >= FSYNC_EVERY_SECONDS):
+            os.fsync(self._file.fileno())
+            self._pendentes_fsync = 0
+            self._ultimo_fsync = time.time()
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """Remove o checkpoint (após os arquivos finais estarem no lugar)."""
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _recortar_audio(audio, inicio_s: float):
+    """Recorta o áudio a partir de inicio_s (carregando-o se for um caminho)."""
+    if isinstance(audio, (str, os.PathLike)):
+        from faster_whisper.audio import decode_audio
+        audio = decode_audio(str(audio), sampling_rate=SAMPLE_RATE)
+    return audio[int(inicio_s * SAMPLE_RATE):]
+
+
+def transcrever_com_checkpoint(transcribe_fn, audio, media_path, params: Dict) -> Tuple[int, Dict]:
+    """
+    Executa transcribe_fn(audio, **params) gravando cada segmento no checkpoint
+    e retomando do último timestamp gravado, se houver um checkpoint válido.
+    Laços de alucinação são cortados e redecodificados (runaway_guard).
+    Os segmentos ficam só no arquivo; retorna (nº total de segmentos, info como dict).
+    """
+    from runaway_guard import transcrever_protegido
+
+    checkpoint = TranscriptionCheckpoint(media_path, params)
+    count, retomar_em = checkpoint.load()
+    if retomar_em > 0:
+        audio = _recortar_audio(audio, retomar_em)
+
+    gravados = 0
+
+    def _gravar(segmento: Dict):
+        nonlocal gravados
+        checkpoint.append(segmento)
+        gravados += 1
+
+    checkpoint.open()
+    try:
+        # A guarda retém os últimos segmentos: um laço de alucinação não chega ao checkpoint
+        info, _ = transcrever_protegido(transcribe_fn, audio, params, _gravar, offset=retomar_em,
+                                        fala_anterior=checkpoint.fala_gravada_s)
+    finally:
+        checkpoint.close()
+
+    return count + gravados, info
+
+
+def segmentos_do_checkpoint(media_path) -> Iterator[Dict]:
+    """Segmentos gravados no checkpoint da mídia, em ordem, um a um."""
+    return TranscriptionCheckpoint(media_path).iter_segments()
+
+
+def info_para_dict(info, offset: float = 0.0, fala_anterior: float = 0.0) -> Dict:
+    """
+    Converte o TranscriptionInfo em dict serializável. duration soma o offset
+    (áudio já transcrito antes da retomada); duration_after_vad soma só a fala
+    desse trecho (fala_anterior), não o trecho inteiro.
+    """
+    duracao = getattr(info, 'duration', 0.0) or 0.0
+    return {
+        'language': info.language,
+        'language_probability': info.language_probability,
+        'duration': offset + duracao,
+        'duration_after_vad': fala_anterior + (getattr(info, 'duration_after_vad', None) or duracao),
+        'resumed_from': offset,
+    }
+
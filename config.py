@@ -31,13 +31,74 @@ DEFAULT_MAX_TOKENS_QUIZ = int(os.getenv('DEFAULT_MAX_TOKENS_QUIZ', '700'))
 DEFAULT_WHISPER_MODEL = os.getenv('DEFAULT_WHISPER_MODEL', 'small')
 DEFAULT_WHISPER_LANGUAGE = os.getenv('DEFAULT_WHISPER_LANGUAGE', 'pt')
 
+# Decodifica o áudio direto para memória (sem arquivo temporário) quando possível
+STREAM_AUDIO = os.getenv('STREAM_AUDIO', 'true').lower() == 'true'
+
+# Orçamento de memória para modelos Whisper mantidos carregados (LRU)
+WHISPER_MODEL_CACHE_MB = int(os.getenv('WHISPER_MODEL_CACHE_MB', '3072'))
+
+# Filtro de atividade de voz (VAD): silêncios longos não passam pelo decodificador
+WHISPER_VAD_FILTER = os.getenv('WHISPER_VAD_FILTER', 'true').lower() == 'true'
+WHISPER_VAD_MIN_SILENCE_MS = int(os.getenv('WHISPER_VAD_MIN_SILENCE_MS', '1000'))
+WHISPER_VAD_SPEECH_PAD_MS = int(os.getenv('WHISPER_VAD_SPEECH_PAD_MS', '400'))
+
+# Cascata: modelo maior só para os segmentos fracos do modelo rápido (vazio = desativado)
+WHISPER_CASCADE_MODEL = os.getenv('WHISPER_CASCADE_MODEL', '')
+WHISPER_CASCADE_MAX_LOGPROB = float(os.getenv('WHISPER_CASCADE_MAX_LOGPROB', '-1.0'))
+WHISPER_CASCADE_MAX_COMPRESSION = float(os.getenv('WHISPER_CASCADE_MAX_COMPRESSION', '2.4'))
+WHISPER_CASCADE_MAX_NO_SPEECH = float(os.getenv('WHISPER_CASCADE_MAX_NO_SPEECH', '0.6'))
+
+# Formatos gerados por aula (o .txt é sempre gerado)
+TRANSCRIPT_FORMATS = os.getenv('TRANSCRIPT_FORMATS', 'txt,srt,vtt,json,bin')
+# Compressão do store colunar .segments.bin: none (abre por mmap) ou zstd
+SEGMENT_STORE_COMPRESSION = os.getenv('SEGMENT_STORE_COMPRESSION', 'none').lower()
+
 # --- CONFIGURAÇÕES DE SISTEMA ---
 MAX_FILE_SIZE_MB = int(os.getenv('MAX_FILE_SIZE_MB', '500'))
 MAX_THREADS = int(os.getenv('MAX_THREADS', '4'))
+
+# Orçamento de núcleos da transcrição: workers × threads por modelo
+CPU_BUDGET = int(os.getenv('CPU_BUDGET', str(MAX_THREADS)))
+WHISPER_CPU_THREADS = int(os.getenv('WHISPER_CPU_THREADS', '0'))  # 0 = automático
+WHISPER_WORKERS = int(os.getenv('WHISPER_WORKERS', '0'))  # 0 = automático
+DECODER_WORKERS = int(os.getenv('DECODER_WORKERS', '2'))
+WORKER_MODE = os.getenv('WORKER_MODE', 'thread')  # thread | process | shared
+
+# Pipeline decodificação → inferência → escrita
+PREFETCH_LESSONS = int(os.getenv('PREFETCH_LESSONS', '0'))  # 0 = workers + 1
+WRITER_WORKERS = int(os.getenv('WRITER_WORKERS', '1'))
+# Ordem das aulas: longest = mais longas primeiro (menor tempo total) | folder = ordem das pastas
+SCHEDULE_ORDER = os.getenv('SCHEDULE_ORDER', 'longest')
+
+# Inferência em lotes sobre trechos de fala (0 = desativado, sequencial)
+WHISPER_BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', '0'))
+
+# Arquivos acima de N minutos são divididos em silêncios e transcritos em paralelo
+# (0 = desativado); SPLIT_PARTS = nº de partes (0 = nº de workers)
+SPLIT_LONG_FILES_MINUTES = int(os.getenv('SPLIT_LONG_FILES_MINUTES', '0'))
+SPLIT_PARTS = int(os.getenv('SPLIT_PARTS', '0'))
+
+# Clipes mais curtos que N segundos são concatenados e transcritos em uma passada
+# (0 = desativado); cada micro-lote soma até MICRO_BATCH_TARGET_SECONDS de áudio
+MICRO_BATCH_CLIP_SECONDS = int(os.getenv('MICRO_BATCH_CLIP_SECONDS', '0'))
+MICRO_BATCH_TARGET_SECONDS = int(os.getenv('MICRO_BATCH_TARGET_SECONDS', '600'))
 AI_REQUEST_TIMEOUT = int(os.getenv('AI_REQUEST_TIMEOUT', '120'))
 
 # Cache
 ENABLE_CACHE = os.getenv('ENABLE_CACHE', 'true').lower() == 'true'
+# Cache global (transcrições por conteúdo), compartilhado entre cursos
+CACHE_DIR = os.getenv('CACHE_DIR', str(Path.home() / '.cache' / 'video_analyzer'))
+# Daemon local de transcrição (socket Unix): auto = usa se estiver no ar | true | false
+USE_TRANSCRIPTION_DAEMON = os.getenv('USE_TRANSCRIPTION_DAEMON', 'auto').lower()
+TRANSCRIPTION_DAEMON_SOCKET = os.getenv(
+    'TRANSCRIPTION_DAEMON_SOCKET', str(Path(CACHE_DIR) / 'transcriber.sock'))
+DAEMON_PRELOAD_MODELS = os.getenv('DAEMON_PRELOAD_MODELS', 'small')
+# Extratos 16kHz mono comprimidos (flac | opus): retranscrever não reabre o vídeo.
+# flac é sem perdas (~60MB/h); opus 24kbps cabe ~5x mais aulas, mas com perdas
+# a retranscrição pode divergir da feita sobre o vídeo
+ENABLE_AUDIO_CACHE = os.getenv('ENABLE_AUDIO_CACHE', 'true').lower() == 'true'
+AUDIO_CACHE_FORMAT = os.getenv('AUDIO_CACHE_FORMAT', 'flac').lower()
+AUDIO_CACHE_MAX_MB = int(os.getenv('AUDIO_CACHE_MAX_MB', '5120'))
 
 # --- CONFIGURAÇÕES DE INTERFACE ---
 DEFAULT_THEME = os.getenv('DEFAULT_THEME', 'auto')
@@ -49,6 +110,8 @@ ENABLE_SENTIMENT_ANALYSIS = os.getenv(
     'ENABLE_SENTIMENT_ANALYSIS', 'false').lower() == 'true'
 ENABLE_LANGUAGE_DETECTION = os.getenv(
     'ENABLE_LANGUAGE_DETECTION', 'true').lower() == 'true'
+# Ignora legendas embutidas (MKV/MP4) e transcreve tudo com o Whisper
+FORCE_WHISPER = os.getenv('FORCE_WHISPER', 'false').lower() == 'true'
 
 # --- LOGGING ---
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -104,6 +167,53 @@ AI_CONFIGS = {
     }
 }
 
+# --- CONFIGURAÇÕES DE VAD (TRANSCRIÇÃO) ---
+VAD_SETTINGS = {
+    'enabled': WHISPER_VAD_FILTER,
+    'min_silence_duration_ms': WHISPER_VAD_MIN_SILENCE_MS,
+    'speech_pad_ms': WHISPER_VAD_SPEECH_PAD_MS,
+    'threshold': 0.5
+}
+
+# --- AULAS QUASE IDÊNTICAS (IMPRESSÃO ESPECTRAL) ---
+# Aula reexportada (outro bitrate/container) reaproveita a transcrição da original
+FINGERPRINT_SETTINGS = {
+    'enabled': os.getenv('ENABLE_FINGERPRINT_DEDUP', 'true').lower() == 'true',
+    'max_ber': float(os.getenv('FINGERPRINT_MAX_BER', '0.3')),
+    'min_coverage': 0.9
+}
+
+# --- VINHETAS RECORRENTES (INTRO/OUTRO) ---
+# Trechos repetidos no começo/fim das aulas de um módulo ficam fora do Whisper e do texto
+RECURRING_SETTINGS = {
+    'enabled': os.getenv('SKIP_RECURRING_INTRO_OUTRO', 'false').lower() == 'true',
+    'min_seconds': float(os.getenv('RECURRING_MIN_SECONDS', '10'))
+}
+
+# --- GUARDA CONTRA LAÇOS DE ALUCINAÇÃO ---
+# Repetição, taxa de compressão alta ou decodificação muito mais lenta que o áudio:
+# o trecho é redecodificado com parâmetros rígidos (ou pulado se o laço voltar)
+RUNAWAY_SETTINGS = {
+    'enabled': os.getenv('ENABLE_RUNAWAY_GUARD', 'true').lower() == 'true',
+    'max_compression_ratio': float(os.getenv('RUNAWAY_MAX_COMPRESSION_RATIO', '2.4')),
+    'max_ngram_repeats': int(os.getenv('RUNAWAY_MAX_NGRAM_REPEATS', '6')),
+    'max_rtf': float(os.getenv('RUNAWAY_MAX_RTF', '10')),
+    'min_elapsed_s': 120,
+    'skip_s': float(os.getenv('RUNAWAY_SKIP_SECONDS', '30')),
+    'max_events': int(os.getenv('RUNAWAY_MAX_EVENTS', '5'))
+}
+
+# --- TRANSCRIÇÃO EM CASCATA ---
+# Segmentos que cruzam qualquer limite são redecodificados com o modelo maior
+CASCADE_SETTINGS = {
+    'model': WHISPER_CASCADE_MODEL,
+    'max_avg_logprob': WHISPER_CASCADE_MAX_LOGPROB,
+    'max_compression_ratio': WHISPER_CASCADE_MAX_COMPRESSION,
+    'max_no_speech_prob': WHISPER_CASCADE_MAX_NO_SPEECH,
+    'merge_gap_s': 1.0,
+    'pad_s': 0.3
+}
+
 # --- CONFIGURAÇÕES DE CACHE ---
 CACHE_SETTINGS = {
     'ttl_seconds': 3600,  # 1 hora
@@ -118,6 +228,19 @@ RATE_LIMITS = {
     'file_processing_concurrent': 5
 }
 
+# --- BACKEND DE ASR ---
+# faster_whisper (local, padrão) | remote (endpoint /audio/transcriptions compatível com a OpenAI)
+ASR_BACKEND = os.getenv('ASR_BACKEND', 'faster_whisper')
+REMOTE_ASR_SETTINGS = {
+    'url': os.getenv('REMOTE_ASR_URL', 'https://api.openai.com/v1'),
+    'api_key': os.getenv('REMOTE_ASR_API_KEY', '') or OPENAI_API_KEY,
+    'model': os.getenv('REMOTE_ASR_MODEL', 'whisper-1'),
+    'chunk_s': float(os.getenv('REMOTE_ASR_CHUNK_SECONDS', '600')),
+    'concurrency': int(os.getenv('REMOTE_ASR_CONCURRENCY', '0')) or RATE_LIMITS['file_processing_concurrent'],
+    'timeout_s': float(os.getenv('REMOTE_ASR_TIMEOUT', '300')),
+    'max_retries': int(os.getenv('REMOTE_ASR_MAX_RETRIES', '5'))
+}
+
 # --- CONFIGURAÇÕES DE SEGURANÇA ---
 SECURITY_SETTINGS = {
     'max_upload_size_mb': MAX_FILE_SIZE_MB,
@@ -136,7 +259,23 @@ PERFORMANCE_SETTINGS = {
     'chunk_size_mb': 10,  # Para processamento de arquivos grandes
     'parallel_processing': True,
     'gpu_acceleration': False,  # Para Whisper e outros modelos
-    'memory_limit_mb': 4096
+    'memory_limit_mb': 4096,
+    'whisper_model_cache_mb': WHISPER_MODEL_CACHE_MB,
+    'stream_audio': STREAM_AUDIO,
+    'cpu_budget': CPU_BUDGET,
+    'whisper_cpu_threads': WHISPER_CPU_THREADS,
+    'whisper_workers': WHISPER_WORKERS,
+    'decoder_workers': DECODER_WORKERS,
+    'worker_mode': WORKER_MODE,
+    'worker_start_method': os.getenv('WORKER_START_METHOD', ''),
+    'prefetch_lessons': PREFETCH_LESSONS,
+    'writer_workers': WRITER_WORKERS,
+    'schedule_order': SCHEDULE_ORDER,
+    'whisper_batch_size': WHISPER_BATCH_SIZE,
+    'split_long_files_minutes': SPLIT_LONG_FILES_MINUTES,
+    'split_parts': SPLIT_PARTS,
+    'micro_batch_clip_seconds': MICRO_BATCH_CLIP_SECONDS,
+    'micro_batch_target_seconds': MICRO_BATCH_TARGET_SECONDS
 }
 
 
@@ -0,0 +1,98 @@
+# video_analyzer/v4/content_hash.py
+"""
+Impressão digital do conteúdo de uma mídia para os caches globais.
+Em vez de reler o arquivo inteiro antes da primeira decodificação (em um NAS
+isso dobrava a leitura), a impressão combina o tamanho com o SHA-256 do
+começo e do fim do arquivo: cópias da mesma aula em outros pacotes de curso
+são idênticas byte a byte. O resultado é memorizado por (caminho, tamanho,
+mtime) para não reler arquivos inalterados; cada impressão nova é uma linha
+acrescentada ao memo, sem regravar o arquivo inteiro.
+"""
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Optional
+
+from config import CACHE_DIR
+
+# v2: impressão por amostras (a v1 lia o stream de áudio inteiro pelo FFmpeg)
+HASH_INDEX_FILE = Path(CACHE_DIR) / "audio_hashes_v2.jsonl"
+# Memo gravado inteiro a cada arquivo novo (versões anteriores); ainda é lido
+LEGACY_HASH_INDEX_FILE = Path(CACHE_DIR) / "audio_hashes_v2.json"
+# Bytes lidos no começo e no fim do arquivo; arquivos até 2x isso são lidos inteiros
+SAMPLE_BYTES = 8 << 20
+READ_CHUNK = 1 << 20
+
+_lock = threading.Lock()
+_memo: Optional[dict] = None
+
+
+def _carregar_memo() -> dict:
+    global _memo
+    if _memo is None:
+        _memo = {}
+        try:
+            with open(LEGACY_HASH_INDEX_FILE, 'r', encoding='utf-8') as f:
+                _memo.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        try:
+            with open(HASH_INDEX_FILE, 'r', encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                        _memo[registro['k']] = registro['v']
+                    except (ValueError, KeyError, TypeError):
+                        continue  # linha truncada por uma gravação interrompida
+        except OSError:
+            pass
+    return _memo
+
+
+def _salvar_memo(chave_memo: str, impressao: str):
+    """Acrescenta uma entrada ao memo (uma linha por arquivo novo)."""
+    HASH_INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(HASH_INDEX_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'k': chave_memo, 'v': impressao}) + "\n")
+
+
+def _hash_amostras(media_path: Path, tamanho: int) -> str:
+    """SHA-256 do tamanho + primeiros e últimos SAMPLE_BYTES do arquivo."""
+    h = hashlib.sha256(str(tamanho).encode())
+    trechos = [(0, tamanho)] if tamanho <= 2 * SAMPLE_BYTES else \
+        [(0, SAMPLE_BYTES), (tamanho - SAMPLE_BYTES, SAMPLE_BYTES)]
+    with open(media_path, 'rb') as f:
+        for inicio, n in trechos:
+            f.seek(inicio)
+            while n > 0:
+                bloco = f.read(min(READ_CHUNK, n))
+                if not bloco:
+                    break
+                h.update(bloco)
+                n -= len(bloco)
+    return h.hexdigest()
+
+
+def hash_audio(media_path) -> str:
+    """Impressão do conteúdo da mídia (prefixada com o método usado)."""
+    media_path = Path(media_path).resolve()
+    stat = media_path.stat()
+    chave_memo = f"{media_path}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    with _lock:
+        memo = _carregar_memo()
+        if chave_memo in memo:
+            return memo[chave_memo]
+
+    impressao = f"amostra:{_hash_amostras(media_path, stat.st_size)}"
+
+    with _lock:
+        memo = _carregar_memo()
+        memo[chave_memo] = impressao
+        try:
+            _salvar_memo(chave_memo, impressao)
+        except OSError:
+            pass
+    return impressao
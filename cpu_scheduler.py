@@ -0,0 +1,420 @@
+# video_analyzer/v4/cpu_scheduler.py
+"""
+Divisão do orçamento de CPU entre workers de transcrição.
+Cada worker é um processo com seu próprio modelo (cpu_threads fixos) fixado
+em um conjunto de núcleos; os decodificadores FFmpeg têm uma faixa separada
+de threads, já que passam a maior parte do tempo esperando I/O. Com
+WORKER_MODE=shared, um único processo hospeda o modelo com N réplicas do
+CTranslate2 que compartilham os pesos: cada worker a mais custa só a
+memória de ativação.
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+from config import PERFORMANCE_SETTINGS
+
+# Acima disso o CTranslate2 praticamente não escala por chamada
+MAX_THREADS_POR_MODELO = 8
+
+
+@dataclass
+class CpuPlan:
+    """Plano de uso de CPU: N workers × cpu_threads + faixa de decodificação."""
+    budget: int
+    num_workers: int
+    cpu_threads: int
+    decoder_workers: int
+    worker_cores: List[List[int]] = field(default_factory=list)
+    decoder_cores: List[int] = field(default_factory=list)
+
+    def describe(self) -> str:
+        return (f"{self.num_workers} worker(s) × {self.cpu_threads} thread(s) "
+                f"+ {self.decoder_workers} decodificador(es) / orçamento {self.budget} núcleos")
+
+
+def cores_disponiveis() -> List[int]:
+    """Núcleos que este processo pode usar (respeita cgroups/taskset no Linux)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def nucleos_de_inferencia(budget: int) -> int:
+    """
+    Núcleos do orçamento para os workers de inferência: com mais de um, um
+    fica só para o FFmpeg (decodificar no núcleo de um worker atrasa os dois).
+    """
+    return budget - 1 if budget > 1 else budget
+
+
+def planejar_orcamento_cpu(budget: Optional[int] = None, cpu_threads: Optional[int] = None,
+                           num_workers: Optional[int] = None) -> CpuPlan:
+    """
+    Divide o orçamento global de núcleos entre workers de inferência.
+    Por padrão usa PERFORMANCE_SETTINGS['cpu_budget'] (ou MAX_THREADS).
+    """
+    cores = cores_disponiveis()
+    if budget is None:
+        budget = PERFORMANCE_SETTINGS.get('cpu_budget') or len(cores)
+    budget = max(1, min(int(budget), len(cores)))
+    inferencia = nucleos_de_inferencia(budget)
+
+    if cpu_threads is None:
+        cpu_threads = PERFORMANCE_SETTINGS.get('whisper_cpu_threads') or 0
+    if not cpu_threads:
+        # Poucos workers com várias threads cada (menos cópias do modelo na memória),
+        # escolhendo entre 4 e 2 threads a divisão que deixa menos núcleos ociosos
+        opcoes = range(min(4, inferencia), 1, -1) or [1]
+        cpu_threads = min(opcoes, key=lambda t: inferencia % t)
+    cpu_threads = max(1, min(int(cpu_threads), inferencia, MAX_THREADS_POR_MODELO))
+
+    if num_workers is None:
+        num_workers = PERFORMANCE_SETTINGS.get('whisper_workers') or 0
+    if not num_workers:
+        num_workers = inferencia // cpu_threads
+    num_workers = max(1, min(int(num_workers), inferencia // cpu_threads or 1))
+
+    decoder_workers = max(1, int(PERFORMANCE_SETTINGS.get('decoder_workers', 2)))
+
+    # Fatias contíguas de núcleos para cada worker; o resto (ao menos um núcleo
+    # quando o orçamento passa de um) fica para o FFmpeg
+    usable = cores[:budget]
+    worker_cores = [usable[i * cpu_threads:(i + 1) * cpu_threads]
+                    for i in range(num_workers)]
+    sobra = usable[num_workers * cpu_threads:]
+    decoder_cores = sobra or usable
+
+    return CpuPlan(budget=budget, num_workers=num_workers, cpu_threads=cpu_threads,
+                   decoder_workers=decoder_workers, worker_cores=worker_cores,
+                   decoder_cores=decoder_cores)
+
+
+def ordenar_maior_primeiro(itens: List, duracoes: List[Optional[float]],
+                           tamanhos: Optional[List[Optional[int]]] = None) -> Tuple[List, Dict, List[Optional[float]]]:
+    """
+    Ordena os itens do mais longo para o mais curto (LPT): com workers puxando
+    de uma fila única, isso é o escalonamento guloso que minimiza o tempo total.
+    Itens sem duração conhecida são estimados pelo tamanho do arquivo e pela
+    taxa de bytes/segundo dos itens conhecidos (sem sondar a mídia de novo).
+    Retorna (itens ordenados, resumo com nº de durações conhecidas/estimadas,
+    duração em segundos de cada item ordenado ou None se não estimável).
+    """
+    tamanhos = tamanhos or [None] * len(itens)
+    taxas = sorted(tam / dur for dur, tam in zip(duracoes, tamanhos) if dur and tam)
+    bytes_por_segundo = taxas[len(taxas) // 2] if taxas else None
+
+    estimativas, chaves, conhecidas, estimadas = [], [], 0, 0
+    for dur, tam in zip(duracoes, tamanhos):
+        chave = dur
+        if dur:
+            conhecidas += 1
+        elif tam and bytes_por_segundo:
+            dur = chave = tam / bytes_por_segundo
+            estimadas += 1
+        elif tam:
+            chave = float(tam)  # sem referência: o tamanho serve só para ordenar
+            estimadas += 1
+        estimativas.append(dur or None)
+        chaves.append(chave or 0.0)
+
+    ordem = sorted(range(len(itens)), key=lambda i: chaves[i], reverse=True)
+    resumo = {'criterio': 'longest', 'conhecidas': conhecidas, 'estimadas': estimadas}
+    return [itens[i] for i in ordem], resumo, [estimativas[i] for i in ordem]
+
+
+def fixar_nucleos(pid: int, cores: List[int]) -> bool:
+    """Fixa um processo (0 = o atual) nos núcleos indicados, quando suportado."""
+    if not cores or not hasattr(os, "sched_setaffinity"):
+        return False
+    try:
+        os.sched_setaffinity(pid, cores)
+        return True
+    except OSError:
+        return False
+
+
+# --- Estado de cada processo worker ---
+_worker_model = None
+
+
+def _init_worker(modelo: str, compute_type: str, cpu_threads: int, slots):
+    """Inicializador do worker: reserva uma fatia de núcleos e carrega o modelo."""
+    global _worker_model
+    try:
+        cores = slots.get_nowait()
+    except Exception:
+        cores = []
+    fixar_nucleos(0, cores)
+
+    from model_registry import registry
+    _worker_model = registry.get(modelo, compute_type, cpu_threads)
+
+
+def _inferir(audio, transcribe_kwargs: dict, media_path: Optional[str] = None, model=None):
+    """
+    Executa a inferência no worker e devolve segmentos serializáveis.
+    Com media_path, cada segmento é gravado no checkpoint (.partial.jsonl) à
+    medida que é decodificado (a inferência retoma de onde parou) e só
+    (nº de segmentos, info) volta pelo pipe entre processos. model substitui
+    o modelo do worker (host compartilhado).
+    """
+    from checkpoint import info_para_dict, segmento_para_dict, transcrever_com_checkpoint
+    from model_registry import transcrever
+
+    def _transcrever(entrada, **kwargs):
+        return transcrever(model or _worker_model, entrada, **kwargs)
+
+    if media_path:
+        return transcrever_com_checkpoint(_transcrever, audio, media_path, transcribe_kwargs)
+    segments, info = _transcrever(audio, **transcribe_kwargs)
+    return [segmento_para_dict(seg) for seg in segments], info_para_dict(info)
+
+
+def _inferir_trecho(fonte, inicio: float, duracao: float, transcribe_kwargs: dict, model=None):
+    """Transcreve uma parte de um arquivo longo (decodificada aqui se fonte for caminho)."""
+    from model_registry import transcrever
+    from split_merge import inferir_trecho
+
+    def _transcrever(entrada, **kwargs):
+        return transcrever(model or _worker_model, entrada, **kwargs)
+
+    return inferir_trecho(_transcrever, fonte, inicio, duracao, transcribe_kwargs)
+
+
+def _pronto() -> bool:
+    return _worker_model is not None
+
+
+def _detectar_idioma(audio, model=None):
+    """Detecção de idioma de uma amostra no modelo do worker."""
+    from model_registry import detectar_idioma
+    return detectar_idioma(model or _worker_model, audio)
+
+
+class _HostCompartilhado:
+    """
+    Objeto que vive no processo host: um WhisperModel com num_workers réplicas
+    do CTranslate2 sobre os mesmos pesos. O gerenciador atende cada conexão
+    numa thread, e o CTranslate2 solta o GIL, então as chamadas rodam em paralelo.
+    """
+
+    def __init__(self, modelo: str, compute_type: str, cpu_threads: int, num_workers: int,
+                 cores: List[int]):
+        fixar_nucleos(0, cores)
+        from model_registry import registry
+        self.model = registry.get(modelo, compute_type, cpu_threads, num_workers=num_workers)
+
+    def inferir(self, audio, transcribe_kwargs: dict, media_path: Optional[str] = None):
+        return _inferir(audio, transcribe_kwargs, media_path, self.model)
+
+    def inferir_trecho(self, fonte, inicio: float, duracao: float, transcribe_kwargs: dict):
+        return _inferir_trecho(fonte, inicio, duracao, transcribe_kwargs, self.model)
+
+    def detectar_idioma(self, audio):
+        return _detectar_idioma(audio, self.model)
+
+    def pid(self) -> int:
+        return os.getpid()
+
+
+class _HostManager(BaseManager):
+    pass
+
+
+_HostManager.register('Host', _HostCompartilhado)
+
+
+class TranscriptionWorkerPool:
+    """
+    Pool de processos de inferência + faixa de threads para o FFmpeg.
+    Cada processo mantém seu modelo carregado enquanto o pool existir.
+    """
+
+    def __init__(self, modelo: str, compute_type: str = "auto", plan: Optional[CpuPlan] = None):
+        self.modelo = modelo
+        self.compute_type = compute_type
+        self.plan = plan or planejar_orcamento_cpu()
+
+        start_method = PERFORMANCE_SETTINGS.get('worker_start_method') or None
+        ctx = multiprocessing.get_context(start_method)
+        slots = ctx.Queue()
+        for cores in self.plan.worker_cores:
+            slots.put(cores)
+
+        self.inference = ProcessPoolExecutor(
+            max_workers=self.plan.num_workers, mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(modelo, compute_type, self.plan.cpu_threads, slots))
+        self.decoders = ThreadPoolExecutor(
+            max_workers=self.plan.decoder_workers, thread_name_prefix="ffmpeg")
+
+    def warm_up(self):
+        """Sobe todos os workers agora (cada um carrega o modelo no inicializador)."""
+        for futuro in [self.inference.submit(_pronto) for _ in range(self.plan.num_workers)]:
+            futuro.result()
+
+    def submit_decode(self, fn, *args, **kwargs):
+        """Agenda trabalho de decodificação (FFmpeg) na faixa de I/O."""
+        return self.decoders.submit(fn, *args, **kwargs)
+
+    def submit_inference(self, audio, media_path: Optional[str] = None, **transcribe_kwargs):
+        """Agenda a inferência Whisper em um worker fixado."""
+        return self.inference.submit(_inferir, audio, transcribe_kwargs, media_path)
+
+    def submit_chunk(self, fonte, inicio: float, duracao: float, **transcribe_kwargs):
+        """Agenda uma parte de um arquivo longo; o Future retorna (segmentos, info) como dicts."""
+        return self.inference.submit(_inferir_trecho, fonte, inicio, duracao, transcribe_kwargs)
+
+    def transcribe(self, audio, **transcribe_kwargs):
+        """Mesma interface de WhisperModel.transcribe, executada em um worker."""
+        segmentos, info = self.submit_inference(
+            audio, None, **transcribe_kwargs).result()
+        return [SimpleNamespace(**seg) for seg in segmentos], SimpleNamespace(**info)
+
+    def transcribe_to_checkpoint(self, audio, media_path: str, **transcribe_kwargs):
+        """Transcreve gravando os segmentos no checkpoint da mídia; retorna (nº de segmentos, info)."""
+        count, info = self.submit_inference(
+            audio, media_path, **transcribe_kwargs).result()
+        return count, SimpleNamespace(**info)
+
+    def detect_language(self, audio):
+        """Detecta o idioma de uma amostra em um worker; retorna (idioma, probabilidade)."""
+        return self.inference.submit(_detectar_idioma, audio).result()
+
+    def shutdown(self, wait: bool = True):
+        self.decoders.shutdown(wait=wait)
+        self.inference.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+class SharedWeightsPool(TranscriptionWorkerPool):
+    """
+    Mesma interface do pool de processos, mas com um só processo de inferência:
+    os pesos são carregados uma vez e as num_workers réplicas os compartilham.
+    O processo fica fixado na união dos núcleos dos workers.
+    """
+
+    def __init__(self, modelo: str, compute_type: str = "auto", plan: Optional[CpuPlan] = None):
+        self.modelo = modelo
+        self.compute_type = compute_type
+        self.plan = plan or planejar_orcamento_cpu()
+
+        start_method = PERFORMANCE_SETTINGS.get('worker_start_method') or None
+        self._manager = _HostManager(ctx=multiprocessing.get_context(start_method))
+        self._manager.start()
+        cores = sorted({core for cores in self.plan.worker_cores for core in cores})
+        # O construtor roda no host: ao retornar, o modelo já está carregado
+        self._host = self._manager.Host(modelo, compute_type, self.plan.cpu_threads,
+                                        self.plan.num_workers, cores)
+        # Uma thread por réplica: cada uma mantém uma chamada em andamento no host
+        self.inference = ThreadPoolExecutor(
+            max_workers=self.plan.num_workers, thread_name_prefix="replica")
+        self.decoders = ThreadPoolExecutor(
+            max_workers=self.plan.decoder_workers, thread_name_prefix="ffmpeg")
+
+    @property
+    def host_pid(self) -> int:
+        return self._host.pid()
+
+    def warm_up(self):
+        """O modelo já foi carregado ao criar o host."""
+
+    def submit_inference(self, audio, media_path: Optional[str] = None, **transcribe_kwargs):
+        return self.inference.submit(self._host.inferir, audio, transcribe_kwargs, media_path)
+
+    def submit_chunk(self, fonte, inicio: float, duracao: float, **transcribe_kwargs):
+        return self.inference.submit(self._host.inferir_trecho, fonte, inicio, duracao, transcribe_kwargs)
+
+    def detect_language(self, audio):
+        return self._host.detectar_idioma(audio)
+
+    def shutdown(self, wait: bool = True):
+        self.decoders.shutdown(wait=wait)
+        self.inference.shutdown(wait=wait)
+        self._manager.shutdown()
+
+
+def classe_do_pool(worker_mode: Optional[str] = None):
+    """Pool de processos (uma cópia do modelo por worker) ou de pesos compartilhados."""
+    worker_mode = worker_mode or PERFORMANCE_SETTINGS.get('worker_mode', 'thread')
+    return SharedWeightsPool if worker_mode == 'shared' else TranscriptionWorkerPool
+
+
+_pools: Dict[Tuple[str, str, int, int, str], TranscriptionWorkerPool] = {}
+# Chamadas em andamento por pool (usar_pool) e pools substituídos que ainda estão em uso
+_em_uso: Dict[TranscriptionWorkerPool, int] = {}
+_aposentados: List[TranscriptionWorkerPool] = []
+_pools_lock = threading.RLock()
+
+
+def _aposentar(pool: TranscriptionWorkerPool):
+    """Encerra o pool agora se ninguém o usa; senão, quando a última chamada sair."""
+    if _em_uso.get(pool):
+        _aposentados.append(pool)
+    else:
+        pool.shutdown(wait=False)
+
+
+def obter_pool(modelo: str, compute_type: str = "auto", plan: Optional[CpuPlan] = None,
+               worker_mode: Optional[str] = None) -> TranscriptionWorkerPool:
+    """Retorna o pool do processo para o modelo/plano/modo, criando-o na primeira chamada."""
+    plan = plan or planejar_orcamento_cpu()
+    worker_mode = worker_mode or PERFORMANCE_SETTINGS.get('worker_mode', 'thread')
+    chave = (modelo, compute_type, plan.cpu_threads, plan.num_workers, worker_mode)
+    with _pools_lock:
+        pool = _pools.get(chave)
+        if pool is None:
+            # Um pool ativo por vez: o anterior sai de cena, mas só encerra quando ocioso
+            for antigo in _pools.values():
+                _aposentar(antigo)
+            _pools.clear()
+            pool = classe_do_pool(worker_mode)(modelo, compute_type, plan)
+            _pools[chave] = pool
+        return pool
+
+
+@contextmanager
+def usar_pool(modelo: str, compute_type: str = "auto", plan: Optional[CpuPlan] = None,
+              worker_mode: Optional[str] = None):
+    """
+    Empresta o pool (obter_pool) enquanto durar o bloco: se outra chamada
+    trocar de modelo ou plano nesse meio-tempo, este pool continua de pé até
+    a última chamada que o usa terminar.
+    """
+    with _pools_lock:
+        pool = obter_pool(modelo, compute_type, plan, worker_mode)
+        _em_uso[pool] = _em_uso.get(pool, 0) + 1
+    try:
+        yield pool
+    finally:
+        with _pools_lock:
+            _em_uso[pool] -= 1
+            if not _em_uso[pool]:
+                del _em_uso[pool]
+                if pool in _aposentados:
+                    _aposentados.remove(pool)
+                    pool.shutdown(wait=False)
+
+
+@atexit.register
+def encerrar_pools():
+    with _pools_lock:
+        for pool in list(_pools.values()) + _aposentados:
+            pool.shutdown(wait=False)
+        _pools.clear()
+        _aposentados.clear()
+        _em_uso.clear()
@@ -0,0 +1,173 @@
+# video_analyzer/v4/embedded_subtitles.py
+"""
+Atalho por legendas embutidas.
+Arquivos MKV/MP4 que já trazem uma faixa de legenda em texto (SRT, ASS,
+mov_text, WebVTT) são transcritos extraindo essa faixa com o FFmpeg, sem
+decodificar o áudio nem rodar o Whisper. A faixa só é usada se estiver no
+idioma esperado e cobrir praticamente a aula inteira; FORCE_WHISPER desliga o atalho.
+"""
+
+import json
+import re
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import DEFAULT_WHISPER_LANGUAGE, FORCE_WHISPER
+from split_merge import duracao_midia
+
+# Codecs de legenda em texto; PGS/DVD/DVB são imagens e exigiriam OCR
+TEXT_CODECS = {'subrip', 'srt', 'ass', 'ssa', 'mov_text', 'webvtt', 'text', 'microdvd'}
+# Menos falas que isso não é transcrição (p.ex. só a tradução de placas)
+MIN_CUES = 10
+# A última fala precisa chegar a essa fração da duração da aula (uma faixa que
+# para no meio deixaria o resto da fala fora da transcrição)
+MIN_COVERAGE = 0.9
+# Códigos ISO 639-2 que o FFmpeg grava nas tags, por código do Whisper
+ISO_639_2 = {
+    'pt': ('por', 'pob', 'pt', 'pt-br'),
+    'en': ('eng', 'en'),
+    'es': ('spa', 'es'),
+    'fr': ('fre', 'fra', 'fr'),
+    'de': ('ger', 'deu', 'de'),
+    'it': ('ita', 'it'),
+}
+UNDETERMINED = ('', 'und', 'unk')
+
+_TEMPO_SRT = re.compile(
+    r'(\d+):(\d{2}):(\d{2})[,.](\d{3})\s*-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{3})')
+# Tags HTML (<i>) e overrides do ASS ({\an8}) que sobram na conversão para SRT
+_MARCACAO = re.compile(r'<[^>]+>|\{[^}]*\}')
+
+
+def atalho_ativo() -> bool:
+    return not FORCE_WHISPER
+
+
+def _segundos(h, m, s, ms) -> float:
+    return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
+
+
+def _idioma_whisper(tag: str) -> Optional[str]:
+    tag = (tag or '').lower()
+    for codigo, tags in ISO_639_2.items():
+        if tag in tags:
+            return codigo
+    return None
+
+
+def faixas_legenda(media_path) -> List[Dict]:
+    """Faixas de legenda da mídia (ffprobe), com codec, idioma e se são texto."""
+    result = subprocess.run([
+        'ffprobe', '-v', 'error', '-select_streams', 's',
+        '-show_entries', 'stream=index,codec_name:stream_tags=language,title'
+                         ':stream_disposition=default,forced,hearing_impaired',
+        '-of', 'json', str(media_path)
+    ], capture_output=True, text=True)
+    if result.returncode != 0:
+        return []
+    faixas = []
+    for stream in json.loads(result.stdout or '{}').get('streams', []):
+        tags = stream.get('tags') or {}
+        disposicao = stream.get('disposition') or {}
+        faixas.append({
+            'index': stream['index'],
+            'codec': stream.get('codec_name'),
+            'language': (tags.get('language') or '').lower(),
+            'title': tags.get('title', ''),
+            'default': bool(disposicao.get('default')),
+            'forced': bool(disposicao.get('forced')),
+            'texto': stream.get('codec_name') in TEXT_CODECS,
+        })
+    return faixas
+
+
+def escolher_faixa(faixas: List[Dict], idioma: Optional[str] = None) -> Optional[Dict]:
+    """
+    Melhor faixa de texto completa (não forçada) no idioma esperado ou sem
+    idioma declarado; entre elas, a padrão e depois a primeira.
+    """
+    if not idioma or idioma == 'auto':
+        idioma = DEFAULT_WHISPER_LANGUAGE if DEFAULT_WHISPER_LANGUAGE != 'auto' else None
+    candidatas = []
+    for faixa in faixas:
+        if not faixa['texto'] or faixa['forced']:
+            continue
+        idioma_faixa = _idioma_whisper(faixa['language'])
+        if idioma and faixa['language'] not in UNDETERMINED and idioma_faixa != idioma:
+            continue  # legenda traduzida, não é a transcrição da fala
+        candidatas.append(faixa)
+    if not candidatas:
+        return None
+    return sorted(candidatas, key=lambda f: (not f['default'], f['index']))[0]
+
+
+def parse_srt(conteudo: str) -> List[Dict]:
+    """Segmentos (start/end/text) de um SRT, juntando as linhas de cada fala."""
+    segmentos = []
+    for bloco in re.split(r'\n\s*\n', conteudo.replace('\r\n', '\n')):
+        linhas = bloco.strip().split('\n')
+        for i, linha in enumerate(linhas):
+            tempo = _TEMPO_SRT.search(linha)
+            if tempo:
+                texto = ' '.join(_MARCACAO.sub('', l).strip() for l in linhas[i + 1:])
+                texto = re.sub(r'\s+', ' ', texto).strip()
+                if texto:
+                    segmentos.append({'start': _segundos(*tempo.groups()[:4]),
+                                      'end': _segundos(*tempo.groups()[4:]),
+                                      'text': ' ' + texto})
+                break
+    segmentos.sort(key=lambda s: s['start'])
+    return segmentos
+
+
+def extrair_faixa(media_path, faixa: Dict) -> List[Dict]:
+    """Extrai só a faixa de legenda (sem decodificar áudio/vídeo) e a converte em segmentos."""
+    result = subprocess.run([
+        'ffmpeg', '-nostdin', '-v', 'error', '-i', str(media_path),
+        '-map', f"0:{faixa['index']}", '-f', 'srt', '-'
+    ], capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors='replace').strip())
+    return parse_srt(result.stdout.decode('utf-8', errors='replace'))
+
+
+def legenda_utilizavel(segmentos: List[Dict], duracao: Optional[float]) -> bool:
+    """Falas suficientes e cobrindo praticamente a aula inteira."""
+    if len(segmentos) < MIN_CUES or not duracao:
+        return False
+    return segmentos[-1]['end'] >= duracao * MIN_COVERAGE
+
+
+def transcricao_da_legenda(media_path, idioma: Optional[str] = None,
+                           duracao: Optional[float] = None,
+                           faixas: Optional[List[Dict]] = None):
+    """
+    (segmentos, info) da melhor faixa embutida utilizável, ou None.
+    faixas pode vir dos metadados do scan para evitar um ffprobe a mais.
+    """
+    if faixas is None:
+        faixas = faixas_legenda(media_path)
+    faixa = escolher_faixa(faixas, idioma)
+    if faixa is None:
+        return None
+    try:
+        segmentos = extrair_faixa(media_path, faixa)
+    except (OSError, RuntimeError) as e:
+        print(f"⚠️ Falha ao extrair a legenda de {Path(media_path).name}: {e}")
+        return None
+    if not duracao:
+        try:
+            duracao = duracao_midia(media_path)  # sem a duração a cobertura não pode ser conferida
+        except (OSError, RuntimeError, ValueError, KeyError):
+            return None
+    if not legenda_utilizavel(segmentos, duracao):
+        return None
+    info = {
+        'language': _idioma_whisper(faixa['language']) or idioma or DEFAULT_WHISPER_LANGUAGE,
+        'duration': duracao or segmentos[-1]['end'],
+        'source': 'subtitle',
+        'subtitle_stream': faixa['index'],
+        'subtitle_codec': faixa['codec'],
+    }
+    return segmentos, info
@@ -4,6 +4,7 @@ Sistema de processamento multi-formato para vídeos, áudios, documentos e legen
 Versão 4.0 - Integração completa com NASCO Analyzer
 """
 from config import OUTPUT_FOLDERS
+from memory_governor import DOCUMENT_MEMORY_FACTOR, governor
 from pathlib import Path
 from typing import Dict, List, Optional, Union, Tuple
 import mimetypes
@@ -227,6 +228,7 @@ class MultiFormatProcessor:
         try:
             if file_type == FileType.VIDEO:
                 metadata.update(self._extract_video_metadata(file_path))
+                metadata.update(self._extract_subtitle_streams(file_path))
             elif file_type == FileType.AUDIO:
                 metadata.update(self._extract_audio_metadata(file_path))
             elif file_type == FileType.DOCUMENT:
@@ -270,6 +272,14 @@ class MultiFormatProcessor:
         except Exception as e:
             return {'error': f"Erro ao ler vídeo: {e}"}
 
+    def _extract_subtitle_streams(self, video_path: Path) -> Dict:
+        """Faixas de legenda embutidas (a transcrição usa as de texto no lugar do Whisper)."""
+        try:
+            from embedded_subtitles import faixas_legenda
+            return {'subtitle_streams': faixas_legenda(video_path)}
+        except Exception:
+            return {}
+
     def _extract_audio_metadata(self, audio_path: Path) -> Dict:
         """Extrai metadados de áudio."""
         try:
@@ -451,7 +461,10 @@ class DocumentExtractor:
 
         extractor = extractors.get(ext)
         if extractor:
-            return extractor(file_path)
+            # PDFs grandes esperam na fila se não couberem em memory_limit_mb
+            tamanho_mb = file_path.stat().st_size / (1024 * 1024)
+            with governor.reserve(tamanho_mb * DOCUMENT_MEMORY_FACTOR, file_path.name):
+                return extractor(file_path)
         else:
             raise ValueError(f"Formato não suportado: {ext}")
 
@@ -0,0 +1,206 @@
+# video_analyzer/v4/language_profiler.py
+"""
+Perfil de idioma por módulo (curso).
+Em vez de detectar o idioma em toda aula, detecta em amostras curtas de
+algumas aulas do módulo, guarda o resultado por pasta e passa o idioma para
+todas as chamadas de transcribe. Aulas cujo idioma diverge do perfil são
+sinalizadas.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from split_merge import carregar_trecho
+from config import (CACHE_DIR, DEFAULT_WHISPER_LANGUAGE, ENABLE_LANGUAGE_DETECTION,
+                    SUPPORTED_AUDIO_FORMATS, SUPPORTED_VIDEO_FORMATS)
+
+SAMPLE_RATE = 16000
+PROFILE_FILE = Path(CACHE_DIR) / "language_profiles.json"
+# Amostra de 30s (uma janela do Whisper) a partir de 1min, pulando vinhetas
+SAMPLE_SECONDS = 30
+SAMPLE_OFFSET_SECONDS = 60
+MAX_SAMPLE_LESSONS = 3
+# Abaixo disso a detecção não é considerada
+MIN_PROBABILITY = 0.5
+# Confiança média (avg_logprob) abaixo disso sugere idioma errado na aula
+SUSPECT_AVG_LOGPROB = -1.0
+
+_lock = threading.Lock()
+
+
+def carregar_amostra(media_path, inicio_s: float = SAMPLE_OFFSET_SECONDS,
+                     duracao_s: float = SAMPLE_SECONDS) -> np.ndarray:
+    """Decodifica só a amostra da mídia (float32, 16kHz, mono)."""
+    amostra = carregar_trecho(media_path, inicio_s, duracao_s)
+    if amostra.size < SAMPLE_RATE and inicio_s > 0:
+        amostra = carregar_trecho(media_path, 0, duracao_s)  # mídia mais curta que o deslocamento
+    return amostra
+
+
+def detectar_idioma(model, audio) -> Tuple[str, float]:
+    """Detecta o idioma com o WhisperModel, com um worker do pool ou no ASR remoto."""
+    from cpu_scheduler import TranscriptionWorkerPool
+    from remote_asr import RemoteASRBackend
+    if isinstance(model, (TranscriptionWorkerPool, RemoteASRBackend)):
+        return model.detect_language(audio)
+    from model_registry import detectar_idioma as detectar_no_modelo
+    return detectar_no_modelo(model, audio)
+
+
+def _carregar_perfis() -> Dict:
+    try:
+        with open(PROFILE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _salvar_perfis(perfis: Dict):
+    PROFILE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = PROFILE_FILE.with_suffix('.json.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(perfis, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, PROFILE_FILE)
+
+
+def _escolher_amostras(midias: List[str]) -> List[str]:
+    """Até MAX_SAMPLE_LESSONS aulas espalhadas pelo módulo (início, meio, fim)."""
+    midias = sorted(set(midias))
+    if len(midias) <= MAX_SAMPLE_LESSONS:
+        return midias
+    passo = (len(midias) - 1) / (MAX_SAMPLE_LESSONS - 1)
+    return [midias[round(i * passo)] for i in range(MAX_SAMPLE_LESSONS)]
+
+
+def _midias_da_pasta(pasta: Path) -> List[str]:
+    extensoes = set(SUPPORTED_VIDEO_FORMATS) | set(SUPPORTED_AUDIO_FORMATS)
+    try:
+        return [str(p) for p in pasta.iterdir() if p.suffix.lower() in extensoes]
+    except OSError:
+        return []
+
+
+class LanguageProfiler:
+    """Detecta e guarda o idioma de cada módulo; sinaliza aulas divergentes."""
+
+    def __init__(self, model, padrao: str = DEFAULT_WHISPER_LANGUAGE,
+                 enabled: bool = ENABLE_LANGUAGE_DETECTION):
+        self.model = model
+        self.padrao = padrao if padrao and padrao != 'auto' else 'pt'
+        self.enabled = enabled
+        self.divergentes: List[Dict] = []
+        # Idioma detectado por mídia (amostras e aulas verificadas)
+        self._por_midia: Dict[str, str] = {}
+
+    def _perfilar(self, pasta: Path, midias: List[str]) -> Optional[Dict]:
+        if len(midias) < MAX_SAMPLE_LESSONS:
+            # Completa com outras aulas da mesma pasta (um módulo pode ter poucas aulas pendentes)
+            midias = midias + _midias_da_pasta(pasta)
+
+        amostras = []
+        for media in _escolher_amostras(midias):
+            try:
+                idioma, prob = detectar_idioma(self.model, carregar_amostra(media))
+            except Exception as e:
+                print(f"⚠️ Detecção de idioma falhou em {Path(media).name}: {e}")
+                continue
+            amostras.append({'media': media, 'language': idioma, 'probability': round(prob, 4)})
+
+        votos = defaultdict(float)
+        for amostra in amostras:
+            if amostra['probability'] >= MIN_PROBABILITY:
+                votos[amostra['language']] += amostra['probability']
+        if not votos:
+            return None
+
+        idioma = max(votos, key=votos.get)
+        vencedoras = [a['probability'] for a in amostras if a['language'] == idioma]
+        return {
+            'language': idioma,
+            'probability': round(sum(vencedoras) / len(vencedoras), 4),
+            'amostras': amostras,
+            'timestamp': time.time(),
+        }
+
+    def idioma_do_modulo(self, midias: Iterable[str]) -> str:
+        """Idioma do módulo (detectado uma vez por pasta e reutilizado)."""
+        midias = [str(m) for m in midias if m]
+        if not self.enabled or not midias:
+            return self.padrao
+
+        pasta = Path(midias[0]).resolve().parent
+        with _lock:
+            perfil = _carregar_perfis().get(str(pasta))
+        if perfil is None:
+            perfil = self._perfilar(pasta, midias)
+            if perfil is None:
+                return self.padrao
+            with _lock:
+                perfis = _carregar_perfis()
+                perfis[str(pasta)] = perfil
+                try:
+                    _salvar_perfis(perfis)
+                except OSError as e:
+                    print(f"⚠️ Não foi possível salvar o perfil de idioma: {e}")
+            print(f"🌐 Idioma de {pasta.name}: {perfil['language']} "
+                  f"({perfil['probability']:.0%}, {len(perfil['amostras'])} amostras)")
+
+        for amostra in perfil['amostras']:
+            if amostra['probability'] >= MIN_PROBABILITY:
+                self._por_midia[amostra['media']] = amostra['language']
+                if amostra['language'] != perfil['language']:
+                    self._sinalizar(amostra['media'], perfil['language'],
+                                    amostra['language'], amostra['probability'])
+        return perfil['language']
+
+    def idioma_conhecido(self, midias: Iterable[str]) -> Optional[str]:
+        """
+        Idioma do módulo sem usar o modelo: o padrão com a detecção desligada,
+        o perfil já salvo da pasta, ou None quando ainda é preciso detectar.
+        """
+        midias = [str(m) for m in midias if m]
+        if not self.enabled or not midias:
+            return self.padrao
+        with _lock:
+            perfil = _carregar_perfis().get(str(Path(midias[0]).resolve().parent))
+        if perfil is None:
+            return None
+        return self.idioma_do_modulo(midias)
+
+    def idioma_da_aula(self, media_path: str, idioma_modulo: str) -> str:
+        """Usa o idioma já detectado da própria aula (amostras divergentes) ou o do módulo."""
+        return self._por_midia.get(str(media_path), idioma_modulo)
+
+    def verificar_aula(self, media_path: str, idioma_usado: str,
+                       avg_logprob: Optional[float]) -> Optional[Dict]:
+        """
+        Com confiança média baixa, detecta o idioma de uma amostra da própria
+        aula; se divergir do usado na transcrição, a aula é sinalizada.
+        """
+        if (not self.enabled or avg_logprob is None or avg_logprob >= SUSPECT_AVG_LOGPROB
+                or str(media_path) in self._por_midia):
+            return None
+        try:
+            idioma, prob = detectar_idioma(self.model, carregar_amostra(media_path))
+        except Exception:
+            return None
+        self._por_midia[str(media_path)] = idioma
+        if idioma != idioma_usado and prob >= MIN_PROBABILITY:
+            return self._sinalizar(media_path, idioma_usado, idioma, prob)
+        return None
+
+    def _sinalizar(self, media_path: str, esperado: str, detectado: str, prob: float) -> Dict:
+        divergencia = {'media': str(media_path), 'esperado': esperado,
+                       'detectado': detectado, 'probability': round(prob, 4)}
+        if divergencia not in self.divergentes:
+            self.divergentes.append(divergencia)
+            print(f"⚠️ Idioma divergente em {Path(media_path).name}: "
+                  f"{detectado} ({prob:.0%}), módulo em {esperado}")
+        return divergencia
@@ -1,7 +1,7 @@
 # video_analyzer/v2.1/main.py
 from analyzer import mapear_modulos, extrair_duracao
 from logger import gerar_relatorios
-from transcriber import transcrever_videos
+from transcription_daemon import submeter_transcricao
 from pathlib import Path
 from datetime import datetime
 import time
@@ -117,8 +117,8 @@ def main():
                 redirect_stdout=True,
                 redirect_stderr=True,
             ) as progress:
-                transcrever_videos(resultado, modelo=modelo, tipo_audio=tipo_audio,
-                                   deletar_audio=deletar_audio, progress=progress)
+                submeter_transcricao(resultado, modelo=modelo, tipo_audio=tipo_audio,
+                                     deletar_audio=deletar_audio, progress=progress)
 
             fim = time.time()
 
@@ -0,0 +1,188 @@
+# video_analyzer/v4/memory_governor.py
+"""
+Controle de admissão por memória.
+Antes de decodificar uma aula, extrair um áudio ou ler um documento grande,
+a tarefa reserva a memória estimada; ela só começa enquanto o RSS projetado
+(processo + filhos: workers e FFmpeg) ficar abaixo de
+PERFORMANCE_SETTINGS['memory_limit_mb']. As demais esperam na fila.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from config import PERFORMANCE_SETTINGS
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+SAMPLE_RATE = 16000
+# Intervalo entre novas medições do RSS enquanto uma tarefa espera
+POLL_SECONDS = 0.5
+# Duração assumida quando não se sabe nada da aula
+DEFAULT_LESSON_SECONDS = 3600
+# Parte do limite destinada às cópias do modelo nos workers
+WORKER_MEMORY_SHARE = 0.75
+# Pico aproximado de um FFmpeg extraindo áudio
+FFMPEG_MEMORY_MB = 100
+# Texto extraído + estruturas do PyMuPDF/python-docx, por MB do documento
+DOCUMENT_MEMORY_FACTOR = 4
+
+
+# Cópias do PCM de uma aula por modo de worker: com threads o array é um só;
+# com processos (ou o host compartilhado) ele existe no processo principal, no
+# buffer de envio e no worker
+PCM_COPIES = {'thread': 1, 'process': 3, 'shared': 3}
+
+
+def copias_pcm(worker_mode: Optional[str]) -> int:
+    return PCM_COPIES.get(worker_mode or 'thread', 3)
+
+
+def estimar_memoria_audio_mb(duracao_s: Optional[float], copias: int = 3) -> float:
+    """PCM float32 16kHz de uma aula, em copias cópias (ver copias_pcm)."""
+    return (duracao_s or DEFAULT_LESSON_SECONDS) * SAMPLE_RATE * 4 * copias / (1024 * 1024)
+
+
+class MemoryGovernor:
+    """Admite tarefas enquanto RSS atual + reservas + estimativa cabem no limite."""
+
+    def __init__(self, limit_mb: Optional[float] = None, poll_seconds: float = POLL_SECONDS):
+        self.limit_mb = float(limit_mb or PERFORMANCE_SETTINGS.get('memory_limit_mb', 4096))
+        self.poll_seconds = poll_seconds
+        self._cond = threading.Condition()
+        self._reservas: Dict[int, Tuple[float, str]] = {}
+        # Memória de longa duração (índices em RAM): conta na projeção, sem reserva nem espera
+        self._fixas: Dict[str, float] = {}
+        self._fixo_na_base_mb = 0.0
+        self._proximo = 0
+        # RSS de base medido quando nenhuma tarefa estava ativa
+        self._base_mb = 0.0
+        self.admitidas = 0
+        self.esperas = 0
+        self.espera_segundos = 0.0
+        self.pico_mb = 0.0
+
+    def rss_mb(self) -> Optional[float]:
+        """RSS do processo somado ao dos filhos (workers do pool, FFmpeg)."""
+        if not PSUTIL_AVAILABLE:
+            return None
+        try:
+            processo = psutil.Process()
+            total = processo.memory_info().rss
+            for filho in processo.children(recursive=True):
+                try:
+                    total += filho.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total / (1024 * 1024)
+        except psutil.Error:
+            return None
+
+    def _projetado_mb(self, estimativa_mb: float) -> float:
+        rss = self.rss_mb()
+        if rss is None:
+            rss = self._base_mb
+        fixo = sum(self._fixas.values())
+        if not self._reservas:
+            self._base_mb = rss
+            self._fixo_na_base_mb = fixo
+        self.pico_mb = max(self.pico_mb, rss)
+        reservado = sum(mb for mb, _ in self._reservas.values())
+        # Reservas ainda não materializadas contam pela estimativa; as que já
+        # alocaram aparecem no RSS (o maior dos dois evita contar em dobro).
+        # A memória fixa que cresceu depois da medida da base também entra.
+        reservado += max(0.0, fixo - self._fixo_na_base_mb)
+        return max(rss, self._base_mb + reservado) + estimativa_mb
+
+    def acquire(self, estimativa_mb: float, rotulo: str = "") -> int:
+        """Bloqueia até a tarefa caber no limite; retorna o token da reserva."""
+        inicio = time.time()
+        avisado = False
+        with self._cond:
+            while True:
+                projetado = self._projetado_mb(estimativa_mb)
+                # Sem nada rodando a tarefa entra de qualquer forma: esperar não liberaria memória
+                if projetado <= self.limit_mb or not self._reservas:
+                    break
+                if not avisado:
+                    self.esperas += 1
+                    avisado = True
+                    print(f"⏳ Memória: {rotulo or 'tarefa'} aguardando "
+                          f"({projetado:.0f}MB projetados > limite {self.limit_mb:.0f}MB)")
+                self._cond.wait(timeout=self.poll_seconds)
+
+            self._proximo += 1
+            token = self._proximo
+            self._reservas[token] = (estimativa_mb, rotulo)
+            self.admitidas += 1
+            if avisado:
+                self.espera_segundos += time.time() - inicio
+            return token
+
+    def release(self, token: Optional[int]):
+        if token is None:
+            return
+        with self._cond:
+            self._reservas.pop(token, None)
+            self._cond.notify_all()
+
+    def contabilizar(self, rotulo: str, memoria_mb: float):
+        """
+        Registra (ou atualiza) memória de longa duração, como a tabela do índice
+        de impressões. Não bloqueia: a memória já existe, só passa a contar na
+        admissão das próximas tarefas.
+        """
+        with self._cond:
+            if memoria_mb > 0:
+                self._fixas[rotulo] = memoria_mb
+            else:
+                self._fixas.pop(rotulo, None)
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(self, estimativa_mb: float, rotulo: str = ""):
+        token = self.acquire(estimativa_mb, rotulo)
+        try:
+            yield token
+        finally:
+            self.release(token)
+
+    def workers_que_cabem(self, memoria_por_worker_mb: float, desejado: int,
+                          memoria_fixa_mb: float = 0.0) -> int:
+        """
+        Quantos workers (cada um com uma cópia do modelo) cabem no limite,
+        deixando WORKER_MEMORY_SHARE do limite para eles e o resto para áudio e
+        documentos. memoria_fixa_mb é a parte paga uma vez só (pesos
+        compartilhados). Não usa o RSS do momento: o resultado é estável entre
+        chamadas e não recria o pool persistente.
+        """
+        if memoria_por_worker_mb <= 0:
+            return desejado
+        disponivel = self.limit_mb * WORKER_MEMORY_SHARE - memoria_fixa_mb
+        return max(1, min(desejado, int(disponivel // memoria_por_worker_mb)))
+
+    def stats(self) -> Dict:
+        with self._cond:
+            reservado = sum(mb for mb, _ in self._reservas.values())
+            ativas = len(self._reservas)
+            fixo = dict(self._fixas)
+        return {
+            'limite_mb': self.limit_mb,
+            'rss_mb': round(self.rss_mb() or 0.0, 1),
+            'pico_mb': round(self.pico_mb, 1),
+            'reservado_mb': round(reservado, 1),
+            'fixo_mb': {rotulo: round(mb, 1) for rotulo, mb in fixo.items()},
+            'ativas': ativas,
+            'admitidas': self.admitidas,
+            'esperas': self.esperas,
+            'espera_segundos': round(self.espera_segundos, 1),
+        }
+
+
+# Instância única do processo
+governor = MemoryGovernor()
@@ -0,0 +1,166 @@
+# video_analyzer/v4/micro_batch.py
+"""
+Micro-lotes de aulas curtas.
+Em cursos com centenas de clipes de 30–90s, o custo fixo por arquivo (spawn
+do FFmpeg, preparação do transcribe, escrita dos arquivos) se aproxima do
+tempo de decodificação. Clipes abaixo de MICRO_BATCH_CLIP_SECONDS e com o
+mesmo idioma são concatenados em um único buffer (com silêncio entre eles e
+os limites de cada um anotados), transcritos em uma passada e os segmentos
+voltam para o checkpoint de cada aula com os tempos do próprio clipe.
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from checkpoint import SAMPLE_RATE, TranscriptionCheckpoint, segmento_para_dict
+from config import PERFORMANCE_SETTINGS
+
+# Silêncio entre clipes: o VAD corta ali e o Whisper fecha o segmento
+GAP_S = 2.0
+
+Trecho = Tuple[float, float]
+
+
+@dataclass
+class LoteCurto:
+    """Clipes curtos transcritos juntos (um item do pipeline)."""
+    aulas: List[Dict]
+    idioma: Optional[str] = None
+    duracao_s: float = 0.0
+    midias: List[str] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.aulas)
+
+
+def agrupar_curtos(aulas: List[Dict], midia_fn: Callable, duracoes: Dict[str, Optional[float]],
+                   idiomas: Dict[str, Optional[str]], limite_s: Optional[float] = None,
+                   alvo_s: Optional[float] = None) -> List:
+    """
+    Itens do pipeline: aulas longas (ou de duração desconhecida) seguem
+    sozinhas, na ordem recebida; clipes curtos do mesmo idioma viram lotes de
+    até alvo_s segundos, no fim da fila. Lote de um clipe só volta a ser aula.
+    """
+    if limite_s is None:
+        limite_s = PERFORMANCE_SETTINGS.get('micro_batch_clip_seconds', 0)
+    if alvo_s is None:
+        alvo_s = PERFORMANCE_SETTINGS.get('micro_batch_target_seconds', 600)
+    if not limite_s:
+        return list(aulas)
+
+    itens, abertos, fechados = [], {}, []
+    for aula_info in aulas:
+        media = midia_fn(aula_info)
+        duracao = duracoes.get(media)
+        if not duracao or duracao > limite_s:
+            itens.append(aula_info)
+            continue
+        idioma = idiomas.get(media)
+        lote = abertos.get(idioma)
+        if lote is not None and lote.duracao_s + GAP_S + duracao > alvo_s:
+            fechados.append(abertos.pop(idioma))
+            lote = None
+        if lote is None:
+            lote = abertos[idioma] = LoteCurto([], idioma)
+        lote.aulas.append(aula_info)
+        lote.midias.append(media)
+        lote.duracao_s += duracao + (GAP_S if len(lote) > 1 else 0.0)
+    fechados.extend(abertos.values())
+
+    for lote in fechados:
+        itens.extend(lote.aulas if len(lote) == 1 else [lote])
+    return itens
+
+
+def concatenar(audios: List[np.ndarray]) -> Tuple[np.ndarray, List[Trecho]]:
+    """Buffer único com GAP_S de silêncio entre os clipes e (início, fim) de cada um."""
+    silencio = np.zeros(int(GAP_S * SAMPLE_RATE), dtype=np.float32)
+    partes, limites, posicao = [], [], 0
+    for i, audio in enumerate(audios):
+        if i:
+            partes.append(silencio)
+            posicao += len(silencio)
+        partes.append(np.asarray(audio, dtype=np.float32))
+        limites.append((posicao / SAMPLE_RATE, (posicao + len(audio)) / SAMPLE_RATE))
+        posicao += len(audio)
+    if not partes:
+        return np.zeros(0, dtype=np.float32), []
+    return np.concatenate(partes), limites
+
+
+def dividir_segmentos(segmentos: Iterable, limites: List[Trecho]) -> List[List[Dict]]:
+    """
+    Segmentos por clipe, nos tempos do clipe. Cada segmento vai para o clipe
+    onde cai o seu meio (o silêncio entre dois clipes é dividido ao meio) e é
+    recortado à duração dele.
+    """
+    por_clipe: List[List[Dict]] = [[] for _ in limites]
+    if not limites:
+        return por_clipe
+    fronteiras = [(fim + inicio_prox) / 2 for (_, fim), (inicio_prox, _) in zip(limites, limites[1:])]
+    for seg in segmentos:
+        seg = segmento_para_dict(seg)
+        meio = (seg['start'] + seg['end']) / 2
+        i = int(np.searchsorted(fronteiras, meio, side='right'))
+        inicio, fim = limites[i]
+        seg['start'] = round(min(max(seg['start'] - inicio, 0.0), fim - inicio), 3)
+        seg['end'] = round(min(max(seg['end'] - inicio, 0.0), fim - inicio), 3)
+        if (seg['text'] or '').strip():
+            por_clipe[i].append(seg)
+    return por_clipe
+
+
+def gravar_checkpoints(midias: List[str], por_clipe: List[List[Dict]], params: Dict):
+    """Grava os segmentos de cada clipe no checkpoint da aula (substitui um antigo)."""
+    for media, segmentos in zip(midias, por_clipe):
+        checkpoint = TranscriptionCheckpoint(media, params)
+        checkpoint.discard()
+        checkpoint.open()
+        try:
+            for seg in segmentos:
+                checkpoint.append(seg)
+        finally:
+            checkpoint.close()
+
+
+def infos_por_clipe(info: Dict, limites: List[Trecho]) -> List[Dict]:
+    """
+    Info de cada clipe: duração própria, fala após o VAD proporcional ao
+    clipe (o VAD rodou no buffer inteiro) e os laços cortados dentro dele.
+    """
+    info = dict(info)
+    lacos = info.pop('runaway', [])
+    total = sum(fim - inicio for inicio, fim in limites) or 1.0
+    fala_total = info.get('duration_after_vad') or total
+    infos = []
+    for inicio, fim in limites:
+        duracao = fim - inicio
+        info_clipe = {
+            **info,
+            'duration': round(duracao, 3),
+            'duration_after_vad': round(min(duracao, fala_total * duracao / total), 3),
+            'resumed_from': 0.0,
+            'micro_batch': len(limites),
+        }
+        proprios = [{**e, 'inicio': round(max(0.0, e['inicio'] - inicio), 3),
+                     'fim': round(min(duracao, e['fim'] - inicio), 3)}
+                    for e in lacos if inicio - GAP_S <= e['inicio'] < fim]
+        if proprios:
+            info_clipe['runaway'] = proprios
+        infos.append(info_clipe)
+    return infos
+
+
+def transcrever_lote(transcribe_fn: Callable, audios: List[np.ndarray], midias: List[str],
+                     params: Dict) -> List[Dict]:
+    """
+    Concatena os clipes, transcreve uma vez e grava o checkpoint de cada aula.
+    transcribe_fn(buffer, params) retorna (segmentos, info) como dicts, como
+    inferir_trecho. Retorna o info de cada clipe.
+    """
+    buffer, limites = concatenar(audios)
+    segmentos, info = transcribe_fn(buffer, params)
+    gravar_checkpoints(midias, dividir_segmentos(segmentos, limites), params)
+    return infos_por_clipe(info, limites)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# video_analyzer/v4/mock_asr_server.py
+"""
+Servidor local que imita o endpoint /audio/transcriptions da OpenAI.
+Serve para testar e medir o backend remoto (remote_asr.py) sem rede e sem
+custo: responde verbose_json com segmentos sintéticos cobrindo o áudio
+enviado, simula latência (fixa + proporcional à duração) e aplica o próprio
+limite de requisições e de envios simultâneos, respondendo 429 com
+Retry-After como a API real. GET /stats devolve os contadores.
+
+Uso:
+    python mock_asr_server.py --port 8765 --latency 0.3 --rtf 0.02
+    ASR_BACKEND=remote REMOTE_ASR_URL=http://127.0.0.1:8765/v1 python main.py
+"""
+
+import argparse
+import io
+import json
+import threading
+import time
+import wave
+from collections import deque
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+# Duração dos segmentos sintéticos (s)
+SEGMENT_S = 5.0
+# Código ISO -> nome devolvido no verbose_json (como a API da OpenAI)
+NOMES = {'pt': 'portuguese', 'en': 'english', 'es': 'spanish', 'fr': 'french',
+         'de': 'german', 'it': 'italian'}
+
+
+def _campos_multipart(content_type: str, corpo: bytes) -> Tuple[Dict[str, str], bytes]:
+    """Campos de texto e bytes do arquivo de um corpo multipart/form-data."""
+    mensagem = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode('utf-8') + corpo)
+    campos, arquivo = {}, b''
+    for parte in mensagem.iter_parts():
+        nome = parte.get_param('name', header='content-disposition')
+        if parte.get_filename():
+            arquivo = parte.get_payload(decode=True) or b''
+        elif nome:
+            campos[nome] = parte.get_payload(decode=True).decode('utf-8')
+    return campos, arquivo
+
+
+def _duracao_wav(dados: bytes) -> float:
+    with wave.open(io.BytesIO(dados), 'rb') as wav:
+        return wav.getnframes() / float(wav.getframerate())
+
+
+def resposta_sintetica(duracao: float, idioma: str) -> Dict:
+    """verbose_json com um segmento a cada SEGMENT_S segundos de áudio."""
+    segmentos, inicio = [], 0.0
+    while inicio < duracao:
+        fim = min(duracao, inicio + SEGMENT_S)
+        segmentos.append({
+            'id': len(segmentos), 'seek': 0, 'start': round(inicio, 2), 'end': round(fim, 2),
+            'text': f" Trecho {len(segmentos) + 1} de {inicio:.0f}s a {fim:.0f}s.",
+            'temperature': 0.0, 'avg_logprob': -0.2, 'compression_ratio': 1.3, 'no_speech_prob': 0.01,
+        })
+        inicio = fim
+    return {'task': 'transcribe', 'language': NOMES.get(idioma, idioma), 'duration': round(duracao, 2),
+            'text': ''.join(s['text'] for s in segmentos), 'segments': segmentos}
+
+
+class MockASRServer(ThreadingHTTPServer):
+    """HTTP com uma thread por conexão; o estado e os limites são do servidor."""
+
+    daemon_threads = True
+
+    def __init__(self, endereco, latencia_s: float = 0.2, rtf: float = 0.0,
+                 requisicoes_por_janela: int = 0, janela_s: float = 3600.0,
+                 max_simultaneas: int = 0, idioma: str = 'pt', api_key: Optional[str] = None):
+        super().__init__(endereco, _Handler)
+        self.latencia_s = latencia_s
+        self.rtf = rtf
+        self.requisicoes_por_janela = requisicoes_por_janela
+        self.janela_s = janela_s
+        self.max_simultaneas = max_simultaneas
+        self.idioma = idioma
+        self.api_key = api_key
+        self._lock = threading.Lock()
+        self._aceitas = deque()
+        self._em_andamento = 0
+        self.contadores = {'requisicoes': 0, 'aceitas': 0, 'recusadas_429': 0,
+                           'pico_simultaneas': 0, 'segundos_audio': 0.0}
+
+    @property
+    def url(self) -> str:
+        host, porta = self.server_address[:2]
+        return f"http://{host}:{porta}/v1"
+
+    def admitir(self) -> Optional[float]:
+        """Reserva um envio; retorna None ou o Retry-After (s) quando passa do limite."""
+        with self._lock:
+            self.contadores['requisicoes'] += 1
+            agora = time.monotonic()
+            while self._aceitas and self._aceitas[0] <= agora - self.janela_s:
+                self._aceitas.popleft()
+            retry = None
+            if self.requisicoes_por_janela and len(self._aceitas) >= self.requisicoes_por_janela:
+                retry = self._aceitas[0] + self.janela_s - agora
+            elif self.max_simultaneas and self._em_andamento >= self.max_simultaneas:
+                retry = max(self.latencia_s, 0.1)
+            if retry is not None:
+                self.contadores['recusadas_429'] += 1
+                return retry
+            self._aceitas.append(agora)
+            self._em_andamento += 1
+            self.contadores['aceitas'] += 1
+            self.contadores['pico_simultaneas'] = max(self.contadores['pico_simultaneas'], self._em_andamento)
+            return None
+
+    def liberar(self, duracao: float):
+        with self._lock:
+            self._em_andamento -= 1
+            self.contadores['segundos_audio'] += duracao
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self.contadores, 'segundos_audio': round(self.contadores['segundos_audio'], 1)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockASRServer
+
+    def log_message(self, *args):
+        pass  # sem uma linha por requisição no terminal
+
+    def _json(self, status: int, dados, cabecalhos: Optional[Dict] = None):
+        corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/stats'):
+            self._json(200, self.server.stats())
+        else:
+            self._json(404, {'error': {'message': 'not found'}})
+
+    def do_POST(self):
+        corpo = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if not self.path.rstrip('/').endswith('/audio/transcriptions'):
+            self._json(404, {'error': {'message': 'not found'}})
+            return
+        if self.server.api_key and self.headers.get('Authorization') != f"Bearer {self.server.api_key}":
+            self._json(401, {'error': {'message': 'invalid api key'}})
+            return
+        try:
+            campos, arquivo = _campos_multipart(self.headers.get('Content-Type', ''), corpo)
+            duracao = _duracao_wav(arquivo)
+        except Exception as e:
+            self._json(400, {'error': {'message': f'invalid request: {e}'}})
+            return
+
+        retry = self.server.admitir()
+        if retry is not None:
+            self._json(429, {'error': {'message': 'rate limit exceeded'}},
+                       {'Retry-After': f"{max(retry, 0.1):.2f}"})
+            return
+        try:
+            time.sleep(self.server.latencia_s + self.server.rtf * duracao)
+        finally:
+            self.server.liberar(duracao)
+
+        resposta = resposta_sintetica(duracao, campos.get('language') or self.server.idioma)
+        formato = campos.get('response_format', 'json')
+        if formato == 'verbose_json':
+            self._json(200, resposta)
+        else:
+            self._json(200, {'text': resposta['text']})
+
+
+def iniciar_mock(host: str = '127.0.0.1', porta: int = 0, **opcoes) -> MockASRServer:
+    """Sobe o servidor numa thread daemon (porta 0 = livre); a URL fica em .url."""
+    servidor = MockASRServer((host, porta), **opcoes)
+    threading.Thread(target=servidor.serve_forever, name="mock-asr", daemon=True).start()
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local /audio/transcriptions para testes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Latência fixa por requisição (s)")
+    parser.add_argument("--rtf", type=float, default=0.02, help="Tempo de resposta por segundo de áudio")
+    parser.add_argument("--requests-per-window", type=int, default=0, help="Limite de requisições (0 = sem)")
+    parser.add_argument("--window-seconds", type=float, default=3600.0)
+    parser.add_argument("--max-concurrent", type=int, default=0, help="Envios simultâneos aceitos (0 = sem)")
+    parser.add_argument("--language", default="pt", help="Idioma quando a requisição não informa")
+    parser.add_argument("--api-key", help="Exige este Bearer token")
+    args = parser.parse_args(argv)
+
+    servidor = MockASRServer((args.host, args.port), args.latency, args.rtf, args.requests_per_window,
+                             args.window_seconds, args.max_concurrent, args.language, args.api_key)
+    print(f"🧪 ASR simulado em {servidor.url} (latência {args.latency}s + {args.rtf}×áudio)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
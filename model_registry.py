@@ -0,0 +1,311 @@
+# video_analyzer/v4/model_registry.py
+"""
+Registro de modelos Whisper compartilhado por todo o processo.
+Mantém instâncias "quentes" chaveadas por (modelo, compute_type, cpu_threads)
+e descarta as ociosas por LRU quando o orçamento de memória é excedido.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from faster_whisper import WhisperModel
+
+try:
+    # Inferência em lotes sobre trechos de fala (faster-whisper >= 1.1)
+    from faster_whisper import BatchedInferencePipeline
+    BATCHED_AVAILABLE = True
+except ImportError:
+    BATCHED_AVAILABLE = False
+
+from config import PERFORMANCE_SETTINGS
+from memory_governor import governor
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+
+# Memória aproximada (MB) de cada modelo em float32; int8 usa ~1/4 disso
+MODEL_MEMORY_MB = {
+    'tiny': 150,
+    'base': 290,
+    'small': 970,
+    'medium': 3000,
+    'large': 6200,
+    'large-v2': 6200,
+    'large-v3': 6200,
+}
+
+# Ativações de uma réplica como fração dos pesos (estimativa; ver benchmark "memoria")
+ACTIVATION_SHARE = 0.2
+ACTIVATION_MIN_MB = 100
+
+# (modelo, compute_type, cpu_threads, demais argumentos do WhisperModel ordenados)
+ModelKey = Tuple[str, str, int, Tuple]
+
+
+@dataclass
+class _ModelEntry:
+    model: WhisperModel
+    memory_mb: float
+    load_seconds: float
+    last_used: float = field(default_factory=time.time)
+    in_use: int = 0
+    # BatchedInferencePipeline do modelo: sai do registro junto com ele
+    pipeline: Optional[object] = None
+
+
+def estimar_memoria_modelo(modelo: str, compute_type: str = "auto") -> float:
+    """Estima a memória (MB) ocupada por um modelo carregado."""
+    base_mb = MODEL_MEMORY_MB.get(modelo, MODEL_MEMORY_MB['small'])
+    if compute_type.startswith("int8"):
+        return base_mb / 4
+    if compute_type in ("float16", "int16", "bfloat16"):
+        return base_mb / 2
+    return base_mb
+
+
+def estimar_memoria_ativacao(modelo: str, compute_type: str = "auto") -> float:
+    """
+    Estima a memória (MB) de uma réplica a mais sobre pesos já carregados
+    (buffers do encoder/decoder e cache de atenção do beam search).
+    """
+    return max(ACTIVATION_MIN_MB, estimar_memoria_modelo(modelo, compute_type) * ACTIVATION_SHARE)
+
+
+def _rss_mb() -> Optional[float]:
+    if not PSUTIL_AVAILABLE:
+        return None
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+class WhisperModelRegistry:
+    """Cache LRU de modelos Whisper com contadores de acerto e tempo de carga."""
+
+    def __init__(self, memory_budget_mb: Optional[float] = None):
+        if memory_budget_mb is None:
+            memory_budget_mb = PERFORMANCE_SETTINGS.get(
+                'whisper_model_cache_mb', 3072)
+        self.memory_budget_mb = memory_budget_mb
+        self._models: "OrderedDict[ModelKey, _ModelEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        # Um lock por chave evita que duas threads carreguem o mesmo modelo
+        self._load_locks: Dict[ModelKey, threading.Lock] = {}
+        # Estimativa dos modelos sendo carregados agora (ainda fora de _models)
+        self._carregando_mb = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_load_seconds = 0.0
+
+    @staticmethod
+    def make_key(modelo: str, compute_type: str = "auto", cpu_threads: int = 0, **model_kwargs) -> ModelKey:
+        # num_workers, device, download_root... também definem a instância carregada
+        return (modelo, compute_type, int(cpu_threads or 0), tuple(sorted(model_kwargs.items())))
+
+    def get(self, modelo: str, compute_type: str = "auto", cpu_threads: int = 0, **model_kwargs) -> WhisperModel:
+        """Retorna um modelo carregado, carregando-o apenas na primeira vez."""
+        key = self.make_key(modelo, compute_type, cpu_threads, **model_kwargs)
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._touch(key, entry)
+                self.hits += 1
+                return entry.model
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # Outra thread pode ter carregado enquanto esperávamos
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._touch(key, entry)
+                    self.hits += 1
+                    return entry.model
+
+            # O modelo conta no governador antes de carregar: um modelo extra no
+            # processo principal (cascata com pool de processos) não aparece em
+            # nenhuma reserva de tarefa
+            estimativa_mb = estimar_memoria_modelo(modelo, compute_type)
+            with self._lock:
+                self._carregando_mb += estimativa_mb
+                self._contabilizar()
+            rss_antes = _rss_mb()
+            inicio = time.time()
+            try:
+                model = WhisperModel(modelo, compute_type=compute_type,
+                                     cpu_threads=int(cpu_threads or 0), **model_kwargs)
+            except Exception:
+                with self._lock:
+                    self._carregando_mb -= estimativa_mb
+                    self._contabilizar()
+                raise
+            load_seconds = time.time() - inicio
+            rss_depois = _rss_mb()
+
+            memory_mb = estimativa_mb
+            if rss_antes is not None and rss_depois is not None and rss_depois > rss_antes:
+                memory_mb = rss_depois - rss_antes
+
+            with self._lock:
+                self.misses += 1
+                self.total_load_seconds += load_seconds
+                self._carregando_mb -= estimativa_mb
+                self._models[key] = _ModelEntry(
+                    model=model, memory_mb=memory_mb, load_seconds=load_seconds)
+                self._evict_if_needed(keep=key)
+                self._contabilizar()
+            return model
+
+    @contextmanager
+    def use(self, modelo: str, compute_type: str = "auto", cpu_threads: int = 0, **model_kwargs):
+        """Empresta um modelo; enquanto em uso ele não é descartado pelo LRU."""
+        model = self.get(modelo, compute_type, cpu_threads, **model_kwargs)
+        key = self.make_key(modelo, compute_type, cpu_threads, **model_kwargs)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                entry.in_use += 1
+        try:
+            yield model
+        finally:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    entry.in_use = max(0, entry.in_use - 1)
+                    entry.last_used = time.time()
+                self._evict_if_needed()
+                self._contabilizar()
+
+    def pipeline_em_lotes(self, model: WhisperModel):
+        """
+        BatchedInferencePipeline do modelo, guardado na entrada do registro:
+        descartar o modelo descarta o pipeline. Modelos fora do registro
+        recebem um pipeline novo (só envolve o modelo, sem carga).
+        """
+        with self._lock:
+            entry = next((e for e in self._models.values() if e.model is model), None)
+            if entry is not None and entry.pipeline is not None:
+                return entry.pipeline
+            pipeline = BatchedInferencePipeline(model=model)
+            if entry is not None:
+                entry.pipeline = pipeline
+            return pipeline
+
+    def _touch(self, key: ModelKey, entry: _ModelEntry):
+        entry.last_used = time.time()
+        self._models.move_to_end(key)
+
+    def _evict_if_needed(self, keep: Optional[ModelKey] = None):
+        """Descarta modelos ociosos menos recentes até caber no orçamento."""
+        while self.memory_in_use_mb() > self.memory_budget_mb:
+            candidato = next((k for k, e in self._models.items()
+                              if k != keep and e.in_use == 0), None)
+            if candidato is None:
+                break
+            del self._models[candidato]
+            self.evictions += 1
+
+    def memory_in_use_mb(self) -> float:
+        return sum(e.memory_mb for e in self._models.values())
+
+    def _contabilizar(self):
+        """Informa ao governador a memória dos modelos do registro (chamar com o lock)."""
+        governor.contabilizar("modelos do registro", self.memory_in_use_mb() + self._carregando_mb)
+
+    def evict(self, modelo: str, compute_type: str = "auto", cpu_threads: int = 0, **model_kwargs) -> bool:
+        """Remove explicitamente um modelo do registro."""
+        with self._lock:
+            key = self.make_key(modelo, compute_type, cpu_threads, **model_kwargs)
+            removido = self._models.pop(key, None) is not None
+            self._contabilizar()
+            return removido
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._contabilizar()
+
+    def stats(self) -> Dict:
+        """Retorna contadores de acerto/erro, tempo de carga e modelos quentes."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'total_load_seconds': self.total_load_seconds,
+                'memory_in_use_mb': self.memory_in_use_mb(),
+                'memory_budget_mb': self.memory_budget_mb,
+                'models': [
+                    {
+                        'modelo': k[0],
+                        'compute_type': k[1],
+                        'cpu_threads': k[2],
+                        'opcoes': dict(k[3]),
+                        'memory_mb': e.memory_mb,
+                        'load_seconds': e.load_seconds,
+                        'in_use': e.in_use,
+                        'idle_seconds': time.time() - e.last_used,
+                    }
+                    for k, e in self._models.items()
+                ],
+            }
+
+
+# Instância única do processo
+registry = WhisperModelRegistry()
+
+
+def obter_modelo_whisper(modelo: str, compute_type: str = "auto", cpu_threads: int = 0) -> WhisperModel:
+    """Atalho para o registro global do processo."""
+    return registry.get(modelo, compute_type, cpu_threads)
+
+
+_aviso_sem_lotes = threading.Event()
+
+
+def obter_pipeline_em_lotes(model: WhisperModel):
+    """Retorna (e reutiliza) o BatchedInferencePipeline de um modelo carregado."""
+    if not BATCHED_AVAILABLE:
+        raise RuntimeError(
+            "Modo em lotes requer faster-whisper >= 1.1 (BatchedInferencePipeline)")
+    return registry.pipeline_em_lotes(model)
+
+
+def transcrever(model: WhisperModel, audio, batch_size: int = 0, **transcribe_kwargs):
+    """
+    Chama model.transcribe, ou o modo em lotes quando batch_size > 0: o áudio é
+    dividido em trechos de fala (VAD) decodificados em lotes de tamanho fixo.
+    Os timestamps retornados continuam absolutos em relação ao áudio de entrada.
+    Sem BatchedInferencePipeline o caminho sequencial é usado, com um aviso
+    (uma vez por processo) para medições não serem atribuídas ao modo em lotes.
+    """
+    if batch_size and batch_size > 0 and isinstance(model, WhisperModel):
+        if BATCHED_AVAILABLE:
+            return obter_pipeline_em_lotes(model).transcribe(
+                audio, batch_size=batch_size, **transcribe_kwargs)
+        if not _aviso_sem_lotes.is_set():
+            _aviso_sem_lotes.set()
+            print(f"⚠️ WHISPER_BATCH_SIZE={batch_size} ignorado: faster-whisper sem "
+                  f"BatchedInferencePipeline (requer >= 1.1), decodificando em sequência")
+    return model.transcribe(audio, **transcribe_kwargs)
+
+
+def detectar_idioma(model: WhisperModel, audio) -> Tuple[str, float]:
+    """
+    Detecta o idioma de uma amostra curta. O faster-whisper detecta o idioma
+    ao chamar transcribe, antes de gerar segmentos: o gerador não é consumido,
+    então nenhuma decodificação acontece.
+    """
+    _, info = model.transcribe(audio, beam_size=1, vad_filter=True)
+    return info.language, float(info.language_probability)
@@ -179,17 +179,29 @@ class TimeEstimator:
 
     @staticmethod
     def estimate_transcription_time(video_paths: List[str]) -> int:
-        """Estima tempo de transcrição baseado na duração dos vídeos."""
+        """
+        Estima tempo de transcrição pela fala (não pela duração bruta): com o VAD,
+        silêncios não passam pelo decodificador. Usa o histórico de transcrições
+        (proporção de fala e segundos de processamento por segundo de fala).
+        """
+        from transcription_stats import fator_processamento_fala, proporcao_fala_media, relatorio_aula
+
+        # Whisper é ~10-20% da duração do áudio decodificado
+        fator = fator_processamento_fala(padrao=0.15)
+        proporcao_fala = proporcao_fala_media()
         total_seconds = 0
 
         for video_path in video_paths:
             try:
-                # Usar ffprobe para duração rápida
-                from analyzer import extrair_duracao
-                duration = extrair_duracao(video_path)
-                if duration:
-                    # Whisper é ~10-20% da duração real do vídeo
-                    total_seconds += int(duration * 0.15)
+                conhecido = relatorio_aula(video_path)
+                if conhecido:
+                    fala = conhecido['fala_s']
+                else:
+                    # Usar ffprobe para duração rápida
+                    from analyzer import extrair_duracao
+                    fala = (extrair_duracao(video_path) or 0) * proporcao_fala
+                if fala:
+                    total_seconds += int(fala * fator)
             except:
                 # Fallback: estimar 2 minutos por vídeo
                 total_seconds += 120
@@ -247,6 +259,58 @@ def check_cancellation() -> bool:
     return st.session_state.get('cancel_processing', False)
 
 
+def _log_relatorio(report: Dict, logger: ProcessingLogger, rotulo: str):
+    """Registra no log o relatório de uma chamada de transcrição (por aula quando possível)."""
+    for vad in report.get('vad', []):
+        logger.info(
+            f"Fala: {vad.get('stem')}",
+            f"{vad['fala_s']:.0f}s de fala em {vad['total_s']:.0f}s "
+            f"({vad['silencio_s']:.0f}s de silêncio pulados)")
+    for divergente in (report.get('idiomas') or {}).get('divergentes', []):
+        logger.warning(
+            f"Idioma divergente: {Path(divergente['media']).name}",
+            f"detectado {divergente['detectado']} ({divergente['probability']:.0%}), "
+            f"módulo em {divergente['esperado']}")
+    cascata = report.get('cascata')
+    if cascata:
+        logger.info(
+            f"Cascata: {rotulo}",
+            f"{cascata['proporcao_escalada']:.1%} do áudio redecodificado "
+            f"({cascata['tempo_escalada_s']:.1f}s), ~{cascata['economia_s']:.0f}s economizados")
+    cache = report.get('cache')
+    if cache and cache['hits']:
+        logger.info(
+            f"Cache de transcrições: {rotulo}",
+            f"{cache['hits']} aproveitadas, {cache['entries']} no cache "
+            f"({cache['size_mb']:.0f}/{cache['max_size_mb']:.0f} MB)")
+    vinhetas = report.get('vinhetas')
+    if vinhetas and vinhetas['aulas']:
+        logger.info(
+            f"Vinhetas: {rotulo}",
+            f"{vinhetas.get('segundos_retirados', vinhetas['segundos_economizados']):.0f}s de intro/outro "
+            f"{'fora do Whisper e do texto' if vinhetas['segundos_economizados'] else 'fora do texto (sem VAD)'} "
+            f"em {vinhetas['aulas']} aula(s)")
+    for duplicata in report.get('duplicatas', []):
+        logger.info(
+            f"Aula repetida: {Path(duplicata['media']).stem}",
+            f"transcrição reaproveitada de {Path(duplicata['origem']).name} "
+            f"(deslocamento {-duplicata['offset_s']:+.2f}s)")
+    legendas = report.get('legendas')
+    if legendas and legendas['aulas']:
+        logger.info(
+            f"Legenda embutida: {rotulo}",
+            f"{legendas['aulas']} aula(s) transcritas pela faixa de legenda "
+            f"em {legendas['segundos']:.1f}s, sem Whisper")
+    if report.get('stages') and report['stages']['infer']['items']:
+        stages = report['stages']
+        logger.info(
+            f"Pipeline {rotulo}: gargalo {report['bottleneck']}",
+            f"decode {stages['decode']['busy_seconds']:.1f}s, "
+            f"infer {stages['infer']['busy_seconds']:.1f}s "
+            f"(parado {stages['infer']['starved_seconds']:.1f}s), "
+            f"write {stages['write']['busy_seconds']:.1f}s")
+
+
 def transcribe_videos_orchestrated(missing_transcriptions: List[Tuple[str, Dict]],
                                    progress_tracker: AdvancedProgressTracker,
                                    logger: ProcessingLogger) -> bool:
@@ -267,55 +331,63 @@ def transcribe_videos_orchestrated(missing_transcriptions: List[Tuple[str, Dict]
 
     progress_tracker.start_phase(2, len(missing_transcriptions))
 
-    # Preparar estrutura para transcrever_videos
+    # Preparar estrutura para submeter_transcricao (daemon ou no próprio processo)
     items_to_transcribe = {}
     for module_name, aula in missing_transcriptions:
         if module_name not in items_to_transcribe:
             items_to_transcribe[module_name] = []
         items_to_transcribe[module_name].append(aula)
 
-    # Transcrever com progresso manual
+    # Uma chamada por módulo: o pipeline sobrepõe decodificação e inferência das aulas,
+    # e o perfil de idioma e as vinhetas são montados uma vez por pasta
+    from transcription_daemon import submeter_transcricao
     completed = 0
     errors = []
 
     for module_name, aulas_list in items_to_transcribe.items():
-        for aula in aulas_list:
-            if check_cancellation():
-                logger.warning("Transcrição cancelada pelo usuário")
-                return False
+        if check_cancellation():
+            logger.warning("Transcrição cancelada pelo usuário")
+            return False
 
-            try:
-                # Atualizar progresso
-                remaining_items = len(missing_transcriptions) - completed
-                eta = int((remaining_items * estimated_time) /
-                          len(missing_transcriptions))
-
-                progress_tracker.update_phase_progress(
-                    completed,
-                    f"{aula['stem']}.mp4",
-                    eta
-                )
-
-                # Usar função de transcrição existente
-                from transcriber import transcrever_videos
-                single_item = {module_name: [aula]}
-
-                # Transcrever arquivo individual
-                result = transcrever_videos(
-                    single_item,
-                    modelo=st.session_state.get('whisper_model', 'small'),
-                    tipo_audio='mp3',
-                    deletar_audio=True
-                )
-
-                completed += 1
-                logger.success(f"Transcrito: {aula['stem']}")
+        remaining_items = len(missing_transcriptions) - completed
+        eta = int((remaining_items * estimated_time) /
+                  len(missing_transcriptions))
+        progress_tracker.update_phase_progress(
+            completed,
+            f"{module_name} ({len(aulas_list)} aulas)",
+            eta
+        )
 
-            except Exception as e:
-                error_msg = f"Erro ao transcrever {aula['stem']}: {str(e)}"
-                logger.error(error_msg, traceback.format_exc()[:200])
+        try:
+            # Daemon de transcrição se estiver no ar (modelo já quente); senão, neste processo
+            result = submeter_transcricao(
+                {module_name: aulas_list},
+                modelo=st.session_state.get('whisper_model', 'small'),
+                tipo_audio='mp3',
+                deletar_audio=True
+            )
+            _log_relatorio(result or {}, logger, module_name)
+        except Exception as e:
+            error_msg = f"Erro ao transcrever o módulo {module_name}: {str(e)}"
+            logger.error(error_msg, traceback.format_exc()[:200])
+            errors.append(error_msg)
+
+        # Falhas de uma aula não interrompem o módulo: o .txt gerado indica o resultado
+        for aula in aulas_list:
+            if Path(aula['video_path']).with_suffix('.txt').exists():
+                logger.success(f"Transcrito: {aula['stem']}")
+            else:
+                error_msg = f"Erro ao transcrever {aula['stem']}: transcrição não gerada"
+                logger.error(error_msg)
                 errors.append(error_msg)
-                completed += 1  # Continuar mesmo com erro
+            completed += 1
+
+    # Estatísticas do registro de modelos (cargas vs. reutilizações)
+    from model_registry import registry as model_registry
+    stats = model_registry.stats()
+    logger.info(
+        f"Modelos Whisper: {stats['misses']} cargas ({stats['total_load_seconds']:.1f}s), "
+        f"{stats['hits']} reutilizações, {stats['evictions']} descartes")
 
     # Relatório final da transcrição
     if errors:
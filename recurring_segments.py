@@ -0,0 +1,283 @@
+# video_analyzer/v4/recurring_segments.py
+"""
+Vinhetas de abertura e encerramento repetidas entre as aulas de um módulo.
+As impressões espectrais do começo e do fim de algumas aulas são alinhadas
+entre si; o trecho que se repete na maioria delas vira um modelo (intro ou
+outro), guardado por pasta. Em cada aula o modelo é localizado e o trecho
+correspondente é silenciado antes do Whisper e retirado da transcrição.
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_fingerprint import _BYTE_BITS, fingerprint_index, impressao, quadros_por_segundo
+from config import CACHE_DIR, RECURRING_SETTINGS
+from language_profiler import _midias_da_pasta
+from split_merge import carregar_trecho, duracao_midia
+
+SAMPLE_RATE = 16000
+TEMPLATES_DIR = Path(CACHE_DIR) / "recurring"
+# Trecho inicial/final de cada aula onde as vinhetas são procuradas
+EDGE_SECONDS = 120
+# Aulas comparadas para montar os modelos
+MAX_SAMPLE_LESSONS = 6
+# Janela de suavização da taxa de erro por quadro (~1s)
+SMOOTH_FRAMES = 16
+# Quadro "igual" quando a taxa de erro suavizada fica abaixo disso
+FRAME_MAX_BER = 0.35
+# O modelo precisa aparecer em pelo menos essa fração das outras aulas
+MIN_SHARE = 0.5
+# Uma aula só tem a vinheta se casar com essa fração do modelo
+MIN_TEMPLATE_MATCH = 0.8
+# Folga nas bordas do trecho (a suavização espalha o casamento por ~meia janela)
+EDGE_MARGIN_S = 0.5
+
+Trecho = Tuple[float, float]
+_lock = threading.Lock()
+
+
+def _erros_por_quadro(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Taxa de erro de bits de cada par de quadros alinhados, suavizada."""
+    erros = _BYTE_BITS[np.bitwise_xor(a, b).view(np.uint8)].reshape(-1, 4).sum(axis=1) / 32
+    if len(erros) < SMOOTH_FRAMES:
+        return erros
+    return np.convolve(erros, np.ones(SMOOTH_FRAMES) / SMOOTH_FRAMES, mode='same')
+
+
+def alinhar(a: np.ndarray, b: np.ndarray) -> Optional[int]:
+    """Deslocamento d (quadro de b = quadro de a + d) com mais códigos idênticos, ou None."""
+    if len(a) == 0 or len(b) == 0:
+        return None
+    ordem = np.argsort(b, kind='stable')
+    b_ordenado = b[ordem]
+    esquerda = np.searchsorted(b_ordenado, a, side='left')
+    direita = np.searchsorted(b_ordenado, a, side='right')
+    deslocamentos = [ordem[e:d] - i for i, (e, d) in enumerate(zip(esquerda, direita)) if 0 < d - e <= 8]
+    if not deslocamentos:
+        return None
+    deslocamentos = np.concatenate(deslocamentos)
+    valores, votos = np.unique(deslocamentos, return_counts=True)
+    melhor = int(np.argmax(votos))
+    return int(valores[melhor]) if votos[melhor] >= 3 else None
+
+
+def _casamento(a: np.ndarray, b: np.ndarray, deslocamento: int) -> np.ndarray:
+    """Máscara (nas coordenadas de a) dos quadros de a que casam com b alinhado."""
+    mascara = np.zeros(len(a), dtype=bool)
+    inicio_a = max(0, -deslocamento)
+    inicio_b = max(0, deslocamento)
+    n = min(len(a) - inicio_a, len(b) - inicio_b)
+    if n > 0:
+        mascara[inicio_a:inicio_a + n] = _erros_por_quadro(
+            a[inicio_a:inicio_a + n], b[inicio_b:inicio_b + n]) < FRAME_MAX_BER
+    return mascara
+
+
+def _maior_sequencia(mascara: np.ndarray) -> Tuple[int, int]:
+    """(início, fim) da maior sequência de True; (0, 0) se não houver."""
+    bordas = np.flatnonzero(np.diff(np.concatenate(([0], mascara.astype(np.int8), [0]))))
+    if len(bordas) == 0:
+        return 0, 0
+    inicios, fins = bordas[::2], bordas[1::2]
+    k = int(np.argmax(fins - inicios))
+    return int(inicios[k]), int(fins[k])
+
+
+def montar_modelo(impressoes: List[np.ndarray]) -> Optional[np.ndarray]:
+    """
+    Trecho que se repete na maioria das impressões (uma por aula). Tenta as
+    primeiras aulas como referência até achar um trecho longo o bastante.
+    """
+    minimo = int(RECURRING_SETTINGS['min_seconds'] * quadros_por_segundo())
+    for r, referencia in enumerate(impressoes[:3]):
+        outras = [imp for j, imp in enumerate(impressoes) if j != r]
+        if not outras or len(referencia) < minimo:
+            continue
+        contagem = np.zeros(len(referencia), dtype=np.int32)
+        for outra in outras:
+            deslocamento = alinhar(referencia, outra)
+            if deslocamento is not None:
+                contagem += _casamento(referencia, outra, deslocamento)
+        inicio, fim = _maior_sequencia(contagem >= max(1, np.ceil(MIN_SHARE * len(outras))))
+        if fim - inicio >= minimo:
+            return referencia[inicio:fim]
+    return None
+
+
+def localizar(modelo: np.ndarray, codigos: np.ndarray) -> Optional[Tuple[int, int]]:
+    """(quadro inicial, final) do modelo dentro da impressão da aula, ou None."""
+    deslocamento = alinhar(modelo, codigos)
+    if deslocamento is None:
+        return None
+    inicio, fim = _maior_sequencia(_casamento(modelo, codigos, deslocamento))
+    if fim - inicio < MIN_TEMPLATE_MATCH * len(modelo):
+        return None
+    return inicio + deslocamento, fim + deslocamento
+
+
+class RecurringSegmentDetector:
+    """Monta (uma vez por pasta) os modelos de intro/outro e os localiza em cada aula."""
+
+    def __init__(self, enabled: bool = RECURRING_SETTINGS['enabled']):
+        self.enabled = enabled
+        self.root = TEMPLATES_DIR
+        self._por_pasta: Dict[str, Dict[str, np.ndarray]] = {}
+
+    def _arquivo(self, pasta: Path) -> Path:
+        return self.root / f"{hashlib.sha1(str(pasta).encode()).hexdigest()[:16]}.npz"
+
+    def _bordas(self, media_path: str, duracao: Optional[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Impressões do começo e do fim da aula. Aulas já transcritas têm a impressão
+        inteira no índice; nas demais só esses trechos são decodificados.
+        """
+        codigos = fingerprint_index.impressao_de(media_path)
+        if codigos is not None and len(codigos):
+            fps = quadros_por_segundo()
+            inicio_cauda = max(0.0, len(codigos) / fps - EDGE_SECONDS)
+            return codigos[:int(EDGE_SECONDS * fps)], codigos[int(inicio_cauda * fps):]
+        duracao = duracao or duracao_midia(media_path)
+        cabeca = impressao(carregar_trecho(media_path, 0, EDGE_SECONDS))
+        cauda = impressao(carregar_trecho(media_path, max(0.0, duracao - EDGE_SECONDS), EDGE_SECONDS))
+        return cabeca, cauda
+
+    def _montar(self, pasta: Path, midias: List[str],
+                duracoes: Dict[str, Optional[float]]) -> Dict[str, np.ndarray]:
+        arquivo = self._arquivo(pasta)
+        if len(midias) < MAX_SAMPLE_LESSONS:
+            # Completa com outras aulas da pasta (um módulo pode ter poucas aulas pendentes)
+            midias = sorted(set(midias) | set(_midias_da_pasta(pasta)))
+        else:
+            midias = sorted(midias)
+        with _lock:
+            if arquivo.exists():
+                try:
+                    with np.load(arquivo) as dados:
+                        amostras = int(dados['amostras']) if 'amostras' in dados.files else MAX_SAMPLE_LESSONS
+                        # Montado com poucas aulas e a pasta cresceu: monta de novo com mais amostras
+                        if amostras >= min(MAX_SAMPLE_LESSONS, len(midias)):
+                            return {nome: dados[nome] for nome in ('intro', 'outro')
+                                    if nome in dados.files and len(dados[nome])}
+                except (OSError, ValueError):
+                    pass
+
+        passo = max(1, len(midias) // MAX_SAMPLE_LESSONS)
+        amostra = midias[::passo][:MAX_SAMPLE_LESSONS]
+        cabecas, caudas = [], []
+        for media in amostra:
+            try:
+                cabeca, cauda = self._bordas(media, duracoes.get(media))
+            except Exception as e:
+                print(f"⚠️ Vinhetas: não foi possível ler {Path(media).name}: {e}")
+                continue
+            cabecas.append(cabeca)
+            caudas.append(cauda)
+
+        if len(cabecas) < 2:
+            return {}  # aulas insuficientes por enquanto: tenta de novo quando houver mais
+        modelos = {}
+        for nome, impressoes in (('intro', cabecas), ('outro', caudas)):
+            modelo = montar_modelo(impressoes)
+            if modelo is not None:
+                modelos[nome] = modelo
+        with _lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = arquivo.with_name(arquivo.stem + '.tmp.npz')
+            # Pasta sem vinhetas também fica registrada (arrays vazios), junto com o tamanho
+            # da amostra: só refaz a análise quando a pasta crescer além dela
+            np.savez(tmp, intro=modelos.get('intro', np.zeros(0, np.uint32)),
+                     outro=modelos.get('outro', np.zeros(0, np.uint32)),
+                     amostras=np.array(len(amostra)))
+            os.replace(tmp, arquivo)
+        for nome, modelo in modelos.items():
+            print(f"🔁 {nome.capitalize()} recorrente em {pasta.name}: "
+                  f"{len(modelo) / quadros_por_segundo():.0f}s")
+        return modelos
+
+    def preparar(self, midias: List[str], duracoes: Optional[Dict[str, Optional[float]]] = None) -> int:
+        """Monta os modelos das pastas das mídias; retorna quantas pastas têm vinhetas."""
+        if not self.enabled:
+            return 0
+        por_pasta: Dict[Path, List[str]] = {}
+        for media in midias:
+            por_pasta.setdefault(Path(media).resolve().parent, []).append(media)
+        for pasta, midias_pasta in por_pasta.items():
+            if str(pasta) not in self._por_pasta:
+                self._por_pasta[str(pasta)] = self._montar(pasta, midias_pasta, duracoes or {})
+        return sum(1 for pasta in por_pasta if self._por_pasta.get(str(pasta)))
+
+    def tem_modelos(self, media_path: str) -> bool:
+        return self.enabled and bool(self._por_pasta.get(str(Path(media_path).resolve().parent)))
+
+    def identidade(self, media_path: str) -> Optional[str]:
+        """
+        Hash dos modelos da pasta e dos parâmetros do corte, ou None quando nada
+        é cortado. Entra na chave do cache: a mesma aula com outro modelo (ou sem
+        corte) tem outra transcrição.
+        """
+        if not self.tem_modelos(media_path):
+            return None
+        modelos = self._por_pasta[str(Path(media_path).resolve().parent)]
+        h = hashlib.sha256(f"{EDGE_SECONDS}:{EDGE_MARGIN_S}:{MIN_TEMPLATE_MATCH}".encode())
+        for nome in sorted(modelos):
+            h.update(nome.encode())
+            h.update(np.ascontiguousarray(modelos[nome]).tobytes())
+        return h.hexdigest()[:16]
+
+    def trechos_no_audio(self, media_path: str, audio: np.ndarray,
+                         codigos: Optional[np.ndarray] = None) -> List[Trecho]:
+        """
+        Trechos (início, fim em s) da aula onde as vinhetas da pasta aparecem,
+        a partir do áudio já decodificado. codigos = impressão da aula inteira,
+        se já calculada (evita refazer a das bordas).
+        """
+        modelos = self._por_pasta.get(str(Path(media_path).resolve().parent))
+        if not self.enabled or not modelos:
+            return []
+        fps = quadros_por_segundo()
+        borda = int(EDGE_SECONDS * SAMPLE_RATE)
+        inicio_cauda = max(0, len(audio) - borda)
+        if codigos is not None:
+            quadro_cauda = int(inicio_cauda / SAMPLE_RATE * fps)
+            cabeca, cauda = codigos[:int(EDGE_SECONDS * fps)], codigos[quadro_cauda:]
+            base_cauda = quadro_cauda / fps
+        else:
+            cabeca, cauda = impressao(audio[:borda]), impressao(audio[inicio_cauda:])
+            base_cauda = inicio_cauda / SAMPLE_RATE
+
+        trechos = []
+        for nome, impressao_borda, base in (('intro', cabeca, 0.0), ('outro', cauda, base_cauda)):
+            if nome not in modelos:
+                continue
+            local = localizar(modelos[nome], impressao_borda)
+            if local is not None:
+                inicio = base + max(0, local[0]) / fps + EDGE_MARGIN_S
+                fim = base + local[1] / fps - EDGE_MARGIN_S
+                if fim > inicio:
+                    trechos.append((round(inicio, 2), round(fim, 2)))
+        return trechos
+
+
+def silenciar(audio: np.ndarray, trechos: List[Trecho]) -> np.ndarray:
+    """Zera os trechos no áudio (o VAD os descarta antes do decodificador)."""
+    for inicio, fim in trechos:
+        audio[int(inicio * SAMPLE_RATE):int(fim * SAMPLE_RATE)] = 0.0
+    return audio
+
+
+def fora_dos_trechos(segmentos, trechos: List[Trecho]):
+    """Segmentos cujo meio não cai em nenhum trecho recorrente."""
+    for seg in segmentos:
+        meio = (seg['start'] + seg['end']) / 2
+        if not any(inicio <= meio < fim for inicio, fim in trechos):
+            yield seg
+
+
+def segundos_economizados(trechos_por_midia: Dict[str, List[Trecho]]) -> float:
+    return round(sum(fim - inicio for trechos in trechos_por_midia.values()
+                     for inicio, fim in trechos), 1)
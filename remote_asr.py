@@ -0,0 +1,332 @@
+# video_analyzer/v4/remote_asr.py
+"""
+Backend de ASR remoto (endpoint /audio/transcriptions compatível com a OpenAI).
+Em VMs pequenas o Whisper local é o gargalo. Com ASR_BACKEND=remote a
+inferência sai da máquina: o áudio 16kHz da aula é cortado em trechos de
+REMOTE_ASR_CHUNK_SECONDS (num ponto de silêncio), enviados em paralelo como
+WAV e os segmentos voltam com os tempos da aula. O backend segue o mesmo
+contrato do WhisperModel e do pool de workers — transcribe(audio, **kwargs)
+retorna (segmentos, info) e detect_language(audio) retorna (idioma,
+probabilidade) —, então checkpoint, guarda de laços, micro-lotes e cache
+funcionam sem mudança. Os envios respeitam
+RATE_LIMITS['whisper_requests_per_hour'] (janela deslizante) e o Retry-After
+de respostas 429. mock_asr_server.py é um servidor local para testes e
+benchmarks.
+"""
+
+import io
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import wave
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+from checkpoint import SAMPLE_RATE, _recortar_audio
+from config import ASR_BACKEND, RATE_LIMITS, REMOTE_ASR_SETTINGS
+
+# Backends disponíveis em ASR_BACKEND
+BACKENDS = ('faster_whisper', 'remote')
+# Janela (s) antes do limite do trecho onde se procura o silêncio para cortar
+CUT_SEARCH_S = 5.0
+# Quadro (s) usado para medir a energia na busca do corte
+CUT_FRAME_S = 0.1
+# Áudio enviado para detectar o idioma (s): o suficiente para o Whisper, sem gastar uma aula
+DETECT_SECONDS = 30
+# Respostas que valem nova tentativa (limite de taxa e falhas do servidor)
+RETRY_STATUS = (408, 429, 500, 502, 503, 504)
+# Nome do idioma no verbose_json da OpenAI -> código ISO usado no resto do pipeline
+NOMES_IDIOMAS = {
+    'portuguese': 'pt', 'english': 'en', 'spanish': 'es', 'french': 'fr',
+    'german': 'de', 'italian': 'it', 'dutch': 'nl', 'russian': 'ru',
+    'japanese': 'ja', 'chinese': 'zh', 'korean': 'ko', 'arabic': 'ar',
+    'hindi': 'hi', 'turkish': 'tr', 'polish': 'pl', 'ukrainian': 'uk',
+    'catalan': 'ca', 'galician': 'gl', 'swedish': 'sv', 'hebrew': 'he',
+}
+
+
+def backend_configurado() -> str:
+    """ASR_BACKEND normalizado (faster_whisper quando o valor é desconhecido)."""
+    backend = (ASR_BACKEND or '').strip().lower().replace('-', '_')
+    if backend in ('openai', 'remoto'):
+        backend = 'remote'
+    if backend not in BACKENDS:
+        if backend:
+            print(f"⚠️ ASR_BACKEND '{ASR_BACKEND}' desconhecido: usando faster_whisper")
+        return 'faster_whisper'
+    return backend
+
+
+def codigo_idioma(idioma: Optional[str]) -> Optional[str]:
+    """Código ISO do idioma devolvido pelo servidor ('portuguese' ou 'pt')."""
+    if not idioma:
+        return None
+    idioma = idioma.strip().lower()
+    return NOMES_IDIOMAS.get(idioma, idioma)
+
+
+class LimiteDeRequisicoes:
+    """
+    No máximo `limite` envios por `janela_s` (janela deslizante), com pausa
+    global quando o servidor pede Retry-After. limite 0 desliga a contagem.
+    """
+
+    def __init__(self, limite: int, janela_s: float = 3600.0):
+        self.limite = int(limite or 0)
+        self.janela_s = janela_s
+        self._envios = deque()
+        self._bloqueado_ate = 0.0
+        self._lock = threading.Lock()
+        self.espera_s = 0.0
+
+    def adquirir(self):
+        """Bloqueia até o próximo envio caber no limite e o registra."""
+        inicio = time.monotonic()
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                while self._envios and self._envios[0] <= agora - self.janela_s:
+                    self._envios.popleft()
+                espera = self._bloqueado_ate - agora
+                if espera <= 0 and self.limite and len(self._envios) >= self.limite:
+                    espera = self._envios[0] + self.janela_s - agora
+                if espera <= 0:
+                    self._envios.append(agora)
+                    self.espera_s += agora - inicio
+                    return
+            time.sleep(min(espera, 1.0))
+
+    def pausar(self, segundos: float):
+        """Nenhum envio nos próximos `segundos` (Retry-After de um 429)."""
+        with self._lock:
+            self._bloqueado_ate = max(self._bloqueado_ate, time.monotonic() + segundos)
+
+
+def _wav_bytes(audio: np.ndarray) -> bytes:
+    """PCM float32 16kHz -> WAV s16le mono em memória."""
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def _multipart(campos: Dict[str, str], arquivo: bytes, nome_arquivo: str) -> Tuple[bytes, str]:
+    """Corpo multipart/form-data com os campos e o arquivo; retorna (corpo, content-type)."""
+    fronteira = uuid.uuid4().hex
+    partes = []
+    for nome, valor in campos.items():
+        partes.append(f'--{fronteira}\r\nContent-Disposition: form-data; name="{nome}"\r\n\r\n'
+                      f'{valor}\r\n'.encode('utf-8'))
+    partes.append(f'--{fronteira}\r\nContent-Disposition: form-data; name="file"; '
+                  f'filename="{nome_arquivo}"\r\nContent-Type: audio/wav\r\n\r\n'.encode('utf-8'))
+    partes.append(arquivo)
+    partes.append(f'\r\n--{fronteira}--\r\n'.encode('utf-8'))
+    return b''.join(partes), f'multipart/form-data; boundary={fronteira}'
+
+
+def pontos_de_corte(audio: np.ndarray, trecho_s: float) -> List[int]:
+    """
+    Amostras onde o áudio é cortado em trechos de até trecho_s: em cada
+    limite, o quadro de menor energia nos CUT_SEARCH_S anteriores (uma pausa,
+    em vez do meio de uma palavra).
+    """
+    passo = int(trecho_s * SAMPLE_RATE)
+    if passo <= 0 or len(audio) <= passo:
+        return [0, len(audio)]
+    quadro = int(CUT_FRAME_S * SAMPLE_RATE)
+    busca = int(CUT_SEARCH_S * SAMPLE_RATE)
+    cortes, inicio = [0], 0
+    while len(audio) - inicio > passo:
+        limite = inicio + passo
+        janela = audio[max(inicio + quadro, limite - busca):limite]
+        n_quadros = len(janela) // quadro
+        if n_quadros:
+            energia = (janela[:n_quadros * quadro].reshape(n_quadros, quadro) ** 2).mean(axis=1)
+            limite = limite - len(janela) + int(np.argmin(energia)) * quadro
+        cortes.append(limite)
+        inicio = limite
+    cortes.append(len(audio))
+    return cortes
+
+
+class RemoteASRBackend:
+    """
+    Cliente do endpoint /audio/transcriptions. Os trechos de todas as aulas
+    dividem o mesmo executor (no máximo `concorrencia` envios em andamento) e
+    o mesmo limite de requisições.
+    """
+
+    def __init__(self, url: str = REMOTE_ASR_SETTINGS['url'],
+                 api_key: str = REMOTE_ASR_SETTINGS['api_key'],
+                 modelo: str = REMOTE_ASR_SETTINGS['model'],
+                 trecho_s: float = REMOTE_ASR_SETTINGS['chunk_s'],
+                 concorrencia: int = REMOTE_ASR_SETTINGS['concurrency'],
+                 requisicoes_por_hora: int = RATE_LIMITS['whisper_requests_per_hour'],
+                 janela_s: float = 3600.0,
+                 timeout_s: float = REMOTE_ASR_SETTINGS['timeout_s'],
+                 max_tentativas: int = REMOTE_ASR_SETTINGS['max_retries']):
+        self.endpoint = url.rstrip('/') + '/audio/transcriptions'
+        self._api_key = api_key
+        self.modelo = modelo
+        self.trecho_s = trecho_s
+        self.concorrencia = max(1, int(concorrencia))
+        self.timeout_s = timeout_s
+        self.max_tentativas = max(1, int(max_tentativas))
+        self.limite = LimiteDeRequisicoes(requisicoes_por_hora, janela_s)
+        self._executor = ThreadPoolExecutor(max_workers=self.concorrencia, thread_name_prefix="asr")
+        self._lock = threading.Lock()
+        self._em_andamento = 0
+        self.requisicoes = 0
+        self.reenvios = 0
+        self.recusas_429 = 0
+        self.max_simultaneas = 0
+        self.segundos_audio = 0.0
+        self.bytes_enviados = 0
+
+    @property
+    def descricao(self) -> str:
+        """Identificação do backend (ex.: "remote:whisper-1@api.openai.com"), usada no cache."""
+        return f"remote:{self.modelo}@{urlparse(self.endpoint).netloc}"
+
+    def _enviar(self, audio: np.ndarray, parametros: Dict) -> Dict:
+        """Um POST com retentativas; retorna o verbose_json do trecho."""
+        wav = _wav_bytes(audio)
+        campos = {'model': self.modelo, 'response_format': 'verbose_json',
+                  'timestamp_granularities[]': 'segment', **parametros}
+        corpo, content_type = _multipart(campos, wav, 'trecho.wav')
+        cabecalhos = {'Content-Type': content_type}
+        if self._api_key:
+            cabecalhos['Authorization'] = f"Bearer {self._api_key}"
+
+        for tentativa in range(self.max_tentativas):
+            self.limite.adquirir()
+            with self._lock:
+                self.requisicoes += 1
+                self.reenvios += 1 if tentativa else 0
+                self._em_andamento += 1
+                self.max_simultaneas = max(self.max_simultaneas, self._em_andamento)
+            try:
+                pedido = urllib.request.Request(self.endpoint, data=corpo, headers=cabecalhos, method='POST')
+                with urllib.request.urlopen(pedido, timeout=self.timeout_s) as resposta:
+                    dados = json.loads(resposta.read().decode('utf-8'))
+                with self._lock:
+                    self.bytes_enviados += len(corpo)
+                    self.segundos_audio += len(audio) / SAMPLE_RATE
+                return dados
+            except urllib.error.HTTPError as e:
+                detalhe = e.read()[:300].decode('utf-8', 'replace')
+                if e.code not in RETRY_STATUS or tentativa == self.max_tentativas - 1:
+                    raise RuntimeError(f"ASR remoto respondeu {e.code}: {detalhe}") from e
+                try:
+                    espera = float(e.headers.get('Retry-After'))
+                except (TypeError, ValueError):
+                    espera = 2 ** tentativa
+                if e.code == 429:
+                    with self._lock:
+                        self.recusas_429 += 1
+                    self.limite.pausar(espera)
+                time.sleep(espera)
+            except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                if tentativa == self.max_tentativas - 1:
+                    raise RuntimeError(f"ASR remoto inacessível ({self.endpoint}): {e}") from e
+                time.sleep(2 ** tentativa)
+            finally:
+                with self._lock:
+                    self._em_andamento -= 1
+
+    @staticmethod
+    def _parametros(language: Optional[str], initial_prompt: Optional[str],
+                    temperature) -> Dict[str, str]:
+        parametros = {}
+        if language and language != 'auto':
+            parametros['language'] = language
+        if initial_prompt:
+            parametros['prompt'] = initial_prompt
+        if isinstance(temperature, (int, float)):
+            parametros['temperature'] = str(temperature)
+        return parametros
+
+    def transcribe(self, audio, language: Optional[str] = None, initial_prompt: Optional[str] = None,
+                   temperature=None, **_parametros_locais):
+        """
+        Mesma interface de WhisperModel.transcribe. Parâmetros do decodificador
+        local (beam_size, VAD, batch_size...) não se aplicam e são ignorados.
+        Os trechos são enviados já na chamada; o gerador entrega os segmentos
+        em ordem, e fechá-lo cancela os envios que ainda não começaram.
+        """
+        if isinstance(audio, str):
+            audio = _recortar_audio(audio, 0.0)
+        cortes = pontos_de_corte(audio, self.trecho_s)
+        parametros = self._parametros(language, initial_prompt, temperature)
+        futuros = [(inicio / SAMPLE_RATE, self._executor.submit(self._enviar, audio[inicio:fim], parametros))
+                   for inicio, fim in zip(cortes, cortes[1:]) if fim > inicio]
+
+        idioma = parametros.get('language')
+        if idioma is None and futuros:
+            idioma = codigo_idioma(futuros[0][1].result().get('language'))
+        duracao = len(audio) / SAMPLE_RATE
+        info = SimpleNamespace(language=idioma or 'pt', language_probability=1.0,
+                               duration=duracao, duration_after_vad=duracao)
+        return self._segmentos(futuros), info
+
+    @staticmethod
+    def _segmentos(futuros):
+        try:
+            for offset, futuro in futuros:
+                for seg in futuro.result().get('segments') or []:
+                    yield SimpleNamespace(
+                        start=float(seg['start']) + offset, end=float(seg['end']) + offset,
+                        text=seg.get('text', ''), avg_logprob=seg.get('avg_logprob'),
+                        no_speech_prob=seg.get('no_speech_prob'),
+                        compression_ratio=seg.get('compression_ratio'))
+        finally:
+            for _, futuro in futuros:
+                futuro.cancel()
+
+    def detect_language(self, audio) -> Tuple[str, float]:
+        """Idioma de uma amostra curta: um envio de até DETECT_SECONDS, sem idioma fixado."""
+        if isinstance(audio, str):
+            audio = _recortar_audio(audio, 0.0)
+        amostra = audio[:int(DETECT_SECONDS * SAMPLE_RATE)]
+        dados = self._executor.submit(self._enviar, amostra, {}).result()
+        return codigo_idioma(dados.get('language')) or 'pt', 1.0
+
+    def stats(self) -> Dict:
+        return {
+            'backend': self.descricao,
+            'requisicoes': self.requisicoes,
+            'reenvios': self.reenvios,
+            'recusas_429': self.recusas_429,
+            'max_simultaneas': self.max_simultaneas,
+            'segundos_audio': round(self.segundos_audio, 1),
+            'mb_enviados': round(self.bytes_enviados / (1024 * 1024), 1),
+            'espera_limite_s': round(self.limite.espera_s, 1),
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_backend: Optional[RemoteASRBackend] = None
+_backend_lock = threading.Lock()
+
+
+def obter_backend_remoto() -> RemoteASRBackend:
+    """Backend remoto do processo: o limite de requisições vale para todas as chamadas."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = RemoteASRBackend()
+        return _backend
@@ -0,0 +1,198 @@
+# video_analyzer/v4/runaway_guard.py
+"""
+Guarda contra laços de alucinação do Whisper.
+Em música ou silêncio o decodificador às vezes entra em repetição: a aula
+leva 10× a sua duração e produz megabytes de texto repetido. Enquanto os
+segmentos saem do gerador, a guarda acompanha a taxa de compressão, n-gramas
+repetidos e o tempo de decodificação vs. tempo de áudio. Os últimos
+segmentos ficam retidos até serem liberados; num laço eles são descartados
+e o trecho é redecodificado com parâmetros mais rígidos (ou pulado, se
+o laço voltar), para que um arquivo ruim não prenda o worker.
+"""
+
+import re
+import time
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from checkpoint import SAMPLE_RATE, _recortar_audio, info_para_dict, segmento_para_dict
+from config import RUNAWAY_SETTINGS
+
+# Segmentos retidos antes de irem para o checkpoint (um laço nasce dentro da janela)
+WINDOW_SEGMENTS = 4
+# Segmentos seguidos acima da taxa de compressão para caracterizar laço
+COMPRESSION_RUN = 3
+# Tamanho dos n-gramas de palavras contados na janela
+NGRAM = 3
+# Parâmetros da nova tentativa: sem condicionar no texto anterior (que
+# realimenta o laço) e sem repetir trigramas
+STRICT_PARAMS = {
+    'condition_on_previous_text': False,
+    'compression_ratio_threshold': 2.0,
+    'no_repeat_ngram_size': NGRAM,
+    'repetition_penalty': 1.1,
+}
+
+
+def _palavras(texto: str) -> List[str]:
+    return re.findall(r'\w+', (texto or '').lower())
+
+
+class RunawayGuard:
+    """Observa os segmentos de uma passada e indica onde começou um laço."""
+
+    def __init__(self, inicio_s: float = 0.0,
+                 max_compression_ratio: float = RUNAWAY_SETTINGS['max_compression_ratio'],
+                 max_ngram_repeats: int = RUNAWAY_SETTINGS['max_ngram_repeats'],
+                 max_rtf: float = RUNAWAY_SETTINGS['max_rtf'],
+                 min_elapsed_s: float = RUNAWAY_SETTINGS['min_elapsed_s']):
+        self.inicio_s = inicio_s
+        self.max_compression_ratio = max_compression_ratio
+        self.max_ngram_repeats = max_ngram_repeats
+        self.max_rtf = max_rtf
+        self.min_elapsed_s = min_elapsed_s
+        self.pendentes = deque()
+        self._t0 = time.perf_counter()
+
+    def observar(self, seg: Dict) -> Tuple[List[Dict], Optional[Dict]]:
+        """
+        Recebe o próximo segmento (tempos absolutos). Retorna (segmentos que já
+        podem ser gravados, laço detectado ou None). No laço, só os retidos
+        anteriores ao início dele são liberados; o resto é descartado.
+        """
+        self.pendentes.append(seg)
+        laco = self._laco()
+        if laco is not None:
+            liberados = [s for s in self.pendentes if s['start'] < laco['inicio']]
+            self.pendentes.clear()
+            return liberados, laco
+        liberados = []
+        while len(self.pendentes) > WINDOW_SEGMENTS:
+            liberados.append(self.pendentes.popleft())
+        return liberados, None
+
+    def restantes(self) -> List[Dict]:
+        """Segmentos retidos, ao fim de uma passada sem laço."""
+        liberados = list(self.pendentes)
+        self.pendentes.clear()
+        return liberados
+
+    def _laco(self) -> Optional[Dict]:
+        pendentes = list(self.pendentes)
+        fim = pendentes[-1]['end']
+
+        altas = 0
+        for seg in reversed(pendentes):
+            if (seg.get('compression_ratio') or 0.0) <= self.max_compression_ratio:
+                break
+            altas += 1
+        if altas >= COMPRESSION_RUN:
+            return {'inicio': pendentes[-altas]['start'], 'fim': fim, 'motivo': 'compressao'}
+
+        palavras = [p for seg in pendentes for p in _palavras(seg['text'])]
+        if len(palavras) >= NGRAM:
+            ngramas = Counter(tuple(palavras[k:k + NGRAM]) for k in range(len(palavras) - NGRAM + 1))
+            ngrama, repeticoes = ngramas.most_common(1)[0]
+            if repeticoes >= self.max_ngram_repeats:
+                # O laço começa no primeiro segmento retido que contém o n-grama
+                texto = ' '.join(ngrama)
+                primeiro = next((i for i, seg in enumerate(pendentes)
+                                 if texto in ' '.join(_palavras(seg['text']))), 0)
+                return {'inicio': pendentes[primeiro]['start'], 'fim': fim, 'motivo': 'repeticao'}
+
+        decorrido = time.perf_counter() - self._t0
+        audio_s = max(fim - self.inicio_s, 1.0)
+        if decorrido > self.min_elapsed_s and decorrido > self.max_rtf * audio_s:
+            return {'inicio': pendentes[0]['start'], 'fim': fim, 'motivo': 'lento'}
+        return None
+
+
+def _fala_da_passada(info, coberto_s: Optional[float] = None) -> float:
+    """Fala (após o VAD) da parte da passada que foi aproveitada (coberto_s do início)."""
+    duracao = getattr(info, 'duration', 0.0) or 0.0
+    fala = getattr(info, 'duration_after_vad', None) or duracao
+    if coberto_s is None or not duracao:
+        return fala
+    return fala * min(1.0, max(0.0, coberto_s) / duracao)
+
+
+def transcrever_protegido(transcribe_fn: Callable, audio, params: Dict,
+                          emitir: Callable[[Dict], None], offset: float = 0.0,
+                          fala_anterior: float = 0.0) -> Tuple[Dict, List[Dict]]:
+    """
+    Consome transcribe_fn(audio, **params) entregando cada segmento (tempos
+    absolutos, somando offset) a emitir. Num laço, o trecho é redecodificado a
+    partir do início do laço com STRICT_PARAMS; se a passada rígida também
+    entrar em laço, RUNAWAY_SKIP_SECONDS são pulados. Depois de
+    RUNAWAY_MAX_EVENTS laços o resto do arquivo é abandonado.
+    fala_anterior é a fala já transcrita antes de offset (checkpoint).
+    Retorna (info como dict, eventos).
+    """
+    if not RUNAWAY_SETTINGS['enabled']:
+        segments, info = transcribe_fn(audio, **params)
+        for seg in segments:
+            emitir(segmento_para_dict(seg, offset=offset))
+        return info_para_dict(info, offset=offset, fala_anterior=fala_anterior), []
+
+    eventos = []
+    inicio, entrada, parametros, estrita = offset, audio, params, False
+    primeiro_info = info_final = None
+    # Fala somada passada a passada, só do que cada passada aproveitou
+    fala_s = fala_anterior
+    while True:
+        guarda = RunawayGuard(inicio)
+        segments, info = transcribe_fn(entrada, **parametros)
+        primeiro_info = primeiro_info or info_para_dict(info, offset=offset)
+        info_final = info_para_dict(info, offset=inicio)
+        laco = None
+        for seg in segments:
+            liberados, laco = guarda.observar(segmento_para_dict(seg, offset=inicio))
+            for liberado in liberados:
+                emitir(liberado)
+            if laco is not None:
+                break
+        if laco is None:
+            for liberado in guarda.restantes():
+                emitir(liberado)
+            fala_s += _fala_da_passada(info)
+            break
+        if hasattr(segments, 'close'):
+            segments.close()  # interrompe a decodificação do gerador
+
+        if len(eventos) + 1 >= RUNAWAY_SETTINGS['max_events']:
+            laco['acao'] = 'interrompido'
+            eventos.append(laco)
+            fala_s += _fala_da_passada(info, laco['inicio'] - inicio)
+            break
+        if estrita:
+            retomar = max(laco['fim'], laco['inicio'] + RUNAWAY_SETTINGS['skip_s'])
+            laco['acao'] = 'pulado'
+        else:
+            retomar = laco['inicio']
+            laco['acao'] = 'redecodificado'
+        eventos.append(laco)
+        fala_s += _fala_da_passada(info, laco['inicio'] - inicio)
+
+        if isinstance(entrada, str):
+            entrada = _recortar_audio(entrada, 0.0)  # decodifica uma vez; as próximas passadas recortam
+        restante = entrada[int((retomar - inicio) * SAMPLE_RATE):]
+        if len(restante) < SAMPLE_RATE:
+            break
+        # Uma vez em laço, o resto do arquivo segue com os parâmetros rígidos
+        inicio, entrada = retomar, restante
+        parametros = {k: v for k, v in params.items() if k != 'batch_size'}
+        parametros.update(STRICT_PARAMS)
+        estrita = True
+
+    info_final.update({'language': primeiro_info['language'],
+                       'language_probability': primeiro_info['language_probability'],
+                       'duration_after_vad': fala_s,
+                       'resumed_from': offset})
+    if eventos:
+        info_final['runaway'] = eventos
+    return info_final, eventos
+
+
+def descrever_eventos(eventos: List[Dict]) -> str:
+    """Resumo legível dos laços de uma aula."""
+    return "; ".join(f"{e['inicio']:.0f}s ({e['motivo']}, {e['acao']})" for e in eventos)
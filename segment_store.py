@@ -0,0 +1,332 @@
+# video_analyzer/v4/segment_store.py
+"""
+Armazenamento colunar dos segmentos de uma aula (`<aula>.segments.bin`).
+Início/fim e confiança ficam em colunas float32, o texto em um blob UTF-8
+indexado por offsets e as palavras em um índice ordenado com as listas de
+segmentos em que aparecem. Sem compressão o arquivo é aberto por mmap e só
+as páginas consultadas são lidas; "texto no minuto 42" e "onde aparece X"
+são buscas binárias (O(log n)), sem reprocessar o .srt.
+"""
+
+import mmap
+import os
+import re
+import shutil
+import struct
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+STORE_SUFFIX = ".segments.bin"
+MAGIC = b"VASEG\x00\x00\x01"
+VERSION = 1
+FLAG_ZSTD = 1
+# magic, versão, flags, nº de segmentos, bytes de texto, nº de palavras,
+# nº de ocorrências (postings), bytes do vocabulário
+HEADER = struct.Struct("<8sHHIIIII")
+ZSTD_LEVEL = 10
+COPY_CHUNK = 1 << 20
+
+_PALAVRA = re.compile(r"\w+", re.UNICODE)
+
+
+def caminho_store(destino: Path, nome_base: str) -> Path:
+    return Path(destino) / f"{nome_base}{STORE_SUFFIX}"
+
+
+def palavras(texto: str) -> List[str]:
+    """Palavras normalizadas (minúsculas) usadas no índice e nas buscas."""
+    return _PALAVRA.findall((texto or "").lower())
+
+
+def _float(valor) -> float:
+    return float(valor) if valor is not None else float("nan")
+
+
+class SegmentStoreWriter:
+    """
+    Grava os segmentos em temporários à medida que chegam (uma linha numérica
+    e o texto por segmento) e monta o arquivo final no write(): uma aula longa
+    não fica inteira na memória até o fim da transcrição.
+    """
+
+    # início, fim, avg_logprob, no_speech_prob, bytes do texto
+    _PACOTE = struct.Struct("<ffffI")
+    LINHA = np.dtype([("start", "<f4"), ("end", "<f4"), ("avg_logprob", "<f4"),
+                      ("no_speech_prob", "<f4"), ("texto_bytes", "<u4")])
+
+    def __init__(self, diretorio: Optional[Path] = None):
+        # Temporários anônimos no mesmo disco do destino (somem ao fechar)
+        self._linhas = tempfile.TemporaryFile(dir=diretorio)
+        self._texto = tempfile.TemporaryFile(dir=diretorio)
+        self.n = 0
+        self.texto_bytes = 0
+
+    def __len__(self) -> int:
+        return self.n
+
+    def add(self, start: float, end: float, texto: str,
+            avg_logprob: Optional[float] = None, no_speech_prob: Optional[float] = None):
+        dados = texto.encode("utf-8")
+        self._linhas.write(self._PACOTE.pack(float(start), float(end), _float(avg_logprob),
+                                             _float(no_speech_prob), len(dados)))
+        self._texto.write(dados)
+        self.n += 1
+        self.texto_bytes += len(dados)
+
+    def _indice(self, tamanhos: np.ndarray) -> Dict[str, array]:
+        """Índice palavra → segmentos, relendo o texto temporário segmento a segmento."""
+        indice: Dict[str, array] = {}
+        self._texto.seek(0)
+        for i, tamanho in enumerate(tamanhos.tolist()):
+            for palavra in set(palavras(self._texto.read(tamanho).decode("utf-8"))):
+                indice.setdefault(palavra, array("I")).append(i)
+        return indice
+
+    def _gravar_payload(self, f, linhas: np.ndarray) -> Tuple[int, int, int]:
+        vocab = sorted((p.encode("utf-8"), ocorrencias)
+                       for p, ocorrencias in self._indice(linhas["texto_bytes"]).items())
+        vocab_offsets, postings_offsets = array("I", [0]), array("I", [0])
+        vocab_blob, postings = bytearray(), array("I")
+        for palavra, ocorrencias in vocab:
+            vocab_blob += palavra
+            vocab_offsets.append(len(vocab_blob))
+            postings.extend(ocorrencias)
+            postings_offsets.append(len(postings))
+        text_offsets = np.zeros(self.n + 1, dtype="<u4")
+        np.cumsum(linhas["texto_bytes"], out=text_offsets[1:])
+
+        # Colunas numéricas primeiro (alinhadas em 4 bytes), blobs de texto no fim
+        for nome in ("start", "end", "avg_logprob", "no_speech_prob"):
+            f.write(np.ascontiguousarray(linhas[nome]).tobytes())
+        for coluna in (text_offsets, vocab_offsets, postings_offsets, postings):
+            f.write(coluna.tobytes())
+        self._texto.seek(0)
+        shutil.copyfileobj(self._texto, f, COPY_CHUNK)
+        f.write(bytes(vocab_blob))
+        return len(vocab), len(postings), len(vocab_blob)
+
+    def write(self, caminho: Path, compressao: Optional[str] = None) -> Path:
+        """Grava em <caminho>.tmp e renomeia. compressao: None/'none' ou 'zstd'."""
+        flags = 0
+        if compressao == "zstd":
+            if ZSTD_AVAILABLE:
+                flags |= FLAG_ZSTD
+            else:
+                print("⚠️ zstandard não instalado: .segments.bin gravado sem compressão")
+        self._linhas.flush()
+        self._texto.flush()
+        self._linhas.seek(0)
+        linhas = np.frombuffer(self._linhas.read(), dtype=self.LINHA)
+
+        caminho = Path(caminho)
+        tmp = caminho.with_name(caminho.name + ".tmp")
+        try:
+            with open(tmp, "wb") as f:
+                # Cabeçalho provisório: as contagens do vocabulário só existem depois do payload
+                f.write(HEADER.pack(MAGIC, VERSION, flags, 0, 0, 0, 0, 0))
+                if flags & FLAG_ZSTD:
+                    with zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(
+                            f, closefd=False) as comprimido:
+                        contagens = self._gravar_payload(comprimido, linhas)
+                else:
+                    contagens = self._gravar_payload(f, linhas)
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, VERSION, flags, self.n, self.texto_bytes, *contagens))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, caminho)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        finally:
+            self.descartar()
+        return caminho
+
+    def descartar(self):
+        """Fecha (e com isso apaga) os temporários."""
+        self._linhas.close()
+        self._texto.close()
+
+
+class SegmentStore:
+    """Leitura do .segments.bin: consultas por tempo e por texto sem carregar o arquivo todo."""
+
+    def __init__(self, caminho):
+        self.path = Path(caminho)
+        self._file = open(self.path, "rb")
+        self._mmap = None
+        try:
+            (magic, versao, flags, self.n, texto_bytes, n_palavras,
+             n_postings, vocab_bytes) = HEADER.unpack(self._file.read(HEADER.size))
+            if magic != MAGIC or versao != VERSION:
+                raise ValueError(f"{self.path.name} não é um segment store v{VERSION}")
+
+            if flags & FLAG_ZSTD:
+                if not ZSTD_AVAILABLE:
+                    raise RuntimeError(f"{self.path.name} está comprimido e zstandard não está instalado")
+                # Comprimido não dá para mapear: o payload é descomprimido em memória
+                buffer = zstandard.ZstdDecompressor().decompressobj().decompress(self._file.read())
+                inicio = 0
+            else:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                buffer, inicio = self._mmap, HEADER.size
+            self.comprimido = bool(flags & FLAG_ZSTD)
+            self._montar_colunas(buffer, inicio, texto_bytes, n_palavras, n_postings, vocab_bytes)
+        except Exception:
+            self.close()
+            raise
+
+    def _montar_colunas(self, buffer, pos: int, texto_bytes: int, n_palavras: int,
+                        n_postings: int, vocab_bytes: int):
+        def coluna(dtype, n):
+            nonlocal pos
+            valores = np.frombuffer(buffer, dtype=dtype, count=n, offset=pos)
+            pos += valores.nbytes
+            return valores
+
+        n = self.n
+        self.starts = coluna("<f4", n)
+        self.ends = coluna("<f4", n)
+        self.avg_logprobs = coluna("<f4", n)
+        self.no_speech_probs = coluna("<f4", n)
+        self._text_offsets = coluna("<u4", n + 1)
+        self._vocab_offsets = coluna("<u4", n_palavras + 1)
+        self._postings_offsets = coluna("<u4", n_palavras + 1)
+        self._postings = coluna("<u4", n_postings)
+        self._texto = memoryview(buffer)[pos:pos + texto_bytes]
+        pos += texto_bytes
+        self._vocab = memoryview(buffer)[pos:pos + vocab_bytes]
+        self.n_palavras = n_palavras
+
+    def __len__(self) -> int:
+        return self.n
+
+    def texto(self, i: int) -> str:
+        return bytes(self._texto[self._text_offsets[i]:self._text_offsets[i + 1]]).decode("utf-8")
+
+    def segmento(self, i: int) -> Dict:
+        return {
+            'start': round(float(self.starts[i]), 3),
+            'end': round(float(self.ends[i]), 3),
+            'text': self.texto(i),
+            'avg_logprob': None if np.isnan(self.avg_logprobs[i]) else round(float(self.avg_logprobs[i]), 4),
+            'no_speech_prob': None if np.isnan(self.no_speech_probs[i]) else round(float(self.no_speech_probs[i]), 4),
+        }
+
+    # --- Tempo → texto ---
+
+    def indice_em(self, segundos: float) -> Optional[int]:
+        """Segmento que está tocando em `segundos` (ou o último que começou antes)."""
+        i = int(np.searchsorted(self.starts, segundos, side="right")) - 1
+        return i if i >= 0 else None
+
+    def em(self, segundos: float) -> Optional[Dict]:
+        """Segmento no instante dado, p.ex. em(42 * 60) para o minuto 42."""
+        i = self.indice_em(segundos)
+        return self.segmento(i) if i is not None else None
+
+    def trecho(self, inicio_s: float, fim_s: float) -> List[Dict]:
+        """Segmentos que se sobrepõem a [inicio_s, fim_s)."""
+        primeiro = max(0, int(np.searchsorted(self.starts, inicio_s, side="right")) - 1)
+        ultimo = int(np.searchsorted(self.starts, fim_s, side="left"))
+        return [self.segmento(i) for i in range(primeiro, ultimo) if self.ends[i] > inicio_s]
+
+    # --- Texto → tempo ---
+
+    def _palavra(self, k: int) -> bytes:
+        return bytes(self._vocab[self._vocab_offsets[k]:self._vocab_offsets[k + 1]])
+
+    def _buscar_palavra(self, alvo: bytes) -> int:
+        """Primeira posição do vocabulário >= alvo (busca binária)."""
+        baixo, alto = 0, self.n_palavras
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            if self._palavra(meio) < alvo:
+                baixo = meio + 1
+            else:
+                alto = meio
+        return baixo
+
+    def _ocorrencias(self, palavra: str, prefixo: bool = False) -> np.ndarray:
+        alvo = palavra.encode("utf-8")
+        k = self._buscar_palavra(alvo)
+        fim = k
+        if prefixo:
+            while fim < self.n_palavras and self._palavra(fim).startswith(alvo):
+                fim += 1
+        elif k < self.n_palavras and self._palavra(k) == alvo:
+            fim = k + 1
+        if fim == k:
+            return np.empty(0, dtype=np.uint32)
+        listas = [self._postings[self._postings_offsets[j]:self._postings_offsets[j + 1]]
+                  for j in range(k, fim)]
+        return listas[0] if len(listas) == 1 else np.unique(np.concatenate(listas))
+
+    def buscar(self, consulta: str, limite: Optional[int] = None) -> List[Dict]:
+        """
+        Segmentos que contêm todas as palavras da consulta, em ordem de tempo.
+        A última palavra casa como prefixo ("algor" encontra "algoritmo").
+        """
+        termos = palavras(consulta)
+        if not termos:
+            return []
+        candidatos = None
+        for n, termo in enumerate(termos):
+            ocorrencias = self._ocorrencias(termo, prefixo=n == len(termos) - 1)
+            candidatos = ocorrencias if candidatos is None else np.intersect1d(candidatos, ocorrencias)
+            if candidatos.size == 0:
+                return []
+        indices = candidatos[:limite] if limite else candidatos
+        return [self.segmento(int(i)) for i in indices]
+
+    def close(self):
+        for campo in ('starts', 'ends', 'avg_logprobs', 'no_speech_probs', '_text_offsets',
+                      '_vocab_offsets', '_postings_offsets', '_postings', '_texto', '_vocab'):
+            valor = self.__dict__.pop(campo, None)
+            if isinstance(valor, memoryview):
+                valor.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # ainda há arrays apontando para o mmap; fecha quando forem coletados
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def gravar_segmentos(segments: Iterable, caminho: Path, compressao: Optional[str] = None) -> Path:
+    """Grava o store a partir de segmentos (dicts ou objetos do faster-whisper)."""
+    writer = SegmentStoreWriter()
+    for seg in segments:
+        get = seg.get if isinstance(seg, dict) else lambda k, d=None: getattr(seg, k, d)
+        writer.add(get('start', 0.0), get('end', 0.0), (get('text', '') or '').strip(),
+                   get('avg_logprob'), get('no_speech_prob'))
+    return writer.write(caminho, compressao)
+
+
+def abrir_store(txt_path) -> Optional[SegmentStore]:
+    """Abre o store ao lado de uma transcrição .txt (None se não existir ou for ilegível)."""
+    caminho = Path(txt_path).with_suffix(STORE_SUFFIX)
+    if not caminho.exists():
+        return None
+    try:
+        return SegmentStore(caminho)
+    except (OSError, ValueError, RuntimeError, struct.error) as e:
+        print(f"⚠️ Não foi possível abrir {caminho.name}: {e}")
+        return None
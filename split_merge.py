@@ -0,0 +1,197 @@
+# video_analyzer/v4/split_merge.py
+"""
+Transcrição paralela de um único arquivo muito longo.
+O áudio é cortado em N partes de tamanho parecido, sempre em silêncios, e
+cada parte (com uma pequena sobreposição) é transcrita em um worker. Os
+segmentos voltam para o checkpoint da aula em ordem, com tempos absolutos:
+cada parte só contribui com os segmentos cujo meio cai no seu trecho, e o
+texto repetido na emenda é descartado.
+"""
+
+import json
+import re
+import subprocess
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from checkpoint import SAMPLE_RATE, TranscriptionCheckpoint, segmento_para_dict
+
+# Sobreposição de cada lado do corte (segundos)
+OVERLAP_S = 1.0
+# Silêncio: abaixo de -35 dB por pelo menos 0,4s
+SILENCE_DB = -35
+MIN_SILENCE_S = 0.4
+FRAME_S = 0.05
+# Silêncios para os cortes são procurados até essa distância do ponto ideal
+CUT_SEARCH_S = 60
+# Partes menores que isso não compensam o custo de carregar/aquecer o worker
+MIN_PART_S = 300
+
+Trecho = Tuple[float, float]
+
+
+def carregar_trecho(media_path, inicio_s: float, duracao_s: Optional[float] = None) -> np.ndarray:
+    """Decodifica só um trecho da mídia (float32, 16kHz, mono) com o FFmpeg."""
+    cmd = ['ffmpeg', '-nostdin', '-v', 'error', '-ss', str(inicio_s)]
+    if duracao_s is not None:
+        cmd += ['-t', str(duracao_s)]
+    cmd += ['-i', str(media_path), '-ac', '1', '-ar', str(SAMPLE_RATE),
+            '-f', 's16le', '-acodec', 'pcm_s16le', '-']
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors='replace').strip())
+    pcm = result.stdout[:len(result.stdout) - len(result.stdout) % 2]
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def duracao_midia(media_path) -> float:
+    """Duração da mídia em segundos (ffprobe)."""
+    result = subprocess.run([
+        'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+        '-of', 'json', str(media_path)
+    ], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return float(json.loads(result.stdout)['format']['duration'])
+
+
+def silencios_array(audio: np.ndarray, offset: float = 0.0) -> List[Trecho]:
+    """Intervalos de silêncio pelo RMS em janelas de FRAME_S (áudio já em memória)."""
+    frame = int(FRAME_S * SAMPLE_RATE)
+    n = len(audio) // frame
+    if n == 0:
+        return []
+    rms = np.sqrt(np.mean(audio[:n * frame].reshape(n, frame) ** 2, axis=1))
+    silencio = rms < 10 ** (SILENCE_DB / 20)
+    # Bordas das sequências de frames silenciosos
+    bordas = np.flatnonzero(np.diff(np.concatenate(([0], silencio.astype(np.int8), [0]))))
+    intervalos = []
+    for inicio, fim in zip(bordas[::2], bordas[1::2]):
+        if (fim - inicio) * FRAME_S >= MIN_SILENCE_S:
+            intervalos.append((offset + inicio * FRAME_S, offset + fim * FRAME_S))
+    return intervalos
+
+
+def silencios_perto_dos_cortes(media_path, inicio: float, fim: float, n_partes: int) -> List[Trecho]:
+    """
+    Silêncios da mídia só em volta dos pontos ideais de corte: decodifica uma
+    janela de até 2 x CUT_SEARCH_S por corte, em vez de ler o arquivo inteiro
+    (os workers já decodificam cada parte).
+    """
+    tamanho = (fim - inicio) / n_partes
+    raio = min(tamanho / 4, CUT_SEARCH_S)
+    silencios = []
+    for k in range(1, n_partes):
+        janela_ini = max(inicio, inicio + k * tamanho - raio)
+        silencios += silencios_array(carregar_trecho(media_path, janela_ini, 2 * raio), offset=janela_ini)
+    return silencios
+
+
+def escolher_partes(inicio: float, fim: float, silencios: List[Trecho], n_partes: int) -> List[Trecho]:
+    """
+    Divide [inicio, fim] em n_partes de tamanho parecido. Cada corte vai para o
+    meio do silêncio mais próximo do ponto ideal (dentro de 1/4 de parte);
+    sem silêncio por perto, corta no ponto ideal.
+    """
+    tamanho = (fim - inicio) / n_partes
+    meios = [(a + b) / 2 for a, b in silencios if inicio < (a + b) / 2 < fim]
+    cortes = [inicio]
+    for k in range(1, n_partes):
+        ideal = inicio + k * tamanho
+        candidatos = [m for m in meios if abs(m - ideal) <= tamanho / 4 and m > cortes[-1]]
+        cortes.append(min(candidatos, key=lambda m: abs(m - ideal)) if candidatos else ideal)
+    cortes.append(fim)
+    return list(zip(cortes[:-1], cortes[1:]))
+
+
+def inferir_trecho(transcribe_fn: Callable, fonte, inicio: float, duracao: Optional[float],
+                   params: Dict) -> Tuple[List[Dict], Dict]:
+    """
+    Transcreve uma parte. fonte é o caminho da mídia (a parte é decodificada
+    aqui, no worker) ou o array da parte já recortado. Tempos relativos à parte.
+    """
+    from runaway_guard import transcrever_protegido
+
+    audio = carregar_trecho(fonte, inicio, duracao) if isinstance(fonte, str) else fonte
+    segmentos = []
+    info, _ = transcrever_protegido(transcribe_fn, audio, params, segmentos.append)
+    return segmentos, info
+
+
+def _normalizar(texto: str) -> str:
+    return re.sub(r'\W+', ' ', (texto or '').lower()).strip()
+
+
+def transcrever_em_partes(submit_fn: Callable, audio, media_path: str, params: Dict,
+                          n_partes: int, duracao_total: Optional[float] = None) -> Tuple[int, Dict]:
+    """
+    Transcreve o áudio (array ou caminho) em n_partes simultâneas e grava os
+    segmentos costurados no checkpoint da aula. Retoma de um checkpoint válido:
+    só o que falta é dividido. submit_fn(fonte, inicio, duracao) retorna um
+    Future com (segmentos, info) de inferir_trecho.
+    Retorna (nº total de segmentos, info como dict), como transcrever_com_checkpoint.
+    """
+    checkpoint = TranscriptionCheckpoint(media_path, params)
+    count, retomar_em = checkpoint.load()
+
+    if isinstance(audio, str):
+        fim = duracao_total or duracao_midia(audio)
+        silencios = silencios_perto_dos_cortes(audio, retomar_em, fim, n_partes)
+    else:
+        fim = len(audio) / SAMPLE_RATE
+        inicio_amostra = int(retomar_em * SAMPLE_RATE)
+        silencios = silencios_array(audio[inicio_amostra:], offset=retomar_em)
+    partes = escolher_partes(retomar_em, fim, silencios, n_partes)
+
+    futures = []
+    for inicio, termino in partes:
+        janela_ini = max(0.0, inicio - OVERLAP_S)
+        janela_fim = min(fim, termino + OVERLAP_S)
+        if isinstance(audio, str):
+            futuro = submit_fn(audio, janela_ini, janela_fim - janela_ini)
+        else:
+            futuro = submit_fn(audio[int(janela_ini * SAMPLE_RATE):int(janela_fim * SAMPLE_RATE)],
+                               janela_ini, janela_fim - janela_ini)
+        futures.append((futuro, janela_ini, janela_fim, inicio, termino))
+
+    info_final = None
+    fala_s = 0.0
+    ultimo = None
+    lacos = []
+    checkpoint.open()
+    try:
+        # Em ordem: a parte i só é gravada depois da i-1, mesmo que termine antes
+        for i, (futuro, janela_ini, janela_fim, inicio, termino) in enumerate(futures):
+            segmentos, info = futuro.result()
+            info_final = info_final or info
+            lacos.extend({**e, 'inicio': round(e['inicio'] + janela_ini, 3), 'fim': round(e['fim'] + janela_ini, 3)}
+                         for e in info.get('runaway', []))
+            janela = janela_fim - janela_ini
+            if janela > 0:
+                fala_s += (info.get('duration_after_vad') or janela) * (termino - inicio) / janela
+            ultima_parte = i == len(futures) - 1
+            for seg in segmentos:
+                seg = segmento_para_dict(seg, offset=janela_ini)
+                meio = (seg['start'] + seg['end']) / 2
+                if meio < inicio or (meio >= termino and not ultima_parte):
+                    continue  # pertence à parte vizinha (sobreposição)
+                if (ultimo is not None and seg['start'] < ultimo['end'] + OVERLAP_S
+                        and _normalizar(seg['text']) == _normalizar(ultimo['text'])):
+                    continue  # mesma fala transcrita dos dois lados da emenda
+                checkpoint.append(seg)
+                ultimo = seg
+                count += 1
+    finally:
+        checkpoint.close()
+
+    info_final = dict(info_final or {})
+    info_final.update({
+        'duration': fim,
+        'duration_after_vad': checkpoint.fala_gravada_s + fala_s,
+        'resumed_from': retomar_em,
+    })
+    info_final.pop('runaway', None)
+    if lacos:
+        info_final['runaway'] = lacos
+    return count, info_final
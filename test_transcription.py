@@ -72,6 +72,223 @@ def test_ffmpeg():
         return False
 
 
+def test_memory_governor():
+    """Uma tarefa (ex.: lote de clipes) maior que o limite entra quando nada mais está reservado."""
+    print("\n🧠 Testando controle de memória...")
+
+    import threading
+    from memory_governor import MemoryGovernor
+
+    governor = MemoryGovernor(limit_mb=100, poll_seconds=0.05)
+    admitida = threading.Event()
+
+    def reservar():
+        governor.release(governor.acquire(10_000, "lote acima do limite"))
+        admitida.set()
+
+    threading.Thread(target=reservar, daemon=True).start()
+    assert admitida.wait(timeout=5), "tarefa acima do limite ficou presa sem outras reservas"
+    print("✅ Tarefa acima do limite admitida sem reservas ativas")
+    return True
+
+
+def test_segment_store():
+    """O .segments.bin responde por tempo e por palavra (prefixo na última)."""
+    print("\n🗂️ Testando segment store...")
+
+    import tempfile
+    from segment_store import SegmentStore, gravar_segmentos
+
+    segmentos = [{'start': i * 2.0, 'end': i * 2.0 + 1.5, 'text': f" algoritmo número {i}",
+                  'avg_logprob': -0.3, 'no_speech_prob': None} for i in range(50)]
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = gravar_segmentos(segmentos, Path(pasta) / "aula.segments.bin")
+        with SegmentStore(caminho) as store:
+            assert len(store) == 50
+            assert store.em(41.0)['text'] == "algoritmo número 20"
+            assert [s['start'] for s in store.trecho(10.0, 14.0)] == [10.0, 12.0]
+            assert len(store.buscar("algor")) == 50
+            assert [s['start'] for s in store.buscar("número 7")] == [14.0]
+            assert store.segmento(0)['no_speech_prob'] is None
+    print("✅ Consultas por tempo e por texto corretas")
+    return True
+
+
+def test_checkpoint():
+    """Um checkpoint interrompido retoma do último segmento inteiro gravado."""
+    print("\n💾 Testando checkpoint...")
+
+    import tempfile
+    from checkpoint import TranscriptionCheckpoint
+
+    with tempfile.TemporaryDirectory() as pasta:
+        media = Path(pasta) / "aula.mp4"
+        media.write_bytes(b"video")
+        checkpoint = TranscriptionCheckpoint(media, {'beam_size': 5})
+        checkpoint.open()
+        for i in range(3):
+            checkpoint.append({'start': i * 10.0, 'end': i * 10.0 + 8.0, 'text': f"trecho {i}"})
+        checkpoint.close()
+        with open(checkpoint.path, "a", encoding="utf-8") as f:
+            f.write('{"start": 30.0, "end": 3')  # queda no meio da linha
+
+        count, retomar_em = TranscriptionCheckpoint(media, {'beam_size': 5}).load()
+        assert (count, retomar_em) == (3, 28.0), (count, retomar_em)
+        assert [s['text'] for s in checkpoint.iter_segments()] == ["trecho 0", "trecho 1", "trecho 2"]
+
+        # Outros parâmetros: o checkpoint não vale mais e é descartado
+        assert TranscriptionCheckpoint(media, {'beam_size': 1}).load() == (0, 0.0)
+        assert not checkpoint.path.exists()
+    print("✅ Retomada e invalidação do checkpoint corretas")
+    return True
+
+
+def test_runaway_guard():
+    """Texto repetido é detectado como laço e os segmentos do laço não são liberados."""
+    print("\n🔁 Testando guarda contra laços...")
+
+    from runaway_guard import RunawayGuard
+
+    guarda = RunawayGuard(max_compression_ratio=2.4, max_ngram_repeats=3,
+                          max_rtf=10, min_elapsed_s=120)
+    liberados, laco = [], None
+    textos = ["introdução ao curso", "hoje vamos ver grafos"] + ["obrigado por assistir"] * 4
+    for i, texto in enumerate(textos):
+        prontos, laco = guarda.observar({'start': i * 5.0, 'end': i * 5.0 + 4.0, 'text': texto})
+        liberados += prontos
+        if laco:
+            break
+    assert laco is not None and laco['motivo'] == 'repeticao', laco
+    assert laco['inicio'] == 10.0, laco
+    assert [s['text'] for s in liberados] == textos[:2]
+    print("✅ Laço de repetição detectado no ponto certo")
+    return True
+
+
+def test_split_merge():
+    """Os cortes das partes caem no meio do silêncio mais próximo do ponto ideal."""
+    print("\n✂️ Testando divisão em partes...")
+
+    import numpy as np
+    from split_merge import escolher_partes, silencios_array
+
+    taxa = 16000
+    fala = 0.1 * np.sin(2 * np.pi * 220 * np.arange(taxa * 4) / taxa).astype(np.float32)
+    audio = np.concatenate([fala, np.zeros(taxa, dtype=np.float32), fala])
+    silencios = silencios_array(audio)
+    assert len(silencios) == 1 and abs(silencios[0][0] - 4.0) < 0.1, silencios
+
+    partes = escolher_partes(0.0, 9.0, silencios, 2)
+    assert abs(partes[0][1] - 4.5) < 0.1 and partes[-1][1] == 9.0, partes
+    assert escolher_partes(0.0, 100.0, [], 4) == [(0.0, 25.0), (25.0, 50.0), (50.0, 75.0), (75.0, 100.0)]
+    print("✅ Cortes no silêncio (ou no ponto ideal sem silêncio)")
+    return True
+
+
+def test_micro_batch():
+    """Clipes curtos do mesmo idioma viram um lote e os segmentos voltam para cada clipe."""
+    print("\n📦 Testando micro-lotes...")
+
+    import numpy as np
+    from micro_batch import LoteCurto, agrupar_curtos, concatenar, dividir_segmentos
+
+    aulas = [{'media': m} for m in ("longa", "a", "b", "c")]
+    duracoes = {'longa': 3600.0, 'a': 40.0, 'b': 50.0, 'c': 30.0}
+    idiomas = {'a': 'pt', 'b': 'pt', 'c': 'en'}
+    itens = agrupar_curtos(aulas, lambda a: a['media'], duracoes, idiomas, limite_s=120, alvo_s=600)
+    lotes = [item for item in itens if isinstance(item, LoteCurto)]
+    assert itens[0]['media'] == "longa"
+    assert len(lotes) == 1 and lotes[0].midias == ['a', 'b'], itens
+    assert {'media': 'c'} in itens  # lote de um clipe só volta a ser aula
+
+    taxa = 16000
+    buffer, limites = concatenar([np.zeros(taxa * 3, np.float32), np.zeros(taxa * 2, np.float32)])
+    assert limites == [(0.0, 3.0), (5.0, 7.0)] and len(buffer) == taxa * 7
+    por_clipe = dividir_segmentos([{'start': 0.5, 'end': 2.5, 'text': "primeiro"},
+                                   {'start': 5.2, 'end': 6.8, 'text': "segundo"}], limites)
+    assert [s['text'] for s in por_clipe[0]] == ["primeiro"]
+    assert (por_clipe[1][0]['start'], por_clipe[1][0]['end']) == (0.2, 1.8), por_clipe
+    print("✅ Agrupamento e divisão dos segmentos por clipe corretos")
+    return True
+
+
+def test_content_hash():
+    """A impressão muda com o conteúdo e é memorizada sem reler o arquivo."""
+    print("\n#️⃣ Testando hash de conteúdo...")
+
+    import tempfile
+    import content_hash
+
+    with tempfile.TemporaryDirectory() as pasta:
+        pasta = Path(pasta)
+        memo_original = (content_hash.HASH_INDEX_FILE, content_hash.LEGACY_HASH_INDEX_FILE, content_hash._memo)
+        content_hash.HASH_INDEX_FILE = pasta / "hashes.jsonl"
+        content_hash.LEGACY_HASH_INDEX_FILE = pasta / "hashes.json"
+        content_hash._memo = None
+        try:
+            a, b, c = pasta / "a.mp4", pasta / "b.mp4", pasta / "c.mp4"
+            a.write_bytes(b"x" * 1000)
+            b.write_bytes(b"x" * 1000)
+            c.write_bytes(b"x" * 999 + b"y")
+            assert content_hash.hash_audio(a) == content_hash.hash_audio(b)
+            assert content_hash.hash_audio(a) != content_hash.hash_audio(c)
+            assert len(content_hash.HASH_INDEX_FILE.read_text().splitlines()) == 3
+
+            # Memo recarregado do disco: mesma impressão sem novas linhas
+            content_hash._memo = None
+            assert content_hash.hash_audio(c).startswith("amostra:")
+            assert len(content_hash.HASH_INDEX_FILE.read_text().splitlines()) == 3
+        finally:
+            (content_hash.HASH_INDEX_FILE, content_hash.LEGACY_HASH_INDEX_FILE,
+             content_hash._memo) = memo_original
+    print("✅ Cópias idênticas têm a mesma impressão; memo reaproveitado")
+    return True
+
+
+def test_rate_limiter():
+    """O limite de requisições do ASR remoto segura o envio além da janela e respeita pausas."""
+    print("\n🚦 Testando limite de requisições...")
+
+    import time
+    from remote_asr import LimiteDeRequisicoes
+
+    limite = LimiteDeRequisicoes(2, janela_s=0.3)
+    inicio = time.monotonic()
+    for _ in range(3):
+        limite.adquirir()
+    assert time.monotonic() - inicio >= 0.25, "terceiro envio não esperou a janela"
+
+    limite = LimiteDeRequisicoes(0)
+    limite.pausar(0.2)
+    inicio = time.monotonic()
+    limite.adquirir()
+    assert time.monotonic() - inicio >= 0.15, "envio não respeitou o Retry-After"
+    print("✅ Janela deslizante e Retry-After respeitados")
+    return True
+
+
+def test_cpu_budget():
+    """Os workers não dividem núcleos entre si e, com orçamento > 1, sobra núcleo para o FFmpeg."""
+    print("\n⚙️ Testando orçamento de CPU...")
+
+    import cpu_scheduler
+
+    original = cpu_scheduler.cores_disponiveis
+    cpu_scheduler.cores_disponiveis = lambda: list(range(16))
+    try:
+        for budget in (1, 2, 4, 8, 16):
+            plan = cpu_scheduler.planejar_orcamento_cpu(budget=budget, cpu_threads=0, num_workers=0)
+            usados = [core for cores in plan.worker_cores for core in cores]
+            assert len(usados) == len(set(usados)) == plan.num_workers * plan.cpu_threads, plan
+            if budget > 1:
+                assert plan.decoder_cores and not set(plan.decoder_cores) & set(usados), plan
+            assert max(usados + plan.decoder_cores) < budget, plan
+    finally:
+        cpu_scheduler.cores_disponiveis = original
+    print("✅ Núcleos dos workers e dos decodificadores separados")
+    return True
+
+
 def main():
     """Função principal de teste."""
     print("🎓 TESTE DE DEPENDÊNCIAS - NASCO ANALYZER v4.0")
@@ -92,7 +309,33 @@ def main():
         print("- Windows: Baixe de https://ffmpeg.org/")
         return False
 
-    # Teste 3: Whisper
+    # Teste 3: Controle de memória
+    if not test_memory_governor():
+        print("\n❌ FALHA: Controle de memória não admite tarefas acima do limite")
+        return False
+
+    # Testes 4-11: módulos do pipeline (sem modelo)
+    unitarios = [
+        (test_segment_store, "Segment store"),
+        (test_checkpoint, "Checkpoint"),
+        (test_runaway_guard, "Guarda contra laços"),
+        (test_split_merge, "Divisão em partes"),
+        (test_micro_batch, "Micro-lotes"),
+        (test_content_hash, "Hash de conteúdo"),
+        (test_rate_limiter, "Limite de requisições"),
+        (test_cpu_budget, "Orçamento de CPU"),
+    ]
+    for teste, nome in unitarios:
+        try:
+            passou = teste()
+        except AssertionError as e:
+            print(f"❌ {nome}: {e}")
+            passou = False
+        if not passou:
+            print(f"\n❌ FALHA: {nome}")
+            return False
+
+    # Teste 12: Whisper
     if not test_whisper_model():
         print("\n❌ FALHA: Modelo Whisper não pode ser carregado")
         return False
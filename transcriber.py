@@ -1,15 +1,49 @@
 # video_analyzer/v4/transcriber.py
 from pathlib import Path
 import os
+import wave
 import ffmpeg
 import time
-from faster_whisper import WhisperModel
+import numpy as np
+from types import SimpleNamespace
 from concurrent.futures import ThreadPoolExecutor
 from rich.progress import Progress, BarColumn, TextColumn, TimeRemainingColumn, TimeElapsedColumn, SpinnerColumn
+from model_registry import estimar_memoria_ativacao, estimar_memoria_modelo, registry as model_registry, transcrever as transcrever_modelo
+from cpu_scheduler import TranscriptionWorkerPool, fixar_nucleos, obter_pool, ordenar_maior_primeiro, planejar_orcamento_cpu, usar_pool
+from transcription_pipeline import TranscriptionPipeline, formatar_relatorio_pipeline
+from checkpoint import caminho_parcial, segmentos_do_checkpoint, transcrever_com_checkpoint
+from transcript_writer import TranscriptEmitter, emitir_transcricao, formatar_tempo_srt, formatos_configurados
+from transcription_stats import duracoes_registradas, montar_relatorio_vad, registrar_aula
+from transcript_cache import assinatura_parametros, transcript_cache
+from audio_cache import audio_cache
+from language_profiler import LanguageProfiler
+from split_merge import MIN_PART_S, duracao_midia, inferir_trecho, transcrever_em_partes
+from autotune import plano_do_perfil
+from memory_governor import FFMPEG_MEMORY_MB, copias_pcm, estimar_memoria_audio_mb, governor
+from cascade import cascata_ativa, cascatear_aula, descricao_modelo, resumo_cascata
+from embedded_subtitles import atalho_ativo, transcricao_da_legenda
+from audio_fingerprint import fingerprint_index, impressao, segmentos_alinhados
+from recurring_segments import RecurringSegmentDetector, fora_dos_trechos, segundos_economizados, silenciar
+from micro_batch import LoteCurto, agrupar_curtos, transcrever_lote
+from runaway_guard import descrever_eventos
+from remote_asr import RemoteASRBackend, backend_configurado, obter_backend_remoto
+from config import (CASCADE_SETTINGS, DEFAULT_WHISPER_LANGUAGE, PERFORMANCE_SETTINGS,
+                    SUPPORTED_AUDIO_FORMATS, VAD_SETTINGS)
 
+# Taxa de amostragem esperada pelo Whisper
+SAMPLE_RATE = 16000
+# Modos com pool de inferência fora do processo principal (WORKER_MODE)
+_MODOS_POOL = ('process', 'shared')
+# Tamanho de leitura do pipe do FFmpeg (bytes de PCM s16le)
+PCM_READ_CHUNK = 1 << 20
 
-def extrair_audio_ffmpeg(media_path: str, tipo: str = "wav") -> Path:
-    """Extrai o áudio de um arquivo de vídeo ou áudio usando FFmpeg."""
+
+def extrair_audio_ffmpeg(media_path: str, tipo: str = "wav", fonte: str = None) -> Path:
+    """
+    Extrai o áudio de um arquivo de vídeo ou áudio usando FFmpeg. O arquivo de
+    saída fica ao lado de media_path; fonte (p.ex. o extrato do cache de áudio)
+    é lida no lugar da mídia quando informada.
+    """
     input_path = Path(media_path)
     # Garante que a extensão de saída é minúscula e prefixada com '.'
     output_ext = f".{tipo.lower()}" if not tipo.startswith(
@@ -22,7 +56,7 @@ def extrair_audio_ffmpeg(media_path: str, tipo: str = "wav") -> Path:
         # Mas para garantir compatibilidade com Whisper, re-extraímos para 16kHz mono wav/mp3
         (
             ffmpeg
-            .input(str(input_path))  # Convert to string for ffmpeg-python
+            .input(str(fonte or input_path))  # Convert to string for ffmpeg-python
             # ac=1 (mono), ar='16000' (16kHz) para Whisper
             .output(str(saida), ac=1, ar='16000')
             .run(overwrite_output=True, quiet=True)
@@ -34,36 +68,574 @@ def extrair_audio_ffmpeg(media_path: str, tipo: str = "wav") -> Path:
         raise  # Propaga o erro
 
 
-def formatar_tempo_srt(segundos: float) -> str:
-    """Formata segundos em formato de tempo SRT (HH:MM:SS,ms)."""
-    h = int(segundos // 3600)
-    m = int((segundos % 3600) // 60)
-    s = int(segundos % 60)
-    ms = int((segundos - int(segundos)) * 1000)
-    return f"{h:02}:{m:02}:{s:02},{ms:03}"
+def _eh_wav_16k_mono(input_path: Path) -> bool:
+    """Verifica se o arquivo já é um WAV PCM 16 bits, 16kHz, mono."""
+    if input_path.suffix.lower() != ".wav":
+        return False
+    try:
+        with wave.open(str(input_path), "rb") as wav:
+            return (wav.getframerate() == SAMPLE_RATE and wav.getnchannels() == 1
+                    and wav.getsampwidth() == 2 and wav.getcomptype() == "NONE")
+    except (wave.Error, EOFError, OSError):
+        return False
+
+
+def _pcm_s16le_para_float32(buffer: bytes) -> np.ndarray:
+    return np.frombuffer(buffer, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def carregar_audio_pcm(media_path: str, cpu_cores: list = None, extrato: Path = None) -> np.ndarray:
+    """
+    Decodifica o áudio direto para memória (float32, 16kHz, mono) sem tocar o disco.
+    O FFmpeg escreve PCM s16le no stdout e o buffer vai direto para model.transcribe.
+    Com extrato, a mesma passada grava também o áudio comprimido do cache de áudio.
+    """
+    input_path = Path(media_path)
+
+    # Já está no formato do Whisper: lê as amostras sem iniciar o FFmpeg
+    if _eh_wav_16k_mono(input_path):
+        with wave.open(str(input_path), "rb") as wav:
+            return _pcm_s16le_para_float32(wav.readframes(wav.getnframes()))
+
+    entrada = ffmpeg.input(str(input_path))
+    saida = entrada.output('pipe:', format='s16le', acodec='pcm_s16le', ac=1, ar=str(SAMPLE_RATE))
+    if extrato is not None:
+        saida = ffmpeg.merge_outputs(saida, entrada['a:0'].output(
+            str(extrato), ac=1, ar=str(SAMPLE_RATE), **audio_cache.opcoes_codec))
+    processo = (
+        saida
+        .global_args('-nostdin', '-loglevel', 'error')
+        .run_async(pipe_stdout=True, pipe_stderr=True, overwrite_output=True)
+    )
+    # Mantém o FFmpeg na faixa de núcleos dos decodificadores, longe dos workers
+    if cpu_cores:
+        fixar_nucleos(processo.pid, cpu_cores)
+    # Converte em blocos para não manter bytes e float32 inteiros ao mesmo tempo
+    blocos = []
+    resto = b""
+    while True:
+        chunk = processo.stdout.read(PCM_READ_CHUNK)
+        if not chunk:
+            break
+        chunk = resto + chunk
+        corte = len(chunk) - (len(chunk) % 2)
+        resto = chunk[corte:]
+        blocos.append(_pcm_s16le_para_float32(chunk[:corte]))
+    stderr = processo.stderr.read()
+    if processo.wait() != 0:
+        raise ffmpeg.Error('ffmpeg', b"", stderr)
+
+    if not blocos:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(blocos)
+
+
+def _gravar_extrato(audio_path: Path, chave: str):
+    """Comprime um áudio já extraído (pequeno) para o cache de áudio."""
+    tmp = audio_cache.reservar(chave)
+    try:
+        (
+            ffmpeg
+            .input(str(audio_path))
+            .output(str(tmp), ac=1, ar=str(SAMPLE_RATE), **audio_cache.opcoes_codec)
+            .run(overwrite_output=True, quiet=True)
+        )
+        audio_cache.commit(chave, tmp)
+    except ffmpeg.Error as e:
+        tmp.unlink(missing_ok=True)
+        print(f"⚠️ Não foi possível guardar o áudio de {audio_path.name} no cache: {e.stderr.decode(errors='replace')}")
+
+
+def _preparar_audio(media_path_str: str, tipo_audio: str, deletar_audio: bool, cpu_cores: list = None):
+    """
+    Prepara a entrada do Whisper. Retorna (áudio, caminho do áudio extraído ou None).
+    Sem disco: o PCM vai do FFmpeg direto para o modelo. Arquivo de áudio
+    só é gerado quando o usuário pediu para mantê-lo. O cache de áudio é
+    consultado antes de abrir o vídeo; sem extrato, ele é gravado na mesma
+    decodificação.
+    """
+    chave = audio_cache.key(media_path_str)
+    extrato = audio_cache.lookup(chave)
+    fonte = str(extrato) if extrato else media_path_str
+
+    if deletar_audio and PERFORMANCE_SETTINGS.get('stream_audio', True):
+        tmp = audio_cache.reservar(chave) if chave and not extrato else None
+        try:
+            audio = carregar_audio_pcm(fonte, cpu_cores=cpu_cores, extrato=tmp)
+        except Exception:
+            if tmp is not None:
+                tmp.unlink(missing_ok=True)
+            raise
+        if tmp is not None:
+            audio_cache.commit(chave, tmp)
+        return audio, None
+
+    audio_path = extrair_audio_ffmpeg(media_path_str, tipo=tipo_audio, fonte=fonte)
+    if chave and not extrato:
+        _gravar_extrato(audio_path, chave)
+    return str(audio_path), audio_path
+
+
+def salvar_transcricao(segments, texto: str, destino: Path, nome_base: str, info: dict = None):
+    """
+    Salva a transcrição (.txt, .srt, .vtt, .segments.json e .segments.bin) consumindo os
+    segmentos uma única vez - aceita o gerador do faster-whisper diretamente.
+    O parâmetro texto é mantido por compatibilidade: o .txt é montado dos segmentos.
+    """
+    return emitir_transcricao(segments, destino, nome_base, formatos_configurados(), info)
+
+
+def _midia_da_aula(aula_info: dict):
+    """Prioriza o vídeo; usa audio_path se for um arquivo de áudio "original"."""
+    return aula_info.get("video_path") or aula_info.get("audio_path")
+
+
+def _ja_transcrito(media_path_str: str) -> bool:
+    """
+    Verifica se a transcrição já existe ao lado da mídia. Checkpoints
+    (.partial.jsonl) não contam: a aula será retomada, não pulada.
+    """
+    txt_path = Path(media_path_str).with_suffix('.txt')
+    return txt_path.exists() and txt_path.stat().st_size > 0
+
+
+def _transcrever_por_legenda(aula_info: dict, idioma: str = None):
+    """
+    Grava a transcrição a partir da legenda embutida, se a mídia tiver uma
+    faixa utilizável. Retorna a info da legenda ou None (a aula vai para o Whisper).
+    """
+    media_path_str = _midia_da_aula(aula_info)
+    if not atalho_ativo() or Path(media_path_str).suffix.lower() in SUPPORTED_AUDIO_FORMATS:
+        return None
+    metadata = aula_info.get('metadata') or {}
+    # O scan já sondou as faixas: sem legenda, nem chama o ffprobe
+    faixas = metadata.get('subtitle_streams')
+    if faixas is not None and not faixas:
+        return None
+
+    inicio = time.time()
+    resultado = transcricao_da_legenda(media_path_str, idioma, metadata.get('duration'), faixas)
+    if resultado is None:
+        return None
+    segmentos, info = resultado
+    media_path = Path(media_path_str)
+    emitir_transcricao(segmentos, media_path.parent, media_path.stem, formatos_configurados(), info)
+    registrar_aula(media_path_str, montar_relatorio_vad(info['duration'], None), time.time() - inicio,
+                   idioma=info['language'], origem='legenda')
+    return info
+
+
+def _transcrever_legendas(aulas_idioma: list, progress: Progress, workers: int) -> dict:
+    """
+    Atalho sem o Whisper: aulas pendentes com legenda embutida utilizável no
+    idioma do módulo são transcritas pela faixa (em paralelo, só FFmpeg).
+    aulas_idioma = [(aula_info, idioma esperado)].
+    """
+    resumo = {'aulas': 0, 'segundos': 0.0, 'midias': []}
+    if not aulas_idioma or not atalho_ativo():
+        return resumo
+
+    def tentar(aula_idioma):
+        aula_info, idioma = aula_idioma
+        try:
+            return _transcrever_por_legenda(aula_info, idioma)
+        except Exception as e:
+            print(f"⚠️ Legenda embutida ignorada em {Path(_midia_da_aula(aula_info)).name}: {e}")
+            return None
+
+    task_id = progress.add_task("[cyan]🔎 Procurando legendas embutidas...", total=len(aulas_idioma))
+    inicio = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for (aula_info, _), info in zip(aulas_idioma, executor.map(tentar, aulas_idioma)):
+            if info is not None:
+                resumo['aulas'] += 1
+                resumo['midias'].append(Path(_midia_da_aula(aula_info)).name)
+            progress.advance(task_id)
+    resumo['segundos'] = round(time.time() - inicio, 2)
+    progress.update(task_id, description=f"[green]💬 {resumo['aulas']} aula(s) transcrita(s) pela legenda embutida")
+    return resumo
+
+
+def _aulas_com_idioma_conhecido(modulos: dict) -> list:
+    """
+    (aula, idioma) das aulas pendentes cujo módulo já tem idioma sem precisar
+    do modelo (perfil salvo ou detecção desligada). As demais tentam a legenda
+    depois do perfil de idioma, já com o modelo carregado.
+    """
+    idiomas = LanguageProfiler(None)
+    aulas_idioma = []
+    for aulas in modulos.values():
+        pendentes = [a for a in aulas if _midia_da_aula(a) and not _ja_transcrito(_midia_da_aula(a))]
+        if not pendentes:
+            continue
+        idioma = idiomas.idioma_conhecido([_midia_da_aula(a) for a in pendentes])
+        if idioma is None:
+            continue
+        aulas_idioma += [(a, idiomas.idioma_da_aula(_midia_da_aula(a), idioma)) for a in pendentes]
+    return aulas_idioma
+
+
+def _pcm_para_analise(audio_entrada, media_path_str: str, vinhetas: RecurringSegmentDetector):
+    """
+    Com o áudio extraído em disco (o usuário pediu para mantê-lo), carrega o
+    PCM uma vez quando a impressão ou as vinhetas vão usá-lo: o mesmo array
+    segue para o Whisper, sem decodificar o arquivo de novo em cada etapa.
+    """
+    if isinstance(audio_entrada, np.ndarray):
+        return audio_entrada
+    if not fingerprint_index.enabled and not vinhetas.tem_modelos(media_path_str):
+        return audio_entrada
+    try:
+        return carregar_audio_pcm(audio_entrada)
+    except Exception as e:
+        print(f"⚠️ Áudio de {Path(media_path_str).name} não carregado para análise: {e}")
+        return audio_entrada
+
+
+def _impressao_da_aula(audio_entrada):
+    """
+    (impressão espectral, duração em s) do áudio decodificado - array em
+    memória ou arquivo extraído - ou (None, None) com a deduplicação desligada.
+    """
+    if not fingerprint_index.enabled:
+        return None, None
+    try:
+        audio = audio_entrada if isinstance(audio_entrada, np.ndarray) else carregar_audio_pcm(audio_entrada)
+        return impressao(audio), len(audio) / SAMPLE_RATE
+    except Exception as e:
+        print(f"⚠️ Impressão espectral indisponível: {e}")
+        return None, None
+
+
+def _reaproveitar_duplicata(media_path_str: str, codigos, duracao: float, assinatura: str = None):
+    """
+    Procura no índice uma aula já transcrita com a mesma fala (reexportada em
+    outro bitrate/container) e com a mesma assinatura de transcrição, e grava
+    a transcrição dela com os tempos alinhados. Retorna a correspondência ou None.
+    """
+    if codigos is None or assinatura is None:
+        return None
+    origem = fingerprint_index.buscar(media_path_str, codigos, assinatura)
+    if origem is None:
+        return None
+    segmentos = segmentos_alinhados(origem['media'], origem['offset_s'], duracao)
+    if not segmentos:
+        return None
+    info = {'language': origem.get('language'), 'duration': duracao, 'source': 'fingerprint'}
+    media_path = Path(media_path_str)
+    emitir_transcricao(segmentos, media_path.parent, media_path.stem, formatos_configurados(), info)
+    registrar_aula(media_path_str, montar_relatorio_vad(duracao, None), 0.0,
+                   idioma=origem.get('language'), origem='duplicata',
+                   duplicata_de=origem['media'], offset_s=origem['offset_s'], ber=origem['ber'])
+    fingerprint_index.reaproveitadas += 1
+    return origem
+
+
+def _indexar_impressao(media_path_str: str, codigos, info, assinatura: str = None):
+    """Guarda a impressão da aula recém-transcrita para reconhecer cópias futuras."""
+    if codigos is None:
+        return
+    try:
+        fingerprint_index.add(media_path_str, codigos,
+                              {'language': info.language, 'duration': info.duration,
+                               'assinatura': assinatura})
+    except OSError as e:
+        print(f"⚠️ Não foi possível indexar a impressão de {Path(media_path_str).name}: {e}")
+
+
+def _silenciar_vinhetas(vinhetas: RecurringSegmentDetector, media_path_str: str, audio_entrada, codigos):
+    """
+    Localiza a intro/outro recorrente do módulo na aula e, com o VAD ligado,
+    zera esses trechos (o VAD os pula). Sem VAD o áudio segue intacto: zeros
+    iriam para o decodificador, onde o Whisper tende a alucinar no silêncio;
+    os segmentos dos trechos só saem do texto na gravação.
+    Retorna (entrada para o Whisper, trechos em segundos).
+    """
+    if not vinhetas.tem_modelos(media_path_str):
+        return audio_entrada, []
+    try:
+        audio = audio_entrada if isinstance(audio_entrada, np.ndarray) else carregar_audio_pcm(audio_entrada)
+        trechos = vinhetas.trechos_no_audio(media_path_str, audio, codigos)
+    except Exception as e:
+        print(f"⚠️ Vinhetas ignoradas em {Path(media_path_str).name}: {e}")
+        return audio_entrada, []
+    if not trechos:
+        return audio_entrada, []
+    if not VAD_SETTINGS.get('enabled'):
+        return audio, trechos
+    return silenciar(audio, trechos), trechos
+
+
+def _ordenar_aulas(aulas: list):
+    """
+    Ordena as aulas pendentes pela duração já conhecida (metadados do scan ou
+    histórico de transcrições), da mais longa para a mais curta. Retorna
+    (aulas, resumo, duração estimada por mídia); com SCHEDULE_ORDER=folder a
+    ordem original é mantida.
+    """
+    historico = duracoes_registradas()
+    duracoes, tamanhos = [], []
+    for aula_info in aulas:
+        media_path_str = _midia_da_aula(aula_info)
+        duracao = (aula_info.get('metadata') or {}).get('duration') or historico.get(media_path_str)
+        duracoes.append(duracao)
+        try:
+            tamanhos.append(os.path.getsize(media_path_str))
+        except OSError:
+            tamanhos.append(None)
+    ordenadas, resumo, estimativas = ordenar_maior_primeiro(aulas, duracoes, tamanhos)
+    duracao_por_midia = {_midia_da_aula(a): d for a, d in zip(ordenadas, estimativas)}
+    if PERFORMANCE_SETTINGS.get('schedule_order', 'longest') != 'longest':
+        return aulas, {'criterio': 'folder'}, duracao_por_midia
+    return ordenadas, resumo, duracao_por_midia
+
+
+def _decodificar_aula(model, media_path_str: str, tipo_audio: str, deletar_audio: bool, cpu_cores: list = None):
+    """Decodifica o áudio da aula; com o pool, o FFmpeg roda na faixa própria."""
+    if isinstance(model, TranscriptionWorkerPool) and cpu_cores is None:
+        return model.submit_decode(
+            _preparar_audio, media_path_str, tipo_audio, deletar_audio,
+            model.plan.decoder_cores).result()
+    return _preparar_audio(media_path_str, tipo_audio, deletar_audio, cpu_cores)
+
+
+def _parametros_transcricao(batch_size: int = None, language: str = None) -> dict:
+    """
+    Parâmetros do model.transcribe; batch_size > 0 ativa o modo em lotes (VAD).
+    O idioma vem do perfil do módulo (LanguageProfiler).
+    """
+    if batch_size is None:
+        batch_size = PERFORMANCE_SETTINGS.get('whisper_batch_size', 0)
+    if not language or language == 'auto':
+        language = DEFAULT_WHISPER_LANGUAGE if DEFAULT_WHISPER_LANGUAGE != 'auto' else "pt"
+    parametros = {'language': language, 'beam_size': 5}
+    if VAD_SETTINGS.get('enabled'):
+        parametros['vad_filter'] = True
+        parametros['vad_parameters'] = {
+            'min_silence_duration_ms': VAD_SETTINGS['min_silence_duration_ms'],
+            'speech_pad_ms': VAD_SETTINGS['speech_pad_ms'],
+            'threshold': VAD_SETTINGS.get('threshold', 0.5),
+        }
+    if batch_size:
+        parametros['batch_size'] = batch_size
+    return parametros
 
 
-def salvar_transcricao(segments, texto: str, destino: Path, nome_base: str):
-    """Salva a transcrição em arquivos .txt e .srt."""
-    destino.mkdir(
-        parents=True, exist_ok=True)  # Garante que o diretório de destino exista
+def _chave_cache(media_path_str: str, modelo: str, language: str = None,
+                 vinhetas: RecurringSegmentDetector = None):
+    """
+    Chave do cache global (conteúdo do áudio + modelo + parâmetros), ou None.
+    Com vinhetas cortadas a identidade dos modelos da pasta também entra: a
+    transcrição cortada não serve para a mesma aula em outro módulo.
+    """
+    if not modelo or not transcript_cache.enabled:
+        return None
+    try:
+        return transcript_cache.key(media_path_str, descricao_modelo(modelo),
+                                    _parametros_cache(media_path_str, language, vinhetas))
+    except Exception as e:
+        print(f"⚠️ Cache de transcrições indisponível para {Path(media_path_str).name}: {e}")
+        return None
+
+
+def _parametros_cache(media_path_str: str, language: str = None,
+                      vinhetas: RecurringSegmentDetector = None) -> dict:
+    parametros = _parametros_transcricao(language=language)
+    identidade = vinhetas.identidade(media_path_str) if vinhetas is not None else None
+    if identidade:
+        parametros['vinhetas'] = identidade
+    return parametros
+
 
-    with open(destino / f"{nome_base}.txt", "w", encoding="utf-8") as f:
-        f.write(texto.strip())
+def _assinatura_transcricao(media_path_str: str, modelo: str, language: str = None,
+                            vinhetas: RecurringSegmentDetector = None):
+    """
+    Modelo + parâmetros da transcrição (os mesmos da chave do cache, sem o
+    áudio). Uma duplicata só reaproveita o texto de uma aula transcrita com a
+    mesma assinatura: rodar de novo com outro modelo não devolve o texto antigo.
+    """
+    if not modelo:
+        return None
+    return assinatura_parametros(descricao_modelo(modelo),
+                                 _parametros_cache(media_path_str, language, vinhetas))
 
-    with open(destino / f"{nome_base}.srt", "w", encoding="utf-8") as f:
-        for i, seg in enumerate(segments):
-            ini_fmt = formatar_tempo_srt(seg.start)
-            fim_fmt = formatar_tempo_srt(seg.end)
-            conteudo = seg.text.strip()
-            f.write(f"{i+1}\n{ini_fmt} --> {fim_fmt}\n{conteudo}\n\n")
 
+def _materializar_do_cache(media_path_str: str, chave) -> bool:
+    """Copia a transcrição do cache para o lado da mídia, se existir."""
+    if chave is None:
+        return False
+    media_path = Path(media_path_str)
+    return transcript_cache.materialize(chave, media_path.parent, media_path.stem)
+
+
+def _partes_arquivo_longo(model, audio_entrada):
+    """
+    Nº de partes para dividir o arquivo (1 = não dividir) e a duração em segundos.
+    Só divide acima de SPLIT_LONG_FILES_MINUTES e com mais de um worker.
+    """
+    limite_min = PERFORMANCE_SETTINGS.get('split_long_files_minutes', 0)
+    if not limite_min or isinstance(model, RemoteASRBackend):
+        # O backend remoto já envia o arquivo em trechos simultâneos
+        return 1, None
+    if isinstance(model, TranscriptionWorkerPool):
+        workers = model.plan.num_workers
+    else:
+        workers = planejar_orcamento_cpu().num_workers
+    n_partes = PERFORMANCE_SETTINGS.get('split_parts') or workers
+    if n_partes < 2:
+        return 1, None
+
+    try:
+        if isinstance(audio_entrada, str):
+            duracao = duracao_midia(audio_entrada)
+        else:
+            duracao = len(audio_entrada) / SAMPLE_RATE
+    except Exception:
+        return 1, None
+    if duracao < limite_min * 60:
+        return 1, duracao
+    return max(1, min(n_partes, int(duracao // MIN_PART_S))), duracao
 
-def processar_aula_transcricao(aula_info: dict, model, tipo_audio: str, deletar_audio: bool, progress_instance: Progress, task_id):
-    """Processa uma única aula para transcrição."""
 
-    # Prioriza audio_path se for um arquivo de áudio "original" (não extraído de vídeo)
-    media_path_str = aula_info.get("video_path") or aula_info.get("audio_path")
+def _inferir_em_partes(model, audio_entrada, media_path_str: str, parametros: dict,
+                       n_partes: int, duracao: float):
+    """Transcreve as partes em workers simultâneos e costura no checkpoint da aula."""
+    if isinstance(model, TranscriptionWorkerPool):
+        count, info = transcrever_em_partes(
+            lambda fonte, inicio, dur: model.submit_chunk(fonte, inicio, dur, **parametros),
+            audio_entrada, media_path_str, parametros, n_partes, duracao)
+        return count, SimpleNamespace(**info)
+
+    def _transcrever(entrada, **kwargs):
+        return transcrever_modelo(model, entrada, **kwargs)
+
+    # O WhisperModel aceita chamadas simultâneas (num_workers do registro)
+    with ThreadPoolExecutor(max_workers=n_partes, thread_name_prefix="parte") as executor:
+        count, info = transcrever_em_partes(
+            lambda fonte, inicio, dur: executor.submit(
+                inferir_trecho, _transcrever, fonte, inicio, dur, parametros),
+            audio_entrada, media_path_str, parametros, n_partes, duracao)
+    return count, SimpleNamespace(**info)
+
+
+def _inferir_aula(model, audio_entrada, media_path_str: str, batch_size: int = None, language: str = None):
+    """
+    Roda o Whisper consumindo o gerador de segmentos (é aqui que a inferência
+    acontece). Cada segmento vai para o checkpoint da aula assim que é
+    decodificado; arquivos muito longos são divididos entre os workers.
+    Retorna (nº de segmentos, info).
+    """
+    parametros = _parametros_transcricao(batch_size, language)
+    n_partes, duracao = _partes_arquivo_longo(model, audio_entrada)
+    if n_partes > 1:
+        return _inferir_em_partes(model, audio_entrada, media_path_str, parametros, n_partes, duracao)
+
+    if isinstance(model, TranscriptionWorkerPool):
+        return model.transcribe_to_checkpoint(audio_entrada, media_path_str, **parametros)
+
+    def _transcrever(entrada, **kwargs):
+        return transcrever_modelo(model, entrada, **kwargs)
+
+    count, info = transcrever_com_checkpoint(
+        _transcrever, audio_entrada, media_path_str, parametros)
+    return count, SimpleNamespace(**info)
+
+
+def _inferir_lote(model, audios: list, midias: list, language: str = None):
+    """
+    Transcreve vários clipes curtos em uma passada (micro-lote) e grava o
+    checkpoint de cada aula. Retorna o info de cada clipe.
+    """
+    parametros = _parametros_transcricao(language=language)
+    if 'batch_size' not in parametros:
+        # O texto de um clipe não deve condicionar o começo do próximo
+        parametros['condition_on_previous_text'] = False
+
+    if isinstance(model, TranscriptionWorkerPool):
+        def _transcrever_buffer(buffer, params):
+            return model.submit_chunk(buffer, 0.0, None, **params).result()
+    else:
+        def _transcrever(entrada, **kwargs):
+            return transcrever_modelo(model, entrada, **kwargs)
+
+        def _transcrever_buffer(buffer, params):
+            return inferir_trecho(_transcrever, buffer, 0.0, None, params)
+
+    infos = transcrever_lote(_transcrever_buffer, audios, midias, parametros)
+    return [SimpleNamespace(**info) for info in infos]
+
+
+def _cascatear_aula(audio_entrada, media_path_str: str, info, tempo_rapido_s: float,
+                    language: str = None, cpu_threads: int = 0) -> dict:
+    """
+    Redecodifica com o modelo da cascata só os trechos fracos já gravados no
+    checkpoint. O modelo maior roda no processo principal, via registro, que
+    o contabiliza no governador de memória antes de carregá-lo.
+    """
+    with model_registry.use(CASCADE_SETTINGS['model'], compute_type="auto",
+                            cpu_threads=cpu_threads) as maior:
+        def _transcrever(entrada, **kwargs):
+            return transcrever_modelo(maior, entrada, **kwargs)
+
+        fala_s = getattr(info, 'duration_after_vad', None) or info.duration
+        return cascatear_aula(_transcrever, audio_entrada, media_path_str,
+                              _parametros_transcricao(language=language), fala_s, tempo_rapido_s)
+
+
+def _descricao_cascata(relatorio: dict) -> str:
+    if not relatorio:
+        return ""
+    return f", {relatorio['proporcao_escalada']:.0%} escalado p/ {relatorio['modelo']}"
+
+
+def _relatorio_vad(info) -> dict:
+    """Segundos de fala (após o VAD) vs. duração total da aula."""
+    total_s = getattr(info, 'duration', 0.0) or 0.0
+    return montar_relatorio_vad(total_s, getattr(info, 'duration_after_vad', None))
+
+
+def _descricao_vad(relatorio: dict) -> str:
+    if not relatorio['total_s']:
+        return ""
+    return f", fala {relatorio['proporcao_fala']:.0%} de {relatorio['total_s'] / 60:.1f}min"
+
+
+def _gravar_aula(media_path_str: str, info, audio_for_whisper_path, deletar_audio: bool,
+                 chave_cache=None, vinhetas=None):
+    """
+    Emite todos os formatos ao lado da mídia original lendo o checkpoint em
+    passagem única, e remove o checkpoint e o áudio temporário. Com chave_cache,
+    os arquivos também vão para o cache global de transcrições; segmentos
+    dentro dos trechos de vinhetas ficam de fora do texto. Retorna a
+    confiança média (avg_logprob) da transcrição.
+    """
+    destino = Path(media_path_str).parent
+    base = Path(media_path_str).stem
+    if getattr(info, 'runaway', None):
+        print(f"🔂 Laço de alucinação cortado em {base}: {descrever_eventos(info.runaway)}")
+    segmentos = segmentos_do_checkpoint(media_path_str)
+    if vinhetas:
+        segmentos = fora_dos_trechos(segmentos, vinhetas)
+    with TranscriptEmitter(destino, base, formatos_configurados(), vars(info)) as emitter:
+        emitter.emit_all(segmentos)
+    # Arquivos finais no lugar: o checkpoint não é mais necessário
+    caminho_parcial(media_path_str).unlink(missing_ok=True)
+    if chave_cache is not None:
+        try:
+            transcript_cache.store(chave_cache, destino, base,
+                                   {'language': info.language, 'duration': info.duration})
+        except OSError as e:
+            print(f"⚠️ Não foi possível guardar {base} no cache de transcrições: {e}")
+
+    if deletar_audio and audio_for_whisper_path is not None:
+        os.remove(audio_for_whisper_path)
+    return emitter.avg_logprob
+
+
+def processar_aula_transcricao(aula_info: dict, model, tipo_audio: str, deletar_audio: bool, progress_instance: Progress, task_id, modelo: str = None):
+    """Processa uma única aula para transcrição (modelo habilita o cache global)."""
+
+    media_path_str = _midia_da_aula(aula_info)
 
     if not media_path_str:
         progress_instance.update(
@@ -72,40 +644,68 @@ def processar_aula_transcricao(aula_info: dict, model, tipo_audio: str, deletar_
         return
 
     # Verificar se transcrição já existe
-    base_path = Path(media_path_str)
-    txt_path = base_path.with_suffix('.txt')
-
-    if txt_path.exists() and txt_path.stat().st_size > 0:
+    if _ja_transcrito(media_path_str):
         progress_instance.update(
-            task_id, description=f"[green]✅ Já transcrito: {base_path.name}", completed=1)
+            task_id, description=f"[green]✅ Já transcrito: {Path(media_path_str).name}", completed=1)
         progress_instance.advance(task_id)
         return
 
     nome_arquivo = Path(media_path_str).name
+    # A legenda precisa estar no idioma do módulo: o perfil vem antes do atalho
+    idiomas = LanguageProfiler(model)
+    idioma = idiomas.idioma_da_aula(
+        media_path_str, idiomas.idioma_do_modulo([media_path_str]))
+    try:
+        if _transcrever_por_legenda(aula_info, idioma):
+            progress_instance.update(
+                task_id, description=f"[green]💬 Da legenda embutida: {nome_arquivo}", completed=1)
+            progress_instance.advance(task_id)
+            return
+    except Exception as e:
+        print(f"⚠️ Legenda embutida ignorada em {nome_arquivo}: {e}")
     progress_instance.update(
         task_id, description=f"[cyan]🎙️ Transcrevendo: {nome_arquivo}")
 
     inicio = time.time()
     try:
-        # Extrai áudio se for vídeo ou reprocessa áudio para o formato do Whisper
-        audio_for_whisper_path = extrair_audio_ffmpeg(
-            media_path_str, tipo=tipo_audio)
-
-        segments, info = model.transcribe(
-            str(audio_for_whisper_path), language="pt", beam_size=5)
-        texto = "".join([seg.text for seg in segments])
-
-        # Salva a transcrição no mesmo diretório do arquivo de mídia original
-        destino = Path(media_path_str).parent
-        base = Path(media_path_str).stem
-        salvar_transcricao(segments, texto, destino, base)
+        if modelo is None and isinstance(model, TranscriptionWorkerPool):
+            modelo = model.modelo
+        detector = RecurringSegmentDetector()
+        detector.preparar([media_path_str])
+        chave = _chave_cache(media_path_str, modelo, idioma, detector)
+        assinatura = _assinatura_transcricao(media_path_str, modelo, idioma, detector)
+        if _materializar_do_cache(media_path_str, chave):
+            progress_instance.update(
+                task_id, description=f"[green]♻️ Do cache: {nome_arquivo}")
+            return
 
-        if deletar_audio:
-            os.remove(audio_for_whisper_path)
+        audio_entrada, audio_for_whisper_path = _decodificar_aula(
+            model, media_path_str, tipo_audio, deletar_audio)
+        audio_entrada = _pcm_para_analise(audio_entrada, media_path_str, detector)
+        codigos, duracao_audio = _impressao_da_aula(audio_entrada)
+        duplicata = _reaproveitar_duplicata(media_path_str, codigos, duracao_audio, assinatura)
+        if duplicata is not None:
+            if deletar_audio and audio_for_whisper_path is not None:
+                os.remove(audio_for_whisper_path)
+            progress_instance.update(
+                task_id, description=f"[green]🪞 Cópia de {Path(duplicata['media']).name}: {nome_arquivo}")
+            return
+        audio_entrada, vinhetas = _silenciar_vinhetas(detector, media_path_str, audio_entrada, codigos)
+        _, info = _inferir_aula(model, audio_entrada, media_path_str, language=idioma)
+        cascata = None
+        if cascata_ativa():
+            cascata = _cascatear_aula(audio_entrada, media_path_str, info,
+                                      time.time() - inicio, idioma)
+        avg_logprob = _gravar_aula(media_path_str, info,
+                                   audio_for_whisper_path, deletar_audio, chave, vinhetas)
+        _indexar_impressao(media_path_str, codigos, info, assinatura)
+        idiomas.verificar_aula(media_path_str, idioma, avg_logprob)
 
         duracao = time.time() - inicio
+        relatorio = _relatorio_vad(info)
+        registrar_aula(media_path_str, relatorio, duracao, idioma=idioma, cascata=cascata)
         progress_instance.update(
-            task_id, description=f"[green]✅ Concluído: {nome_arquivo} ({duracao:.2f}s)")
+            task_id, description=f"[green]✅ Concluído: {nome_arquivo} ({duracao:.2f}s{_descricao_vad(relatorio)}{_descricao_cascata(cascata)})")
 
     except Exception as e:
         progress_instance.update(
@@ -116,7 +716,10 @@ def processar_aula_transcricao(aula_info: dict, model, tipo_audio: str, deletar_
 
 
 def transcrever_videos(modulos: dict, modelo: str = "small", tipo_audio: str = "wav", deletar_audio: bool = False, progress: Progress = None):
-    """Orquestra a transcrição de múltiplos vídeos/audios com barra de progresso."""
+    """
+    Orquestra a transcrição de múltiplos vídeos/audios com barra de progresso.
+    Retorna o relatório do pipeline (tempo parado e fila por estágio) ou None.
+    """
 
     if progress is None:
         with Progress(
@@ -124,51 +727,435 @@ def transcrever_videos(modulos: dict, modelo: str = "small", tipo_audio: str = "
             ), TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
             TimeRemainingColumn(), TimeElapsedColumn(), auto_refresh=True, redirect_stdout=True, redirect_stderr=True
         ) as temp_progress:
-            _transcrever_videos_internal(
+            return _transcrever_videos_internal(
                 modulos, modelo, tipo_audio, deletar_audio, temp_progress)
-        return
 
-    _transcrever_videos_internal(
+    return _transcrever_videos_internal(
         modulos, modelo, tipo_audio, deletar_audio, progress)
 
 
+def _plano_do_modelo(modelo: str):
+    """
+    (compute_type, CpuPlan) do modelo. Orçamento de CPU: N workers ×
+    cpu_threads, em vez de cpu_count threads num só modelo; com um perfil
+    calibrado (benchmark_transcription.py autotune), usa a combinação medida.
+    """
+    compute_type, plan = plano_do_perfil(modelo)
+    modo = PERFORMANCE_SETTINGS.get('worker_mode', 'thread')
+    if modo in _MODOS_POOL:
+        if modo == 'process':
+            # Cada worker carrega sua cópia do modelo: limita os workers ao que cabe em memory_limit_mb
+            workers = governor.workers_que_cabem(
+                estimar_memoria_modelo(modelo, compute_type), plan.num_workers)
+        else:
+            # Pesos compartilhados: o modelo entra uma vez, cada réplica só soma ativações
+            workers = governor.workers_que_cabem(
+                estimar_memoria_ativacao(modelo, compute_type), plan.num_workers,
+                memoria_fixa_mb=estimar_memoria_modelo(modelo, compute_type))
+        if workers < plan.num_workers:
+            print(f"🧠 {plan.num_workers} workers de {modelo} não cabem em "
+                  f"{governor.limit_mb:.0f}MB: usando {workers}")
+            plan = planejar_orcamento_cpu(cpu_threads=plan.cpu_threads, num_workers=workers)
+    return compute_type, plan
+
+
+def preaquecer_modelo(modelo: str):
+    """
+    Carrega o modelo como transcrever_videos o usaria (pool de processos ou
+    registro), para que a primeira aula não pague a carga. Usado pelo daemon.
+    """
+    if backend_configurado() == 'remote':
+        return  # inferência remota: nada a carregar
+    compute_type, plan = _plano_do_modelo(modelo)
+    if PERFORMANCE_SETTINGS.get('worker_mode', 'thread') in _MODOS_POOL:
+        obter_pool(modelo, compute_type, plan).warm_up()
+        return
+    model_registry.get(modelo, compute_type, plan.cpu_threads, num_workers=plan.num_workers)
+
+
 def _transcrever_videos_internal(modulos: dict, modelo: str, tipo_audio: str, deletar_audio: bool, progress: Progress):
     """Lógica interna de transcrição com gerenciamento de progresso."""
+    # Legendas embutidas primeiro (módulos com idioma já conhecido): se cobrirem
+    # todas as aulas, o modelo nem é carregado
+    legendas = _transcrever_legendas(
+        _aulas_com_idioma_conhecido(modulos), progress, PERFORMANCE_SETTINGS.get('decoder_workers', 2))
+    restantes = [aula_info for aulas in modulos.values() for aula_info in aulas
+                 if _midia_da_aula(aula_info) and not _ja_transcrito(_midia_da_aula(aula_info))]
+    if legendas['aulas'] and not restantes:
+        print(f"💬 {legendas['aulas']} aula(s) transcrita(s) pela legenda embutida "
+              f"em {legendas['segundos']:.1f}s, sem carregar o Whisper")
+        return {'legendas': legendas}
+
     loading_task_id = progress.add_task(
         f"[yellow]Carregando modelo Whisper otimizado: {modelo}...", start=False)
     progress.start_task(loading_task_id)
 
-    model = WhisperModel(modelo, compute_type="auto")
+    if backend_configurado() == 'remote':
+        return _com_legendas(_transcrever_remoto(
+            modulos, tipo_audio, deletar_audio, progress, loading_task_id), legendas)
+
+    compute_type, plan = _plano_do_modelo(modelo)
+    if PERFORMANCE_SETTINGS.get('worker_mode', 'thread') in _MODOS_POOL:
+        # Pool persistente: cada processo carrega o modelo uma vez e fica fixado em seus núcleos
+        # (shared: um processo host com as réplicas sobre os mesmos pesos)
+        with usar_pool(modelo, compute_type, plan) as pool:
+            progress.update(
+                loading_task_id, description=f"[green]Modelo {modelo} pronto! ({compute_type}, {plan.describe()})", completed=1)
+            progress.stop_task(loading_task_id)
+
+            return _com_legendas(_transcrever_com_modelo(
+                modulos, pool, tipo_audio, deletar_audio, progress, loading_task_id, plan, modelo), legendas)
+
+    # O registro mantém o modelo quente entre chamadas (uma aula por chamada no orquestrador)
+    with model_registry.use(modelo, compute_type=compute_type, cpu_threads=plan.cpu_threads,
+                            num_workers=plan.num_workers) as model:
+        stats = model_registry.stats()
+        progress.update(
+            loading_task_id, description=f"[green]Modelo {modelo} pronto! (cache: {stats['hits']} hits / {stats['misses']} cargas, {stats['total_load_seconds']:.1f}s carregando)", completed=1)
+        progress.stop_task(loading_task_id)
+
+        return _com_legendas(_transcrever_com_modelo(
+            modulos, model, tipo_audio, deletar_audio, progress, loading_task_id, plan, modelo), legendas)
+
 
+def _transcrever_remoto(modulos: dict, tipo_audio: str, deletar_audio: bool, progress: Progress, loading_task_id):
+    """
+    ASR_BACKEND=remote: o mesmo pipeline, com a inferência no endpoint remoto.
+    Os núcleos locais ficam para o FFmpeg; cada aula ocupada no pipeline tem
+    seus trechos enviados em paralelo, dentro do limite de requisições.
+    """
+    backend = obter_backend_remoto()
+    plan = planejar_orcamento_cpu(cpu_threads=1, num_workers=backend.concorrencia)
+    if CASCADE_SETTINGS.get('model'):
+        print(f"🪜 Cascata ({CASCADE_SETTINGS['model']}) desativada com ASR remoto: ela carregaria o modelo local")
     progress.update(
-        loading_task_id, description=f"[green]Modelo {modelo} carregado!", completed=1)
+        loading_task_id, description=f"[green]ASR remoto pronto! ({backend.descricao}, {backend.concorrencia} envio(s) simultâneo(s))", completed=1)
     progress.stop_task(loading_task_id)
 
+    report = _transcrever_com_modelo(
+        modulos, backend, tipo_audio, deletar_audio, progress, loading_task_id, plan, backend.descricao)
+    if report is not None:
+        report['asr_remoto'] = backend.stats()
+        remoto = report['asr_remoto']
+        print(f"🌐 ASR remoto: {remoto['requisicoes']} envio(s) ({remoto['segundos_audio'] / 60:.1f}min de áudio, "
+              f"{remoto['reenvios']} reenvio(s), {remoto['espera_limite_s']:.0f}s aguardando o limite)")
+    return report
+
+
+def _com_legendas(report, legendas: dict):
+    """Anexa o resumo do atalho por legendas ao relatório do pipeline."""
+    if report is None:
+        return {'legendas': legendas} if legendas['aulas'] else None
+    tardias = report.get('legendas')
+    if tardias:
+        # Módulos sem idioma conhecido tentam a legenda depois do perfil de idioma
+        legendas = {'aulas': legendas['aulas'] + tardias['aulas'],
+                    'segundos': round(legendas['segundos'] + tardias['segundos'], 2),
+                    'midias': legendas['midias'] + tardias['midias']}
+    report['legendas'] = legendas
+    return report
+
+
+def _transcrever_com_modelo(modulos: dict, model, tipo_audio: str, deletar_audio: bool, progress: Progress, loading_task_id, plan, modelo: str = None):
+    """
+    Transcreve as aulas em pipeline: decodificadores FFmpeg pré-carregam as
+    próximas aulas enquanto os workers inferem, e a escrita roda em paralelo.
+    Aulas com o mesmo áudio já transcrito em outro curso saem do cache global
+    no estágio de decodificação, sem passar pelo Whisper. Com micro-lotes,
+    clipes curtos viajam juntos como um item (LoteCurto) e são transcritos em
+    uma passada.
+    """
+
     # Contar apenas vídeos e áudios que realmente serão transcritos
     media_para_transcrever = [aula_info for aulas in modulos.values(
-    ) for aula_info in aulas if aula_info.get("video_path") or aula_info.get("audio_path")]
+    ) for aula_info in aulas if _midia_da_aula(aula_info)]
     total_media = len(media_para_transcrever)
 
     if total_media == 0:
         print("🎥 Nenhum vídeo ou áudio para transcrever encontrado.")
         progress.update(
             loading_task_id, description=f"[green]Nenhum vídeo ou áudio para transcrever encontrado.")
-        return
+        return None
 
     overall_task = progress.add_task(
         "[green]Processando mídia...", total=total_media)
 
-    tarefas_futures = []
-    with ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as executor:
-        for aula_info in media_para_transcrever:
-            tarefas_futures.append(executor.submit(
-                processar_aula_transcricao, aula_info, model, tipo_audio, deletar_audio, progress, overall_task))
+    pendentes = []
+    for aula_info in media_para_transcrever:
+        media_path_str = _midia_da_aula(aula_info)
+        if _ja_transcrito(media_path_str):
+            progress.update(
+                overall_task, description=f"[green]✅ Já transcrito: {Path(media_path_str).name}")
+            progress.advance(overall_task)
+            continue
+        pendentes.append(aula_info)
 
-        for future in tarefas_futures:
-            future.result()  # Espera por cada tarefa para ver exceções
+    # Mais longas primeiro: uma aula de 2h no fim da fila não segura o lote inteiro
+    pendentes, ordem, duracao_por_midia = _ordenar_aulas(pendentes)
+
+    # Idioma detectado uma vez por módulo (amostras de algumas aulas) e usado em todas
+    idiomas = LanguageProfiler(model)
+    idioma_por_midia = {}
+    idioma_por_modulo = {}
+    sem_idioma_antes = set()
+    midias_pendentes = {_midia_da_aula(a) for a in pendentes}
+    for nome_modulo, aulas in modulos.items():
+        midias = [m for m in map(_midia_da_aula, aulas) if m in midias_pendentes]
+        if not midias:
+            continue
+        if idiomas.idioma_conhecido(midias) is None:
+            sem_idioma_antes.update(midias)  # a legenda ainda não foi tentada nessas aulas
+        idioma_por_modulo[nome_modulo] = idiomas.idioma_do_modulo(midias)
+        for media_path_str in midias:
+            idioma_por_midia[media_path_str] = idiomas.idioma_da_aula(
+                media_path_str, idioma_por_modulo[nome_modulo])
+
+    # Legendas embutidas dos módulos cujo idioma só agora é conhecido
+    legendas = _transcrever_legendas(
+        [(a, idioma_por_midia[_midia_da_aula(a)]) for a in pendentes if _midia_da_aula(a) in sem_idioma_antes],
+        progress, plan.decoder_workers)
+    if legendas['aulas']:
+        for aula_info in pendentes:
+            if _ja_transcrito(_midia_da_aula(aula_info)):
+                progress.update(
+                    overall_task, description=f"[green]💬 Da legenda embutida: {Path(_midia_da_aula(aula_info)).name}")
+                progress.advance(overall_task)
+        pendentes = [a for a in pendentes if not _ja_transcrito(_midia_da_aula(a))]
+        midias_pendentes = {_midia_da_aula(a) for a in pendentes}
+
+    # Intro/outro recorrentes: modelos montados uma vez por pasta, localizados em cada aula
+    detector = RecurringSegmentDetector()
+    detector.preparar(list(midias_pendentes), duracao_por_midia)
+
+    # Cópias do PCM que cada aula ocupa: uma com threads (ou ASR remoto), três com processos
+    copias = copias_pcm(PERFORMANCE_SETTINGS.get('worker_mode', 'thread')
+                        if isinstance(model, TranscriptionWorkerPool) else 'thread')
+
+    def memoria_da_aula(media_path_str: str) -> float:
+        duracao = duracao_por_midia.get(media_path_str)
+        if not duracao:
+            try:
+                # Duração desconhecida: o ffprobe é barato perto de reservar uma hora de PCM
+                duracao = duracao_por_midia[media_path_str] = duracao_midia(media_path_str)
+            except Exception:
+                duracao = None
+        return estimar_memoria_audio_mb(duracao, copias)
+
+    chaves_cache = {}
+    assinaturas = {}
+    reservas_memoria = {}
+    impressoes = {}
+    duplicatas = {}
+    vinhetas_por_midia = {}
+    lotes = []
+
+    def decodificar_aula(aula_info, reservar: bool = True):
+        media_path_str = _midia_da_aula(aula_info)
+        chave = _chave_cache(media_path_str, modelo, idioma_por_midia.get(media_path_str), detector)
+        assinaturas[media_path_str] = _assinatura_transcricao(
+            media_path_str, modelo, idioma_por_midia.get(media_path_str), detector)
+        if _materializar_do_cache(media_path_str, chave):
+            return None  # nada a decodificar: veio do cache
+        chaves_cache[media_path_str] = chave
+        if reservar:
+            # A reserva vale até a aula ser gravada: o PCM vive da decodificação à inferência
+            reservas_memoria[media_path_str] = governor.acquire(
+                memoria_da_aula(media_path_str), Path(media_path_str).name)
+        progress.update(
+            overall_task, description=f"[cyan]🔉 Decodificando: {Path(media_path_str).name}")
+        audio_entrada, audio_for_whisper_path = _decodificar_aula(
+            model, media_path_str, tipo_audio, deletar_audio, cpu_cores=plan.decoder_cores)
+        audio_entrada = _pcm_para_analise(audio_entrada, media_path_str, detector)
+        # Mesma fala de uma aula já transcrita (outro bitrate/container): não vai para o Whisper
+        codigos, duracao_audio = _impressao_da_aula(audio_entrada)
+        duplicata = _reaproveitar_duplicata(media_path_str, codigos, duracao_audio,
+                                            assinaturas.get(media_path_str))
+        if duplicata is not None:
+            duplicatas[media_path_str] = duplicata
+            if deletar_audio and audio_for_whisper_path is not None:
+                os.remove(audio_for_whisper_path)
+            return None
+        impressoes[media_path_str] = codigos
+        audio_entrada, vinhetas = _silenciar_vinhetas(detector, media_path_str, audio_entrada, codigos)
+        if vinhetas:
+            vinhetas_por_midia[media_path_str] = vinhetas
+        return audio_entrada, audio_for_whisper_path
+
+    def decodificar(item):
+        if not isinstance(item, LoteCurto):
+            return decodificar_aula(item)
+        # Uma reserva para o lote inteiro (clipes + buffer concatenado): reservas por
+        # clipe na mesma thread esperariam umas pelas outras acima do limite
+        reservas_memoria[id(item)] = governor.acquire(
+            estimar_memoria_audio_mb(item.duracao_s, copias), f"lote de {len(item)} clipes")
+        decodificados = []
+        for aula_info in item.aulas:
+            decodificado = decodificar_aula(aula_info, reservar=False)
+            if decodificado is not None and isinstance(decodificado[0], str):
+                # Áudio mantido em disco: o lote precisa das amostras
+                decodificado = (carregar_audio_pcm(decodificado[0]), decodificado[1])
+            decodificados.append(decodificado)
+        return decodificados
+
+    def inferir_lote(lote, decodificados):
+        clipes = [(aula_info, d) for aula_info, d in zip(lote.aulas, decodificados) if d is not None]
+        resultados = {id(aula_info): None for aula_info in lote.aulas}
+        if not clipes:
+            return resultados
+        progress.update(
+            overall_task, description=f"[cyan]🎙️ Transcrevendo lote de {len(clipes)} clipes curtos")
+        inicio = time.time()
+        infos = _inferir_lote(model, [d[0] for _, d in clipes],
+                              [_midia_da_aula(a) for a, _ in clipes], lote.idioma)
+        total_s = sum(info.duration for info in infos) or 1.0
+        tempo_rapido_s = time.time() - inicio
+        for (aula_info, (audio_entrada, _)), info in zip(clipes, infos):
+            info.cascata = None
+            if cascata_ativa():
+                info.cascata = _cascatear_aula(
+                    audio_entrada, _midia_da_aula(aula_info), info,
+                    tempo_rapido_s * info.duration / total_s, lote.idioma, plan.cpu_threads)
+        # Tempo do lote dividido pelos clipes, proporcional à duração
+        duracao_lote = time.time() - inicio
+        for (aula_info, (_, audio_for_whisper_path)), info in zip(clipes, infos):
+            resultados[id(aula_info)] = (info, audio_for_whisper_path,
+                                         duracao_lote * info.duration / total_s)
+        lotes.append({'clipes': len(clipes), 'segundos_audio': round(total_s, 1),
+                      'segundos': round(duracao_lote, 2)})
+        return resultados
+
+    def inferir(aula_info, decodificado):
+        if isinstance(aula_info, LoteCurto):
+            return inferir_lote(aula_info, decodificado)
+        if decodificado is None:
+            return None
+        audio_entrada, audio_for_whisper_path = decodificado
+        progress.update(
+            overall_task, description=f"[cyan]🎙️ Transcrevendo: {Path(_midia_da_aula(aula_info)).name}")
+        media_path_str = _midia_da_aula(aula_info)
+        inicio = time.time()
+        _, info = _inferir_aula(
+            model, audio_entrada, media_path_str,
+            language=idioma_por_midia.get(media_path_str))
+        info.cascata = None
+        if cascata_ativa():
+            info.cascata = _cascatear_aula(
+                audio_entrada, media_path_str, info, time.time() - inicio,
+                idioma_por_midia.get(media_path_str), plan.cpu_threads)
+        return info, audio_for_whisper_path, time.time() - inicio
+
+    relatorios_vad = []
+    relatorios_cascata = []
+    lacos = []
+
+    def gravar(item, resultado, erro):
+        if not isinstance(item, LoteCurto):
+            return gravar_aula(item, resultado, erro)
+        # O lote já foi dividido por clipe: o buffer concatenado não existe mais
+        governor.release(reservas_memoria.pop(id(item), None))
+        for aula_info in item.aulas:
+            gravar_aula(aula_info, (resultado or {}).get(id(aula_info)), erro)
+
+    def gravar_aula(aula_info, resultado, erro):
+        nome_arquivo = Path(_midia_da_aula(aula_info)).name
+        governor.release(reservas_memoria.pop(_midia_da_aula(aula_info), None))
+        try:
+            if erro is not None:
+                raise erro
+            if resultado is None:
+                duplicata = duplicatas.get(_midia_da_aula(aula_info))
+                if duplicata is not None:
+                    progress.update(
+                        overall_task, description=f"[green]🪞 Cópia de {Path(duplicata['media']).name}: {nome_arquivo}")
+                else:
+                    progress.update(
+                        overall_task, description=f"[green]♻️ Do cache: {nome_arquivo}")
+                return
+            info, audio_for_whisper_path, duracao = resultado
+            media_path_str = _midia_da_aula(aula_info)
+            avg_logprob = _gravar_aula(media_path_str, info, audio_for_whisper_path,
+                                       deletar_audio, chaves_cache.get(media_path_str),
+                                       vinhetas_por_midia.get(media_path_str))
+            _indexar_impressao(media_path_str, impressoes.pop(media_path_str, None), info,
+                               assinaturas.pop(media_path_str, None))
+            idiomas.verificar_aula(media_path_str, info.language, avg_logprob)
+            relatorio = _relatorio_vad(info)
+            registrar_aula(media_path_str, relatorio, duracao,
+                           idioma=info.language, cascata=info.cascata)
+            relatorios_vad.append({'stem': aula_info.get('stem'), **relatorio})
+            if getattr(info, 'runaway', None):
+                lacos.append({'stem': aula_info.get('stem'), 'eventos': info.runaway})
+            if info.cascata:
+                relatorios_cascata.append({'stem': aula_info.get('stem'), **info.cascata})
+            progress.update(
+                overall_task, description=f"[green]✅ Concluído: {nome_arquivo} ({duracao:.2f}s{_descricao_vad(relatorio)}{_descricao_cascata(info.cascata)})")
+        except Exception as e:
+            progress.update(
+                overall_task, description=f"[red]❌ Erro em {nome_arquivo}")
+            print(f"❌ Erro ao transcrever {nome_arquivo}: {e}")
+        finally:
+            progress.advance(overall_task)
+
+    pipeline = TranscriptionPipeline(
+        decodificar, inferir, gravar,
+        decoders=plan.decoder_workers,
+        inferers=plan.num_workers,
+        writers=PERFORMANCE_SETTINGS.get('writer_workers', 1),
+        prefetch=PERFORMANCE_SETTINGS.get('prefetch_lessons') or plan.num_workers + 1)
+    # Clipes curtos do mesmo idioma viram micro-lotes (MICRO_BATCH_CLIP_SECONDS)
+    itens = agrupar_curtos(pendentes, _midia_da_aula, duracao_por_midia, idioma_por_midia)
+    report = pipeline.run(itens)
+    report['vad'] = relatorios_vad
+    report['legendas'] = legendas
+    report['cache'] = transcript_cache.stats()
+    report['cache_audio'] = audio_cache.stats()
+    # Só com o VAD os trechos deixam de passar pelo Whisper; sem ele saem apenas do texto
+    report['vinhetas'] = {'aulas': len(vinhetas_por_midia),
+                          'segundos_retirados': segundos_economizados(vinhetas_por_midia),
+                          'segundos_economizados': (segundos_economizados(vinhetas_por_midia)
+                                                    if VAD_SETTINGS.get('enabled') else 0.0),
+                          'trechos': vinhetas_por_midia}
+    report['duplicatas'] = [{'media': m, 'origem': d['media'], 'offset_s': d['offset_s'], 'ber': d['ber']}
+                            for m, d in duplicatas.items()]
+    report['ordem'] = ordem
+    report['micro_lotes'] = lotes
+    report['lacos'] = lacos
+    report['memoria'] = governor.stats()
+    report['idiomas'] = {'modulos': idioma_por_modulo, 'divergentes': idiomas.divergentes}
+    report['cascata'] = None
+    if relatorios_cascata:
+        report['cascata'] = {**resumo_cascata(relatorios_cascata), 'detalhes': relatorios_cascata}
 
+    if pendentes:
+        print(formatar_relatorio_pipeline(report))
+    for media_path_str, duplicata in duplicatas.items():
+        print(f"🪞 {Path(media_path_str).name}: mesma fala de {Path(duplicata['media']).name} "
+              f"(deslocamento {-duplicata['offset_s']:+.2f}s, {duplicata['ber']:.0%} de bits diferentes)")
+    if lotes:
+        print(f"📦 Micro-lotes: {sum(l['clipes'] for l in lotes)} clipes curtos em {len(lotes)} passada(s) "
+              f"({sum(l['segundos_audio'] for l in lotes) / 60:.1f}min de áudio em "
+              f"{sum(l['segundos'] for l in lotes):.1f}s)")
+    if report['cache_audio']['hits']:
+        cache_audio = report['cache_audio']
+        print(f"🎧 Cache de áudio: {cache_audio['hits']} aula(s) sem abrir o vídeo "
+              f"({cache_audio['size_mb']:.0f}/{cache_audio['max_size_mb']:.0f} MB)")
+    if report['vinhetas']['aulas']:
+        vinhetas = report['vinhetas']
+        destino = "fora do Whisper" if vinhetas['segundos_economizados'] else "fora do texto (sem VAD, decodificados)"
+        print(f"🔁 Vinhetas: {vinhetas['segundos_retirados']:.0f}s de intro/outro {destino} "
+              f"em {vinhetas['aulas']} aula(s)")
+    if report['memoria']['esperas']:
+        memoria = report['memoria']
+        print(f"🧠 Memória: {memoria['esperas']} tarefa(s) aguardaram {memoria['espera_segundos']:.0f}s "
+              f"para caber em {memoria['limite_mb']:.0f}MB (pico {memoria['pico_mb']:.0f}MB)")
+    if report['cascata']:
+        resumo = report['cascata']
+        print(f"🪜 Cascata ({CASCADE_SETTINGS['model']}): {resumo['proporcao_escalada']:.1%} do áudio "
+              f"redecodificado em {resumo['tempo_escalada_s']:.1f}s, "
+              f"~{resumo['economia_s']:.0f}s economizados vs. modelo maior em tudo")
     progress.update(
-        overall_task, description="[green]✅ Todas as transcrições finalizadas com sucesso!")
+        overall_task, description=f"[green]✅ Todas as transcrições finalizadas com sucesso! (gargalo: {report['bottleneck']})")
+    return report
 
 
 def processar_aula_audio_extraction(aula_info: dict, tipo_audio: str, progress_instance: Progress, task_id):
@@ -186,7 +1173,8 @@ def processar_aula_audio_extraction(aula_info: dict, tipo_audio: str, progress_i
 
     inicio = time.time()
     try:
-        audio_path = extrair_audio_ffmpeg(video_path_str, tipo=tipo_audio)
+        with governor.reserve(FFMPEG_MEMORY_MB, nome_arquivo):
+            audio_path = extrair_audio_ffmpeg(video_path_str, tipo=tipo_audio)
         duracao = time.time() - inicio
         progress_instance.update(
             task_id, description=f"[green]✅ Áudio extraído de: {nome_arquivo} ({duracao:.2f}s)")
@@ -225,8 +1213,10 @@ def _extrair_todos_audios_internal(modulos: dict, tipo_audio: str, progress: Pro
     audio_extraction_task = progress.add_task(
         "[green]Extraindo áudios...", total=total_videos)
 
+    # Sem inferência rodando, a extração pode usar os workers e a faixa de decodificação
+    plan = planejar_orcamento_cpu()
     tarefas_futures = []
-    with ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as executor:
+    with ThreadPoolExecutor(max_workers=plan.num_workers + plan.decoder_workers) as executor:
         for aula_info in videos_para_extrair:
             tarefas_futures.append(executor.submit(
                 processar_aula_audio_extraction, aula_info, tipo_audio, progress, audio_extraction_task))
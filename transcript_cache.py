@@ -0,0 +1,153 @@
+# video_analyzer/v4/transcript_cache.py
+"""
+Cache global de transcrições endereçado por conteúdo.
+A chave combina a impressão do áudio com modelo, idioma, beam e VAD; a mesma
+aula copiada em vários cursos é transcrita uma vez e, nos demais, os arquivos
+(.txt/.srt/.vtt/.segments.json/.segments.bin) são materializados direto do cache.
+O tamanho total é limitado por CACHE_SETTINGS['max_size_mb'] (descarte LRU).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import CACHE_DIR, CACHE_SETTINGS, ENABLE_CACHE
+from content_hash import hash_audio
+
+TRANSCRIPT_CACHE_DIR = Path(CACHE_DIR) / "transcripts"
+# Sufixos gerados por aula, na ordem de materialização (.txt por último)
+CACHED_SUFFIXES = ('.srt', '.vtt', '.segments.json', '.segments.bin', '.txt')
+META_FILE = "meta.json"
+
+
+def assinatura_parametros(modelo: str, params: Dict) -> str:
+    """Modelo + parâmetros de decodificação, sem o áudio (confere duplicatas do índice de impressões)."""
+    dados = json.dumps({'modelo': modelo, 'params': params}, sort_keys=True)
+    return hashlib.sha256(dados.encode()).hexdigest()[:16]
+
+
+class TranscriptCache:
+    """Armazena transcrições prontas por chave de conteúdo + parâmetros."""
+
+    def __init__(self, root: Optional[Path] = None, max_size_mb: Optional[float] = None,
+                 enabled: bool = ENABLE_CACHE):
+        self.root = Path(root or TRANSCRIPT_CACHE_DIR)
+        if max_size_mb is None:
+            max_size_mb = CACHE_SETTINGS.get('max_size_mb', 1024)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, media_path, modelo: str, params: Dict) -> str:
+        """Chave = impressão do áudio + modelo + parâmetros de decodificação."""
+        assinatura = json.dumps({'audio': hash_audio(media_path), 'modelo': modelo,
+                                 'params': params}, sort_keys=True)
+        return hashlib.sha256(assinatura.encode()).hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def materialize(self, key: str, destino: Path, nome_base: str) -> bool:
+        """Copia a transcrição do cache para o destino. Retorna False se não houver."""
+        if not self.enabled:
+            return False
+        entrada = self._entry_dir(key)
+        if not (entrada / "transcript.txt").exists():
+            with self._lock:
+                self.misses += 1
+            return False
+
+        destino.mkdir(parents=True, exist_ok=True)
+        for sufixo in CACHED_SUFFIXES:
+            origem = entrada / f"transcript{sufixo}"
+            if not origem.exists():
+                continue
+            final = destino / f"{nome_base}{sufixo}"
+            tmp = final.with_name(final.name + ".tmp")
+            shutil.copyfile(origem, tmp)
+            os.replace(tmp, final)
+
+        # Marca o acesso para o LRU
+        os.utime(entrada / META_FILE if (entrada / META_FILE).exists() else entrada)
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key: str, destino: Path, nome_base: str, meta: Optional[Dict] = None):
+        """Copia os arquivos recém-gerados de uma aula para o cache."""
+        if not self.enabled:
+            return
+        entrada = self._entry_dir(key)
+        tmp_dir = entrada.with_name(entrada.name + f".tmp{os.getpid()}_{threading.get_ident()}")
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        for sufixo in CACHED_SUFFIXES:
+            origem = destino / f"{nome_base}{sufixo}"
+            if origem.exists():
+                shutil.copyfile(origem, tmp_dir / f"transcript{sufixo}")
+        with open(tmp_dir / META_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'origem': str(destino / nome_base), 'criado_em': time.time(),
+                       **(meta or {})}, f, ensure_ascii=False)
+
+        if entrada.exists():
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # outra aula idêntica chegou antes
+        else:
+            try:
+                os.replace(tmp_dir, entrada)
+            except OSError:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+
+    def _entries(self) -> List[Dict]:
+        entradas = []
+        if not self.root.exists():
+            return entradas
+        for prefixo in self.root.iterdir():
+            if not prefixo.is_dir():
+                continue
+            for entrada in prefixo.iterdir():
+                if not entrada.is_dir() or ".tmp" in entrada.name:
+                    continue
+                arquivos = [p for p in entrada.iterdir() if p.is_file()]
+                meta = entrada / META_FILE
+                acesso = meta.stat().st_mtime if meta.exists() else entrada.stat().st_mtime
+                entradas.append({'path': entrada, 'size': sum(p.stat().st_size for p in arquivos),
+                                 'last_access': acesso})
+        return entradas
+
+    def size_bytes(self) -> int:
+        return sum(e['size'] for e in self._entries())
+
+    def evict(self) -> int:
+        """Remove as entradas menos usadas até caber em max_size_mb. Retorna quantas saíram."""
+        with self._lock:
+            entradas = sorted(self._entries(), key=lambda e: e['last_access'])
+            total = sum(e['size'] for e in entradas)
+            removidas = 0
+            for entrada in entradas:
+                if total <= self.max_size_bytes:
+                    break
+                shutil.rmtree(entrada['path'], ignore_errors=True)
+                total -= entrada['size']
+                removidas += 1
+            return removidas
+
+    def stats(self) -> Dict:
+        entradas = self._entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(entradas),
+            'size_mb': round(sum(e['size'] for e in entradas) / (1024 * 1024), 2),
+            'max_size_mb': round(self.max_size_bytes / (1024 * 1024), 2),
+        }
+
+
+# Instância compartilhada pelo processo
+transcript_cache = TranscriptCache()
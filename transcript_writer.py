@@ -0,0 +1,196 @@
+# video_analyzer/v4/transcript_writer.py
+"""
+Emissor de transcrições em passagem única.
+Consome os segmentos uma vez (gerador, lista ou leitura do checkpoint) e
+escreve .txt, .srt, .vtt, um JSON compacto e o store colunar (.segments.bin)
+ao mesmo tempo, sem montar a lista completa em memória. Os arquivos finais aparecem por rename atômico,
+e o .txt (que marca a aula como transcrita) é sempre o último.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from segment_store import STORE_SUFFIX, SegmentStoreWriter
+
+FORMATOS_PADRAO = ('txt', 'srt', 'vtt', 'json', 'bin')
+# Sufixo do JSON com tempos e confiança por segmento
+JSON_SUFFIX = ".segments.json"
+
+
+def formatar_tempo_srt(segundos: float) -> str:
+    """Formata segundos em formato de tempo SRT (HH:MM:SS,ms)."""
+    h = int(segundos // 3600)
+    m = int((segundos % 3600) // 60)
+    s = int(segundos % 60)
+    ms = int((segundos - int(segundos)) * 1000)
+    return f"{h:02}:{m:02}:{s:02},{ms:03}"
+
+
+def formatar_tempo_vtt(segundos: float) -> str:
+    """Formata segundos em formato de tempo WebVTT (HH:MM:SS.ms)."""
+    return formatar_tempo_srt(segundos).replace(",", ".")
+
+
+def _campo(seg, nome: str, padrao=None):
+    if isinstance(seg, dict):
+        return seg.get(nome, padrao)
+    return getattr(seg, nome, padrao)
+
+
+def _arredondar(valor, casas: int = 3):
+    return round(float(valor), casas) if valor is not None else None
+
+
+class TranscriptEmitter:
+    """Escreve todos os formatos de uma vez, segmento a segmento."""
+
+    def __init__(self, destino: Path, nome_base: str, formatos: Optional[Iterable[str]] = None,
+                 info: Optional[Dict] = None, compressao: Optional[str] = None):
+        self.destino = Path(destino)
+        self.nome_base = nome_base
+        formatos = set(formatos or FORMATOS_PADRAO)
+        formatos.add('txt')  # o .txt é obrigatório: marca a aula como transcrita
+        self.formatos = [f for f in FORMATOS_PADRAO if f in formatos]
+        self.info = info or {}
+        self.count = 0
+        # Confiança média da transcrição (sinaliza idioma errado, p.ex.)
+        self._logprob_soma = 0.0
+        self._logprob_n = 0
+
+        self.destino.mkdir(parents=True, exist_ok=True)
+        self._finais = {fmt: self._caminho_final(fmt) for fmt in self.formatos}
+        self._tmps = {fmt: caminho.with_name(caminho.name + ".tmp")
+                      for fmt, caminho in self._finais.items()}
+        # O store binário vai para temporários no destino e é montado no commit
+        self._store = SegmentStoreWriter(self.destino) if 'bin' in self.formatos else None
+        if self._store is not None and compressao is None:
+            compressao = compressao_configurada()
+        self._compressao = compressao
+        self._files = {fmt: open(tmp, "w", encoding="utf-8")
+                       for fmt, tmp in self._tmps.items() if fmt != 'bin'}
+        # Espaços no fim do último texto só são escritos se vier mais texto (equivale a strip())
+        self._txt_pendente = ""
+        self._txt_iniciado = False
+
+        if 'vtt' in self._files:
+            self._files['vtt'].write("WEBVTT\n\n")
+        if 'json' in self._files:
+            cabecalho = {k: self.info.get(k) for k in ('language', 'duration')}
+            if self.info.get('source'):
+                cabecalho['source'] = self.info['source']  # p.ex. 'subtitle' (legenda embutida)
+            self._files['json'].write(json.dumps(
+                cabecalho, ensure_ascii=False, separators=(",", ":"))[:-1] + ',"segments":[')
+
+    def _caminho_final(self, fmt: str) -> Path:
+        if fmt == 'json':
+            return self.destino / f"{self.nome_base}{JSON_SUFFIX}"
+        if fmt == 'bin':
+            return self.destino / f"{self.nome_base}{STORE_SUFFIX}"
+        return self.destino / f"{self.nome_base}.{fmt}"
+
+    def emit(self, seg):
+        """Escreve um segmento em todos os formatos abertos."""
+        inicio = float(_campo(seg, 'start', 0.0))
+        fim = float(_campo(seg, 'end', 0.0))
+        texto = _campo(seg, 'text', "") or ""
+        conteudo = texto.strip()
+        self.count += 1
+        logprob = _campo(seg, 'avg_logprob')
+        if logprob is not None:
+            self._logprob_soma += float(logprob)
+            self._logprob_n += 1
+
+        txt = texto if self._txt_iniciado else texto.lstrip()
+        nucleo = txt.rstrip()
+        if nucleo:
+            self._files['txt'].write(self._txt_pendente + nucleo)
+            self._txt_pendente = txt[len(nucleo):]
+            self._txt_iniciado = True
+        else:
+            self._txt_pendente += txt
+
+        if 'srt' in self._files:
+            self._files['srt'].write(
+                f"{self.count}\n{formatar_tempo_srt(inicio)} --> {formatar_tempo_srt(fim)}\n{conteudo}\n\n")
+        if 'vtt' in self._files:
+            self._files['vtt'].write(
+                f"{formatar_tempo_vtt(inicio)} --> {formatar_tempo_vtt(fim)}\n{conteudo}\n\n")
+        if 'json' in self._files:
+            item = {
+                'start': _arredondar(inicio),
+                'end': _arredondar(fim),
+                'text': conteudo,
+                'avg_logprob': _arredondar(_campo(seg, 'avg_logprob'), 4),
+                'no_speech_prob': _arredondar(_campo(seg, 'no_speech_prob'), 4),
+            }
+            prefixo = "," if self.count > 1 else ""
+            self._files['json'].write(prefixo + json.dumps(
+                item, ensure_ascii=False, separators=(",", ":")))
+        if self._store is not None:
+            self._store.add(inicio, fim, conteudo, _campo(seg, 'avg_logprob'),
+                            _campo(seg, 'no_speech_prob'))
+
+    @property
+    def avg_logprob(self) -> Optional[float]:
+        """Média do avg_logprob dos segmentos emitidos (None se não houver)."""
+        return self._logprob_soma / self._logprob_n if self._logprob_n else None
+
+    def emit_all(self, segments: Iterable) -> int:
+        for seg in segments:
+            self.emit(seg)
+        return self.count
+
+    def commit(self) -> Dict[str, Path]:
+        """Fecha os arquivos e os coloca no lugar (o .txt por último)."""
+        if 'json' in self._files:
+            self._files['json'].write("]}")
+        for f in self._files.values():
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+        if self._store is not None:
+            self._store.write(self._tmps['bin'], self._compressao)
+        for fmt in sorted(self.formatos, key=lambda f: f == 'txt'):
+            os.replace(self._tmps[fmt], self._finais[fmt])
+        return dict(self._finais)
+
+    def abort(self):
+        """Descarta os temporários sem tocar em arquivos finais existentes."""
+        for f in self._files.values():
+            if not f.closed:
+                f.close()
+        if self._store is not None:
+            self._store.descartar()
+        for tmp in self._tmps.values():
+            tmp.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+
+def emitir_transcricao(segments: Iterable, destino: Path, nome_base: str,
+                       formatos: Optional[Iterable[str]] = None, info: Optional[Dict] = None) -> int:
+    """Consome os segmentos uma única vez e grava todos os formatos. Retorna o nº de segmentos."""
+    with TranscriptEmitter(destino, nome_base, formatos, info) as emitter:
+        return emitter.emit_all(segments)
+
+
+def compressao_configurada() -> Optional[str]:
+    """Compressão do .segments.bin em SEGMENT_STORE_COMPRESSION ('none' mantém o mmap)."""
+    from config import SEGMENT_STORE_COMPRESSION
+    return None if SEGMENT_STORE_COMPRESSION in ('', 'none') else SEGMENT_STORE_COMPRESSION
+
+
+def formatos_configurados() -> List[str]:
+    """Formatos ativos em TRANSCRIPT_FORMATS (o .txt é sempre incluído)."""
+    from config import TRANSCRIPT_FORMATS
+    return [f.strip().lower() for f in TRANSCRIPT_FORMATS.split(",") if f.strip()]
@@ -0,0 +1,385 @@
+# video_analyzer/v4/transcription_daemon.py
+"""
+Serviço local de transcrição atrás de um socket Unix.
+Cada sessão do Streamlit e cada execução do main.py carregava o próprio
+modelo e disputava os mesmos núcleos. O daemon mantém os modelos quentes
+(pool de workers / registro), recebe jobs do app e da CLI, executa um por vez
+dentro do mesmo orçamento de CPU e devolve o progresso como eventos JSON
+(uma linha por evento). submeter_transcricao usa o daemon quando ele está no
+ar e cai para transcrever_videos no próprio processo quando não está.
+
+Uso:
+    python transcription_daemon.py serve --models small,medium
+    python transcription_daemon.py status
+    python transcription_daemon.py stop
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from config import (DAEMON_PRELOAD_MODELS, LOG_LEVEL, LOG_PATH, TRANSCRIPTION_DAEMON_SOCKET,
+                    USE_TRANSCRIPTION_DAEMON)
+
+# O daemon roda destacado do terminal: mensagens vão para LOG_PATH/transcription_daemon.log
+log = logging.getLogger("transcription_daemon")
+
+PROTOCOL_VERSION = 1
+# Tempo para o ping decidir se há um daemon no ar
+PING_TIMEOUT_S = 2.0
+# Eventos que encerram um job
+FINAL_EVENTS = ('result', 'error')
+
+
+def _enviar(arquivo, mensagem: Dict):
+    arquivo.write((json.dumps(mensagem, ensure_ascii=False, default=str) + "\n").encode('utf-8'))
+    arquivo.flush()
+
+
+class ProgressoRemoto:
+    """
+    A parte da interface de rich.progress.Progress que o transcriber usa;
+    cada chamada vira um evento para o cliente, que a repete no seu Progress.
+    """
+
+    def __init__(self, emitir: Callable[[Dict], None]):
+        self._emitir = emitir
+        self._ids = itertools.count()
+
+    def add_task(self, description: str, start: bool = True, total: Optional[float] = 100.0,
+                 completed: int = 0, **_):
+        task_id = next(self._ids)
+        self._emitir({'event': 'add_task', 'task': task_id, 'description': description,
+                      'start': start, 'total': total, 'completed': completed})
+        return task_id
+
+    def update(self, task_id, **campos):
+        campos = {k: v for k, v in campos.items() if k in ('description', 'completed', 'total', 'advance')}
+        self._emitir({'event': 'update', 'task': task_id, **campos})
+
+    def advance(self, task_id, advance: float = 1):
+        self._emitir({'event': 'advance', 'task': task_id, 'advance': advance})
+
+    def start_task(self, task_id):
+        self._emitir({'event': 'start_task', 'task': task_id})
+
+    def stop_task(self, task_id):
+        self._emitir({'event': 'stop_task', 'task': task_id})
+
+
+class _Job:
+    def __init__(self, pedido: Dict):
+        self.pedido = pedido
+        self.eventos: queue.Queue = queue.Queue()
+        self.criado_em = time.time()
+
+    def emitir(self, evento: Dict):
+        self.eventos.put(evento)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Uma conexão = um comando (ping, status, transcribe, stop)."""
+
+    def handle(self):
+        servico: 'TranscriptionDaemon' = self.server.servico
+        try:
+            pedido = json.loads(self.rfile.readline() or b'{}')
+        except ValueError:
+            _enviar(self.wfile, {'event': 'error', 'message': 'pedido inválido'})
+            return
+        comando = pedido.get('cmd')
+
+        if comando in ('ping', 'status'):
+            _enviar(self.wfile, {'event': 'status', **servico.status()})
+        elif comando == 'stop':
+            _enviar(self.wfile, {'event': 'stopping'})
+            threading.Thread(target=servico.stop, daemon=True).start()
+        elif comando == 'transcribe':
+            self._transcrever(servico, pedido)
+        else:
+            _enviar(self.wfile, {'event': 'error', 'message': f'comando desconhecido: {comando}'})
+
+    def _transcrever(self, servico: 'TranscriptionDaemon', pedido: Dict):
+        job = _Job(pedido)
+        conectado = True
+        try:
+            _enviar(self.wfile, {'event': 'queued', 'position': servico.enfileirar(job)})
+        except OSError:
+            conectado = False
+        while True:
+            evento = job.eventos.get()
+            if conectado:
+                try:
+                    _enviar(self.wfile, evento)
+                except OSError:
+                    conectado = False  # o job continua; as transcrições ficam no disco
+            if evento['event'] in FINAL_EVENTS:
+                return
+
+
+class _Servidor(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class TranscriptionDaemon:
+    """Fila única de jobs sobre os modelos quentes do processo."""
+
+    def __init__(self, socket_path=None, modelos: Optional[List[str]] = None):
+        self.socket_path = Path(socket_path or TRANSCRIPTION_DAEMON_SOCKET)
+        self.modelos = modelos if modelos is not None else _lista(DAEMON_PRELOAD_MODELS)
+        self.fila: queue.Queue = queue.Queue()
+        self.em_execucao: Optional[_Job] = None
+        self.preaquecendo = False
+        self.concluidos = 0
+        self.falhas = 0
+        self.inicio = time.time()
+        self._servidor: Optional[_Servidor] = None
+
+    def enfileirar(self, job: _Job) -> int:
+        """Coloca o job na fila; retorna quantos estão à frente."""
+        a_frente = self.fila.qsize() + (1 if self.em_execucao or self.preaquecendo else 0)
+        self.fila.put(job)
+        return a_frente
+
+    def status(self) -> Dict:
+        from model_registry import registry as model_registry
+        return {
+            'pid': os.getpid(),
+            'version': PROTOCOL_VERSION,
+            'uptime_s': round(time.time() - self.inicio, 1),
+            'modelos': self.modelos,
+            'preaquecendo': self.preaquecendo,
+            'em_execucao': (self.em_execucao.pedido.get('modelo') if self.em_execucao else None),
+            'na_fila': self.fila.qsize(),
+            'concluidos': self.concluidos,
+            'falhas': self.falhas,
+            'registro': model_registry.stats(),
+        }
+
+    def _preaquecer(self):
+        from transcriber import preaquecer_modelo
+        self.preaquecendo = True
+        try:
+            for modelo in self.modelos:
+                inicio = time.time()
+                try:
+                    preaquecer_modelo(modelo)
+                    log.info("🔥 Modelo %s carregado em %.1fs", modelo, time.time() - inicio)
+                except Exception as e:
+                    log.warning("⚠️ Não foi possível pré-carregar %s: %s", modelo, e)
+        finally:
+            self.preaquecendo = False
+
+    def _executar(self):
+        """Thread única de execução: um job por vez no mesmo orçamento de CPU."""
+        from transcriber import transcrever_videos
+        self._preaquecer()
+        while True:
+            job = self.fila.get()
+            if job is None:
+                return
+            self.em_execucao = job
+            pedido = job.pedido
+            aulas = sum(len(a) for a in pedido['modulos'].values())
+            log.info("▶️ Job: %d aula(s), modelo %s", aulas, pedido.get('modelo', 'small'))
+            try:
+                report = transcrever_videos(
+                    pedido['modulos'], modelo=pedido.get('modelo', 'small'),
+                    tipo_audio=pedido.get('tipo_audio', 'wav'),
+                    deletar_audio=bool(pedido.get('deletar_audio')),
+                    progress=ProgressoRemoto(job.emitir))
+                job.emitir({'event': 'result', 'report': report})
+                self.concluidos += 1
+                log.info("✅ Job concluído")
+            except Exception as e:
+                log.exception("❌ Job falhou: %s", e)
+                job.emitir({'event': 'error', 'message': str(e)})
+                self.falhas += 1
+            finally:
+                self.em_execucao = None
+
+    def serve_forever(self):
+        if self.socket_path.exists():
+            if daemon_ativo(self.socket_path):
+                raise RuntimeError(f"já existe um daemon em {self.socket_path}")
+            self.socket_path.unlink()  # socket de uma execução que caiu
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self._servidor = _Servidor(str(self.socket_path), _Handler)
+        self._servidor.servico = self
+        os.chmod(self.socket_path, 0o600)  # só o próprio usuário submete jobs
+        threading.Thread(target=self._executar, name="daemon-jobs", daemon=True).start()
+        log.info("🛰️ Daemon de transcrição em %s (pid %d)", self.socket_path, os.getpid())
+        try:
+            self._servidor.serve_forever()
+        finally:
+            self._servidor.server_close()
+            self.socket_path.unlink(missing_ok=True)
+
+    def stop(self):
+        self.fila.put(None)
+        if self._servidor is not None:
+            self._servidor.shutdown()
+
+
+def _configurar_log():
+    """Log do daemon em arquivo (LOG_PATH) e no stderr, no nível LOG_LEVEL."""
+    destino = Path(LOG_PATH)
+    destino.mkdir(parents=True, exist_ok=True)
+    formato = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+    for handler in (logging.FileHandler(destino / "transcription_daemon.log", encoding="utf-8"),
+                    logging.StreamHandler()):
+        handler.setFormatter(formato)
+        log.addHandler(handler)
+    log.setLevel(getattr(logging, str(LOG_LEVEL).upper(), logging.INFO))
+
+
+def _caminhos_absolutos(modulos: dict) -> dict:
+    """
+    Resolve os caminhos das aulas (chaves *_path) no diretório do cliente: o
+    daemon tem outro diretório de trabalho.
+    """
+    return {
+        nome: [{chave: str(Path(valor).resolve()) if chave.endswith('_path') and valor else valor
+                for chave, valor in aula_info.items()}
+               for aula_info in aulas]
+        for nome, aulas in modulos.items()
+    }
+
+
+def _lista(valor: str) -> List[str]:
+    return [v.strip() for v in (valor or '').split(',') if v.strip()]
+
+
+def _comando(mensagem: Dict, socket_path=None, timeout: Optional[float] = PING_TIMEOUT_S) -> Dict:
+    """Envia um comando curto e retorna a primeira resposta."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conexao:
+        conexao.settimeout(timeout)
+        conexao.connect(str(socket_path or TRANSCRIPTION_DAEMON_SOCKET))
+        with conexao.makefile('rwb') as arquivo:
+            _enviar(arquivo, mensagem)
+            return json.loads(arquivo.readline() or b'{}')
+
+
+def daemon_ativo(socket_path=None) -> bool:
+    try:
+        return _comando({'cmd': 'ping'}, socket_path).get('version') == PROTOCOL_VERSION
+    except (OSError, ValueError):
+        return False
+
+
+def _aplicar_evento(progress, tarefas: Dict, evento: Dict):
+    """Repete no Progress local (rich) um evento do ProgressoRemoto."""
+    tipo = evento['event']
+    if tipo == 'add_task':
+        tarefas[evento['task']] = progress.add_task(
+            evento['description'], start=evento['start'], total=evento['total'],
+            completed=evento['completed'])
+        return
+    task_id = tarefas.get(evento.get('task'))
+    if task_id is None:
+        return
+    if tipo == 'update':
+        progress.update(task_id, **{k: v for k, v in evento.items() if k not in ('event', 'task')})
+    elif tipo == 'advance':
+        progress.advance(task_id, evento['advance'])
+    elif tipo == 'start_task':
+        progress.start_task(task_id)
+    elif tipo == 'stop_task':
+        progress.stop_task(task_id)
+
+
+def transcrever_no_daemon(modulos: dict, modelo: str = "small", tipo_audio: str = "wav",
+                          deletar_audio: bool = False, progress=None, socket_path=None) -> Optional[Dict]:
+    """Envia o job ao daemon e repete o progresso em progress; retorna o relatório."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conexao:
+        conexao.connect(str(socket_path or TRANSCRIPTION_DAEMON_SOCKET))
+        with conexao.makefile('rwb') as arquivo:
+            _enviar(arquivo, {'cmd': 'transcribe', 'version': PROTOCOL_VERSION,
+                              'modulos': _caminhos_absolutos(modulos),
+                              'modelo': modelo, 'tipo_audio': tipo_audio, 'deletar_audio': deletar_audio})
+            tarefas = {}
+            for linha in arquivo:
+                evento = json.loads(linha)
+                if evento['event'] == 'result':
+                    return evento['report']
+                if evento['event'] == 'error':
+                    raise RuntimeError(f"daemon de transcrição: {evento['message']}")
+                if evento['event'] == 'queued' and evento['position']:
+                    print(f"⏳ Daemon ocupado: {evento['position']} job(s) à frente")
+                elif progress is not None:
+                    _aplicar_evento(progress, tarefas, evento)
+    raise ConnectionError("o daemon encerrou a conexão antes do resultado")
+
+
+def submeter_transcricao(modulos: dict, modelo: str = "small", tipo_audio: str = "wav",
+                         deletar_audio: bool = False, progress=None) -> Optional[Dict]:
+    """
+    Transcreve pelo daemon quando ele está no ar (USE_TRANSCRIPTION_DAEMON=auto
+    ou true); senão, neste processo com transcrever_videos. Mesmos argumentos e
+    retorno de transcrever_videos.
+    """
+    if USE_TRANSCRIPTION_DAEMON != 'false':
+        if daemon_ativo():
+            try:
+                if progress is not None:
+                    return transcrever_no_daemon(modulos, modelo, tipo_audio, deletar_audio, progress)
+                from rich.progress import (BarColumn, Progress, SpinnerColumn, TextColumn,
+                                           TimeElapsedColumn, TimeRemainingColumn)
+                with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"),
+                              BarColumn(), TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+                              TimeRemainingColumn(), TimeElapsedColumn()) as progresso_local:
+                    return transcrever_no_daemon(modulos, modelo, tipo_audio, deletar_audio, progresso_local)
+            except (OSError, ConnectionError) as e:
+                # Aulas já gravadas pelo daemon são puladas na transcrição local
+                print(f"⚠️ Daemon de transcrição indisponível ({e}): transcrevendo neste processo")
+        elif USE_TRANSCRIPTION_DAEMON == 'true':
+            print(f"⚠️ Nenhum daemon em {TRANSCRIPTION_DAEMON_SOCKET}: transcrevendo neste processo")
+
+    from transcriber import transcrever_videos
+    return transcrever_videos(modulos, modelo=modelo, tipo_audio=tipo_audio,
+                              deletar_audio=deletar_audio, progress=progress)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daemon local de transcrição (socket Unix)")
+    parser.add_argument("--socket", help=f"Caminho do socket (padrão: {TRANSCRIPTION_DAEMON_SOCKET})")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_serve = sub.add_parser("serve", help="Sobe o daemon e pré-carrega os modelos")
+    p_serve.add_argument("--models", help=f"Modelos separados por vírgula (padrão: {DAEMON_PRELOAD_MODELS})")
+    sub.add_parser("status", help="Estado do daemon (fila, modelos, registro)")
+    sub.add_parser("stop", help="Encerra o daemon")
+    args = parser.parse_args(argv)
+
+    if args.comando == "serve":
+        modelos = _lista(args.models) if args.models is not None else None
+        _configurar_log()
+        servico = TranscriptionDaemon(args.socket, modelos)
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=servico.stop, daemon=True).start())
+        try:
+            servico.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    try:
+        resposta = _comando({'cmd': args.comando if args.comando == 'stop' else 'status'}, args.socket)
+    except OSError as e:
+        print(f"❌ Nenhum daemon respondendo em {args.socket or TRANSCRIPTION_DAEMON_SOCKET}: {e}")
+        return 1
+    print(json.dumps(resposta, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
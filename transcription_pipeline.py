@@ -0,0 +1,176 @@
+# video_analyzer/v4/transcription_pipeline.py
+"""
+Pipeline em estágios para transcrição: decodificação → inferência → escrita.
+Os estágios são grupos de threads ligados por filas limitadas, de modo que o
+FFmpeg pré-carrega as próximas aulas enquanto o Whisper infere e a escrita
+em disco acontece em paralelo. Cada estágio mede a profundidade da fila de
+entrada e o tempo parado (sem trabalho ou bloqueado pela fila seguinte).
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+_FIM = object()
+
+
+@dataclass
+class StageStats:
+    """Métricas de um estágio do pipeline."""
+    name: str
+    workers: int
+    items: int = 0
+    busy_seconds: float = 0.0
+    starved_seconds: float = 0.0   # esperando a fila de entrada
+    blocked_seconds: float = 0.0   # esperando espaço na fila de saída
+    queue_samples: int = 0
+    queue_depth_total: int = 0
+    max_queue_depth: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def sample_queue(self, depth: int):
+        with self._lock:
+            self.queue_samples += 1
+            self.queue_depth_total += depth
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def add(self, busy: float = 0.0, starved: float = 0.0, blocked: float = 0.0, items: int = 0):
+        with self._lock:
+            self.busy_seconds += busy
+            self.starved_seconds += starved
+            self.blocked_seconds += blocked
+            self.items += items
+
+    def to_dict(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'items': self.items,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'starved_seconds': round(self.starved_seconds, 3),
+            'blocked_seconds': round(self.blocked_seconds, 3),
+            'avg_queue_depth': round(self.queue_depth_total / self.queue_samples, 2) if self.queue_samples else 0.0,
+            'max_queue_depth': self.max_queue_depth,
+        }
+
+
+@dataclass
+class _Item:
+    payload: object
+    result: object = None
+    error: Optional[BaseException] = None
+
+
+class TranscriptionPipeline:
+    """
+    Executa decode_fn → infer_fn → write_fn para cada item.
+    - decode_fn(payload) -> áudio decodificado
+    - infer_fn(payload, audio) -> resultado da inferência
+    - write_fn(payload, result, error) -> persiste (ou reporta o erro)
+    Erros de um estágio seguem adiante até o escritor, que sempre é chamado.
+    """
+
+    def __init__(self, decode_fn: Callable, infer_fn: Callable, write_fn: Callable,
+                 decoders: int = 2, inferers: int = 1, writers: int = 1, prefetch: int = 2):
+        self.decode_fn = decode_fn
+        self.infer_fn = infer_fn
+        self.write_fn = write_fn
+        self.stats = {
+            'decode': StageStats('decode', max(1, decoders)),
+            'infer': StageStats('infer', max(1, inferers)),
+            'write': StageStats('write', max(1, writers)),
+        }
+        # Áudio decodificado em memória fica limitado a `prefetch` aulas à frente
+        self.prefetch = max(1, prefetch)
+        self.wall_seconds = 0.0
+
+    def _run_stage(self, stage: StageStats, entrada: queue.Queue, saida: Optional[queue.Queue], fn: Callable):
+        while True:
+            stage.sample_queue(entrada.qsize())
+            t0 = time.perf_counter()
+            item = entrada.get()
+            stage.add(starved=time.perf_counter() - t0)
+            if item is _FIM:
+                entrada.put(_FIM)  # repassa o sinal para os irmãos do estágio
+                return
+
+            t0 = time.perf_counter()
+            if item.error is None or saida is None:
+                try:
+                    fn(item)
+                except BaseException as e:
+                    item.error = e
+            stage.add(busy=time.perf_counter() - t0, items=1)
+
+            if saida is not None:
+                t0 = time.perf_counter()
+                saida.put(item)
+                stage.add(blocked=time.perf_counter() - t0)
+
+    def run(self, payloads: Iterable) -> Dict:
+        """Processa todos os itens e retorna o relatório dos estágios."""
+        inicio = time.perf_counter()
+        q_decode: queue.Queue = queue.Queue()
+        q_infer: queue.Queue = queue.Queue(maxsize=self.prefetch)
+        q_write: queue.Queue = queue.Queue(maxsize=self.stats['write'].workers * 2)
+
+        def _decode(item: _Item):
+            item.result = self.decode_fn(item.payload)
+
+        def _infer(item: _Item):
+            item.result = self.infer_fn(item.payload, item.result)
+
+        def _write(item: _Item):
+            self.write_fn(item.payload, item.result, item.error)
+
+        grupos = [
+            (self.stats['decode'], q_decode, q_infer, _decode),
+            (self.stats['infer'], q_infer, q_write, _infer),
+            (self.stats['write'], q_write, None, _write),
+        ]
+        threads: List[List[threading.Thread]] = []
+        for stage, entrada, saida, fn in grupos:
+            grupo = [threading.Thread(target=self._run_stage, args=(stage, entrada, saida, fn),
+                                      name=f"pipeline-{stage.name}-{i}", daemon=True)
+                     for i in range(stage.workers)]
+            for t in grupo:
+                t.start()
+            threads.append(grupo)
+
+        for payload in payloads:
+            q_decode.put(_Item(payload))
+        q_decode.put(_FIM)
+
+        # Encerra estágio a estágio para não perder itens em trânsito
+        for (stage, entrada, saida, _), grupo in zip(grupos, threads):
+            for t in grupo:
+                t.join()
+            if saida is not None:
+                saida.put(_FIM)
+
+        self.wall_seconds = time.perf_counter() - inicio
+        return self.report()
+
+    def report(self) -> Dict:
+        """Relatório por estágio; o gargalo é o estágio mais ocupado por worker."""
+        stages = {nome: s.to_dict() for nome, s in self.stats.items()}
+        gargalo = max(self.stats.values(),
+                      key=lambda s: s.busy_seconds / s.workers).name
+        return {
+            'wall_seconds': round(self.wall_seconds, 3),
+            'prefetch': self.prefetch,
+            'bottleneck': gargalo,
+            'stages': stages,
+        }
+
+
+def formatar_relatorio_pipeline(report: Dict) -> str:
+    """Resumo legível do relatório (uma linha por estágio)."""
+    linhas = [f"Pipeline: {report['wall_seconds']:.1f}s, gargalo = {report['bottleneck']}"]
+    for nome, s in report['stages'].items():
+        linhas.append(
+            f"  {nome:<6} x{s['workers']}: {s['items']} itens, ocupado {s['busy_seconds']:.1f}s, "
+            f"sem trabalho {s['starved_seconds']:.1f}s, bloqueado {s['blocked_seconds']:.1f}s, "
+            f"fila média {s['avg_queue_depth']:.1f} (máx {s['max_queue_depth']})")
+    return "\n".join(linhas)
@@ -0,0 +1,111 @@
+# video_analyzer/v4/transcription_stats.py
+"""
+Histórico de transcrições: segundos de fala vs. duração total por aula e
+tempo de processamento. Alimenta o TimeEstimator e a interface de progresso.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import LOG_PATH
+
+STATS_FILE = Path(LOG_PATH) / "transcription_stats.json"
+# Mantém apenas as aulas mais recentes no histórico
+MAX_ENTRIES = 500
+
+_lock = threading.Lock()
+
+
+def _carregar() -> List[Dict]:
+    if not STATS_FILE.exists():
+        return []
+    try:
+        with open(STATS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f).get('aulas', [])
+    except (OSError, ValueError):
+        return []
+
+
+def _salvar(entradas: List[Dict]):
+    STATS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = STATS_FILE.with_suffix('.json.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'aulas': entradas[-MAX_ENTRIES:]},
+                  f, indent=2, ensure_ascii=False)
+    os.replace(tmp, STATS_FILE)
+
+
+def montar_relatorio_vad(total_s: float, fala_s: Optional[float]) -> Dict:
+    """Relatório de fala vs. silêncio de uma aula."""
+    if fala_s is None:
+        fala_s = total_s
+    fala_s = min(fala_s, total_s) if total_s else fala_s
+    return {
+        'total_s': round(total_s, 2),
+        'fala_s': round(fala_s, 2),
+        'silencio_s': round(max(0.0, total_s - fala_s), 2),
+        'proporcao_fala': round(fala_s / total_s, 4) if total_s else 1.0,
+    }
+
+
+def registrar_aula(media_path: str, relatorio_vad: Dict, processamento_s: float, **extras):
+    """Adiciona uma aula transcrita ao histórico."""
+    entrada = {
+        'media_path': str(media_path),
+        'timestamp': time.time(),
+        'processamento_s': round(processamento_s, 2),
+        **relatorio_vad,
+        **extras,
+    }
+    with _lock:
+        entradas = [e for e in _carregar() if e.get('media_path')
+                    != entrada['media_path']]
+        entradas.append(entrada)
+        try:
+            _salvar(entradas)
+        except OSError as e:
+            print(f"⚠️ Não foi possível salvar estatísticas de transcrição: {e}")
+
+
+def relatorio_aula(media_path: str) -> Optional[Dict]:
+    """Último relatório registrado para a mídia, se houver."""
+    for entrada in reversed(_carregar()):
+        if entrada.get('media_path') == str(media_path):
+            return entrada
+    return None
+
+
+def duracoes_registradas() -> Dict[str, float]:
+    """Duração total (s) de cada mídia já vista, lida do histórico de uma vez."""
+    return {e['media_path']: e['total_s'] for e in _carregar()
+            if e.get('media_path') and e.get('total_s')}
+
+
+def _pelo_whisper(entradas: List[Dict]) -> List[Dict]:
+    """
+    Aulas que passaram pelo Whisper: as de legenda embutida ou reaproveitadas
+    de uma cópia (origem) não medem fala nem velocidade.
+    """
+    return [e for e in entradas if not e.get('origem')]
+
+
+def proporcao_fala_media(padrao: float = 1.0) -> float:
+    """Proporção média de fala nas aulas já transcritas."""
+    entradas = [e for e in _pelo_whisper(_carregar()) if e.get('total_s')]
+    total = sum(e['total_s'] for e in entradas)
+    if not total:
+        return padrao
+    return sum(e['fala_s'] for e in entradas) / total
+
+
+def fator_processamento_fala(padrao: Optional[float] = None) -> Optional[float]:
+    """Segundos de processamento por segundo de fala, medido no histórico."""
+    entradas = [e for e in _pelo_whisper(_carregar()) if e.get('fala_s')]
+    fala = sum(e['fala_s'] for e in entradas)
+    if not fala:
+        return padrao
+    return sum(e.get('processamento_s', 0) for e in entradas) / fala